@@ -16,6 +16,15 @@ workers = int(os.environ.get('WEB_CONCURRENCY', 1))
 # Com 'sync' o worker atende 1 request por vez e as threads são ignoradas.
 worker_class = 'gthread'
 threads = int(os.environ.get('GUNICORN_THREADS', 4))
+wsgi_app = 'lista_presentes.wsgi:application'
+
+# GUNICORN_ASGI=True: worker uvicorn (event loop) servindo lista_presentes.asgi.
+# As views async (extração de produto por URL, sugestões de IA) esperam a
+# rede sem ocupar uma das threads; o restante roda como antes, via threads.
+asgi = os.environ.get('GUNICORN_ASGI', 'False') == 'True'
+if asgi:
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    wsgi_app = 'lista_presentes.asgi:application'
 
 # Heartbeat em memória compartilhada em vez de disco.
 # Em containers, /tmp em disco lento causa falsos timeouts de worker.
@@ -51,7 +60,10 @@ proc_name = 'lista_presentes'
 def on_starting(server):
     print("=" * 60)
     print("Lista de Presentes - Iniciando servidor")
-    print(f"Workers: {workers} ({worker_class}) | Threads: {threads}")
+    if asgi:
+        print(f"Workers: {workers} ({worker_class}) | App: {wsgi_app}")
+    else:
+        print(f"Workers: {workers} ({worker_class}) | Threads: {threads}")
     print(f"Timeout: {timeout}s | Keep-alive: {keepalive}s")
     print(f"Max Requests: {max_requests}")
     print("=" * 60)
@@ -51,7 +51,8 @@ SITE_ID = 1
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Servir arquivos estáticos em produção
+    'presentes.middleware.WhiteNoiseAsyncMiddleware',  # Arquivos estáticos (WhiteNoise, também no ASGI)
+    'presentes.middleware.LimitesInterativosMiddleware',  # Chamadas externas sem esperar a vez do host
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -286,7 +287,7 @@ PWA_APP_ICONS = [
     }
 ]
 
-# APIs de IA — ordem de fallback: Gemini -> Claude -> ChatGPT
+# APIs de IA — ordem de custo: Gemini -> ChatGPT -> Claude (ver IA_ROTEADOR_* abaixo)
 # Gemini é a IA principal (free tier generoso - https://aistudio.google.com/apikey)
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', 'sua-chave-gemini')
 # gemini-2.0-flash foi desligado em 01/06/2026; 2.5-flash é o sucessor estável com free tier
@@ -297,6 +298,38 @@ ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY', 'sua-chave-anthropic')
 ANTHROPIC_MODEL = os.getenv('ANTHROPIC_MODEL', 'claude-haiku-4-5')  # $1/$5 por MTok
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', 'sua-chave-openai')
 OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+# Clientes dos SDKs de IA (Anthropic/OpenAI), um por processo (presentes/http_client.py):
+# conexões no pool, timeout por chamada (s) e novas tentativas do próprio SDK
+IA_POOL_CONEXOES = int(os.getenv('IA_POOL_CONEXOES', 10))
+IA_TIMEOUT = int(os.getenv('IA_TIMEOUT', 30))
+IA_SDK_TENTATIVAS = int(os.getenv('IA_SDK_TENTATIVAS', 1))
+
+# Roteador dos motores de IA (presentes/roteador_ia.py)
+# - JANELA: chamadas recentes usadas para latência (p50/p95) e taxa de erro
+# - FALHAS/ESPERA/ESPERA_MAXIMA: falhas seguidas que pausam o motor e a pausa (dobra a cada recaída)
+# - PAUSA_COTA: pausa quando a API responde cota/crédito esgotado
+# - ERRO_MAXIMO: acima dessa taxa de erro o motor vai para o fim da fila
+# - HEDGE: dispara o próximo motor se o atual passar do seu p95
+#   (HEDGE_PADRAO segundos enquanto não há amostras); PRAZO: espera total
+IA_ROTEADOR_JANELA = int(os.getenv('IA_ROTEADOR_JANELA', 50))
+IA_ROTEADOR_FALHAS = int(os.getenv('IA_ROTEADOR_FALHAS', 3))
+IA_ROTEADOR_ESPERA = int(os.getenv('IA_ROTEADOR_ESPERA', 60))
+IA_ROTEADOR_ESPERA_MAXIMA = int(os.getenv('IA_ROTEADOR_ESPERA_MAXIMA', 1800))
+IA_ROTEADOR_PAUSA_COTA = int(os.getenv('IA_ROTEADOR_PAUSA_COTA', 3600))
+IA_ROTEADOR_ERRO_MAXIMO = float(os.getenv('IA_ROTEADOR_ERRO_MAXIMO', 0.5))
+IA_ROTEADOR_HEDGE = os.getenv('IA_ROTEADOR_HEDGE', 'True') == 'True'
+IA_ROTEADOR_HEDGE_PADRAO = float(os.getenv('IA_ROTEADOR_HEDGE_PADRAO', 10))
+IA_ROTEADOR_PRAZO = int(os.getenv('IA_ROTEADOR_PRAZO', 45))
+# Presentes por chamada ao Gemini na pesquisa de preços (consulta em lote; 1 desativa)
+IA_LOTE_TAMANHO = int(os.getenv('IA_LOTE_TAMANHO', 10))
+# Cache das sugestões de IA por produto (presentes/cache.py, CacheSemantico), no backend
+# BUSCA_CACHE_BACKEND: TTL em segundos (0 desativa); descrições com similaridade de palavras
+# acima de SIMILARIDADE (e os mesmos números e qualificadores: pro, max, ultra...) reaproveitam
+# a resposta (1 = só descrição equivalente);
+# INDICE = descrições recentes comparadas (índice guardado no mesmo backend, compartilhado)
+IA_CACHE_TTL = int(os.getenv('IA_CACHE_TTL', 12 * 3600))
+IA_CACHE_SIMILARIDADE = float(os.getenv('IA_CACHE_SIMILARIDADE', 0.8))
+IA_CACHE_INDICE = int(os.getenv('IA_CACHE_INDICE', 2000))
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -367,6 +400,97 @@ SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000')
 # Token do endpoint de cron (pesquisa semanal de precos via agendador externo)
 CRON_TOKEN = os.getenv('CRON_TOKEN', '')
 
+# Pesquisa de preços concorrente (presentes/pesquisa_precos.py)
+# - WORKERS: threads pesquisando presentes em paralelo
+# - POR_MINUTO: teto global de presentes iniciados por minuto (0 = sem limite)
+PESQUISA_PRECOS_WORKERS = int(os.getenv('PESQUISA_PRECOS_WORKERS', 4))
+PESQUISA_PRECOS_POR_MINUTO = int(os.getenv('PESQUISA_PRECOS_POR_MINUTO', 60))
+# Requisições simultâneas por host externo (presentes/limites.py).
+# Exceções por host em LIMITES_POR_HOST (ex.: a API do Gemini free tier é mais restrita)
+LIMITE_CONEXOES_POR_HOST = int(os.getenv('LIMITE_CONEXOES_POR_HOST', 4))
+LIMITES_POR_HOST = {
+    'generativelanguage.googleapis.com': int(os.getenv('LIMITE_CONEXOES_GEMINI', 2)),
+}
+# Requisições por minuto por host (balde de fichas, rajada de até TAXA_RAJADA; 0 = sem limite),
+# com exceções em TAXAS_POR_HOST. Vale para tudo que passa por presentes/http_client.py
+TAXA_POR_HOST = int(os.getenv('TAXA_POR_HOST', 60))
+TAXA_RAJADA = int(os.getenv('TAXA_RAJADA', 5))
+TAXAS_POR_HOST = {
+    'www.zoom.com.br': int(os.getenv('TAXA_ZOOM', 30)),
+    'www.buscape.com.br': int(os.getenv('TAXA_BUSCAPE', 30)),
+}
+# Disjuntor por host: após DISJUNTOR_FALHAS falhas seguidas (conexão, timeout, 403/429/5xx
+# ou página de bloqueio) o host é pulado por DISJUNTOR_ESPERA segundos, pausa que dobra a
+# cada novo teste com falha até DISJUNTOR_ESPERA_MAXIMA
+DISJUNTOR_FALHAS = int(os.getenv('DISJUNTOR_FALHAS', 5))
+DISJUNTOR_ESPERA = int(os.getenv('DISJUNTOR_ESPERA', 60))
+DISJUNTOR_ESPERA_MAXIMA = int(os.getenv('DISJUNTOR_ESPERA_MAXIMA', 900))
+# Alias de settings.CACHES para dividir a taxa e o disjuntor entre processos ('' = por processo)
+LIMITES_COMPARTILHADOS = os.getenv('LIMITES_COMPARTILHADOS', '')
+# Espera máxima (segundos) pela vez do host dentro de um request; acima disso a fonte é
+# pulada. Só o trabalhador da fila (pesquisa de preços) espera a próxima janela inteira
+LIMITES_ESPERA_INTERATIVA = float(os.getenv('LIMITES_ESPERA_INTERATIVA', 2))
+# Cliente HTTP compartilhado (presentes/http_client.py): pool keep-alive por host
+# e novas tentativas com backoff exponencial (0.5s, 1s, ...) em 429/5xx e falhas de conexão
+HTTP_POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', 20))
+HTTP_POOL_CONEXOES = int(os.getenv('HTTP_POOL_CONEXOES', 10))
+HTTP_TENTATIVAS = int(os.getenv('HTTP_TENTATIVAS', 2))
+HTTP_BACKOFF = float(os.getenv('HTTP_BACKOFF', 0.5))
+# Prazo total (segundos) para IA + Zoom + Buscapé responderem em buscar_sugestoes_reais;
+# as fontes rodam em paralelo e o que chegar depois do prazo é descartado
+BUSCA_SUGESTOES_PRAZO = int(os.getenv('BUSCA_SUGESTOES_PRAZO', 30))
+# Cache das buscas no Zoom/Buscapé por descrição normalizada (presentes/cache.py)
+# - BACKEND: 'memoria' (LRU local ao processo), 'django' (settings.CACHES[BUSCA_CACHE_ALIAS])
+#   ou 'banco' (tabela CacheEntrada, compartilhada entre instâncias)
+# - TTL em segundos (0 desativa); MAX_ITENS limita memoria/banco (descarta o menos usado)
+BUSCA_CACHE_BACKEND = os.getenv('BUSCA_CACHE_BACKEND', 'memoria')
+BUSCA_CACHE_ALIAS = os.getenv('BUSCA_CACHE_ALIAS', 'default')
+BUSCA_CACHE_TTL = int(os.getenv('BUSCA_CACHE_TTL', 6 * 3600))
+BUSCA_CACHE_MAX_ITENS = int(os.getenv('BUSCA_CACHE_MAX_ITENS', 1000))
+# Backend 'banco': fração das gravações que fazem a limpeza (expirados e excesso sobre MAX_ITENS)
+# e intervalo mínimo em segundos entre atualizações de acessado_em de uma entrada lida
+BUSCA_CACHE_PODA = float(os.getenv('BUSCA_CACHE_PODA', 0.02))
+BUSCA_CACHE_TOQUE = int(os.getenv('BUSCA_CACHE_TOQUE', 300))
+# Cache por URL dos dados extraídos das páginas de produto (ScraperFactory.extract_product_info),
+# no mesmo backend acima. TTLs separados para sucesso e para falhas (cache negativo);
+# sucessos com ETag/Last-Modified ficam guardados por mais REVALIDACAO segundos
+# para serem revalidados com requisição condicional (304 = reaproveita)
+PRODUTO_CACHE_TTL_SUCESSO = int(os.getenv('PRODUTO_CACHE_TTL_SUCESSO', 7 * 24 * 3600))
+PRODUTO_CACHE_TTL_PARSING = int(os.getenv('PRODUTO_CACHE_TTL_PARSING', 24 * 3600))
+PRODUTO_CACHE_TTL_REDE = int(os.getenv('PRODUTO_CACHE_TTL_REDE', 15 * 60))
+PRODUTO_CACHE_REVALIDACAO = int(os.getenv('PRODUTO_CACHE_REVALIDACAO', 30 * 24 * 3600))
+# Agendamento da atualização de preços por presente (presentes/pesquisa_precos.py)
+# - AGENDAMENTO: True = cada presente tem sua próxima atualização; False = pesquisa completa semanal
+# - INTERVALO_BASE/MINIMO/MAXIMO em horas: o base (7 dias) é encurtado para preços voláteis,
+#   evento do grupo próximo e presentes vistos recentemente, e alongado para preços estáveis
+# - TICK: segundos entre verificações (por processo); LOTE: presentes vencidos enfileirados por tick
+PRECOS_AGENDAMENTO = os.getenv('PRECOS_AGENDAMENTO', 'True') == 'True'
+PRECOS_INTERVALO_BASE = int(os.getenv('PRECOS_INTERVALO_BASE', 7 * 24))
+PRECOS_INTERVALO_MINIMO = int(os.getenv('PRECOS_INTERVALO_MINIMO', 12))
+PRECOS_INTERVALO_MAXIMO = int(os.getenv('PRECOS_INTERVALO_MAXIMO', 28 * 24))
+PRECOS_TICK = int(os.getenv('PRECOS_TICK', 600))
+PRECOS_LOTE = int(os.getenv('PRECOS_LOTE', 20))
+# Retenção do histórico de preços (presentes/retencao_precos.py, compactação diária)
+# - COMPLETO_DIAS: pontos mais novos ficam como gravados
+# - DIARIO_DIAS: até aqui um ponto por dia (média/mín/máx); antes disso, um por semana
+PRECOS_HISTORICO_COMPLETO_DIAS = int(os.getenv('PRECOS_HISTORICO_COMPLETO_DIAS', 30))
+PRECOS_HISTORICO_DIARIO_DIAS = int(os.getenv('PRECOS_HISTORICO_DIARIO_DIAS', 180))
+# Fila de tarefas em background persistida no banco (presentes/tarefas.py)
+# - TRABALHADOR_EMBUTIDO: consome a fila dentro do processo web (Render free não tem worker);
+#   desative se rodar `python manage.py processar_tarefas` como serviço separado
+# - WORKERS: tarefas executadas ao mesmo tempo por processo; INTERVALO: segundos entre consultas à fila
+# - LEASE: segundos até uma tarefa de um processo morto voltar para a fila (renovado enquanto roda)
+# - Falhas são repetidas até MAX_TENTATIVAS, esperando BACKOFF_BASE * 2^n segundos (até BACKOFF_MAXIMO)
+# - RETENCAO_DIAS: tarefas concluídas/falhas mais antigas são removidas
+TAREFAS_TRABALHADOR_EMBUTIDO = os.getenv('TAREFAS_TRABALHADOR_EMBUTIDO', 'True') == 'True'
+TAREFAS_WORKERS = int(os.getenv('TAREFAS_WORKERS', 2))
+TAREFAS_INTERVALO = int(os.getenv('TAREFAS_INTERVALO', 5))
+TAREFAS_LEASE = int(os.getenv('TAREFAS_LEASE', 300))
+TAREFAS_MAX_TENTATIVAS = int(os.getenv('TAREFAS_MAX_TENTATIVAS', 5))
+TAREFAS_BACKOFF_BASE = int(os.getenv('TAREFAS_BACKOFF_BASE', 30))
+TAREFAS_BACKOFF_MAXIMO = int(os.getenv('TAREFAS_BACKOFF_MAXIMO', 3600))
+TAREFAS_RETENCAO_DIAS = int(os.getenv('TAREFAS_RETENCAO_DIAS', 7))
+
 # ==============================================================================
 # Django-allauth Configuration - Social Authentication
 # ==============================================================================
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, Presente, Compra, SugestaoCompra, Notificacao, Grupo, GrupoMembro, PrecoHistorico, PesquisaPrecoLog
+from .models import Usuario, Presente, Compra, SugestaoCompra, Notificacao, Grupo, GrupoMembro, PrecoHistorico, PrecoEstatistica, PesquisaPrecoLog, Tarefa
 
 
 @admin.register(Usuario)
@@ -220,8 +220,8 @@ class GrupoMembroAdmin(admin.ModelAdmin):
 @admin.register(PrecoHistorico)
 class PrecoHistoricoAdmin(admin.ModelAdmin):
     """Admin do histórico de preços (temperatura de preços)"""
-    list_display = ['presente_descricao', 'preco', 'loja', 'fonte', 'data']
-    list_filter = ['fonte', 'data']
+    list_display = ['presente_descricao', 'preco', 'preco_medio', 'loja', 'fonte', 'granularidade', 'pontos', 'data']
+    list_filter = ['fonte', 'granularidade', 'data']
     search_fields = ['presente__descricao', 'loja']
     ordering = ['-data']
     date_hierarchy = 'data'
@@ -234,16 +234,49 @@ class PrecoHistoricoAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('presente')
 
+    # Pontos editados ou apagados à mão: refazer o resumo (PrecoEstatistica)
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        PrecoEstatistica.recalcular(obj.presente_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        PrecoEstatistica.recalcular(obj.presente_id)
+
+    def delete_queryset(self, request, queryset):
+        presentes_ids = set(queryset.values_list('presente_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for presente_id in presentes_ids:
+            PrecoEstatistica.recalcular(presente_id)
+
 
 @admin.register(PesquisaPrecoLog)
 class PesquisaPrecoLogAdmin(admin.ModelAdmin):
     """Admin das execuções da pesquisa semanal de preços"""
-    list_display = ['origem', 'data_inicio', 'data_fim', 'total_presentes', 'sucessos', 'erros']
+    list_display = ['origem', 'data_inicio', 'data_fim', 'total_presentes', 'sucessos', 'erros', 'pulados']
     list_filter = ['origem', 'data_inicio']
     ordering = ['-data_inicio']
     readonly_fields = ['data_inicio']
 
 
+@admin.register(Tarefa)
+class TarefaAdmin(admin.ModelAdmin):
+    """Admin da fila de tarefas em background"""
+    list_display = ['tipo', 'status', 'prioridade', 'tentativas', 'disponivel_em', 'criada_em', 'concluida_em']
+    list_filter = ['status', 'tipo']
+    ordering = ['-criada_em']
+    readonly_fields = ['criada_em', 'iniciada_em', 'concluida_em', 'bloqueada_ate', 'bloqueada_por']
+    actions = ['reenfileirar']
+
+    @admin.action(description='Reenfileirar tarefas selecionadas')
+    def reenfileirar(self, request, queryset):
+        from django.utils import timezone
+        total = queryset.exclude(status='executando').update(
+            status='pendente', tentativas=0, disponivel_em=timezone.now(), ultimo_erro=''
+        )
+        self.message_user(request, f'{total} tarefa(s) reenfileirada(s).')
+
+
 # Customizar o site admin
 admin.site.site_header = '🎁 Lista de Presentes - Administração'
 admin.site.site_title = 'Admin Lista de Presentes'
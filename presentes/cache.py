@@ -0,0 +1,416 @@
+"""
+Cache de resultados com TTL e limite de tamanho (LRU), com backend plugável.
+
+Usado para não repetir buscas idênticas no Zoom/Buscapé: vários usuários em
+grupos diferentes costumam cadastrar o mesmo produto, e a pesquisa semanal
+consultaria o mesmo termo uma vez para cada presente.
+
+Backends (BUSCA_CACHE_BACKEND):
+- 'memoria': dicionário LRU local ao processo (padrão; some no restart);
+- 'django': cache configurado em settings.CACHES (BUSCA_CACHE_ALIAS);
+  o descarte por tamanho fica por conta do próprio backend do Django;
+- 'banco': tabela CacheEntrada, compartilhada entre instâncias.
+
+Uso:
+    cache = obter_cache('busca:zoom')
+    valor = cache.obter(descricao)        # None se ausente/expirado
+    cache.definir(descricao, valor)       # valor precisa ser serializável em JSON
+
+Para respostas de IA há também o CacheSemantico (obter_cache_semantico):
+a chave é a impressão digital da descrição (sem acentos, unidades
+padronizadas, palavras ordenadas), e descrições parecidas o bastante
+(similaridade acima de IA_CACHE_SIMILARIDADE, com os mesmos números e
+qualificadores de modelo) também encontram a resposta. As impressões
+digitais gravadas ficam num índice no próprio backend, então com 'banco'
+ou 'django' a comparação enxerga o que outros processos gravaram (o
+trabalhador da fila, por exemplo).
+"""
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+import unicodedata
+
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def normalizar_consulta(texto):
+    """'  Smartphone  Galaxy-S24 ÚLTIMO ' -> 'smartphone galaxy s24 ultimo'"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r'[\W_]+', ' ', texto.lower())
+    return ' '.join(texto.split())
+
+
+# Unidades escritas de formas diferentes nas descrições -> forma única
+UNIDADES = {
+    'litro': 'l', 'litros': 'l', 'lt': 'l', 'lts': 'l',
+    'mililitros': 'ml', 'gigas': 'gb', 'giga': 'gb', 'tera': 'tb',
+    'quilos': 'kg', 'quilo': 'kg', 'kilo': 'kg', 'gramas': 'g',
+    'polegadas': 'pol', 'polegada': 'pol', 'watts': 'w', 'volts': 'v',
+}
+UNIDADES_CURTAS = set(UNIDADES.values()) | {'mm', 'cm', 'm', 'mah'}
+PALAVRAS_VAZIAS = {'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'com', 'para', 'em', 'por'}
+# Palavras que separam modelos do mesmo produto ('Galaxy S24' x 'Galaxy S24 Ultra'):
+# como os números, precisam ser iguais nas duas descrições
+QUALIFICADORES = {
+    'ultra', 'pro', 'max', 'plus', 'mini', 'lite', 'se', 'fe', 'neo', 'edge', 'slim',
+    'cellular', 'celular', 'wifi', 'lte',
+}
+
+
+def impressao_digital(texto):
+    """'Air Fryer Mondial 4 Litros' e 'air fryer Mondial 4L' -> '4l air fryer mondial'"""
+    tokens = []
+    for token in normalizar_consulta(texto).split():
+        token = UNIDADES.get(token, token)
+        if token in PALAVRAS_VAZIAS:
+            continue
+        # '4 l' -> '4l': número seguido de unidade vira um token só
+        if token in UNIDADES_CURTAS and tokens and tokens[-1].isdigit():
+            tokens[-1] += token
+            continue
+        tokens.append(token)
+    return ' '.join(sorted(set(tokens)))
+
+
+def _distintivo(token):
+    """Números (capacidade, modelo, voltagem) e qualificadores de modelo."""
+    return token in QUALIFICADORES or any(c.isdigit() for c in token)
+
+
+def _singular(token):
+    """'canecas' -> 'caneca' (plural simples; distintivos ficam como estão)."""
+    if _distintivo(token) or len(token) <= 3 or not token.endswith('s'):
+        return token
+    return token[:-1]
+
+
+def similaridade(digital_a, digital_b):
+    """
+    Jaccard entre as palavras (no singular) de duas impressões digitais.
+    Números e qualificadores precisam ser iguais: '4l' x '5l' e
+    'galaxy s24' x 'galaxy s24 ultra' dão 0.
+    """
+    a = {_singular(t) for t in digital_a.split()}
+    b = {_singular(t) for t in digital_b.split()}
+    if not a or not b:
+        return 0.0
+    if {t for t in a if _distintivo(t)} != {t for t in b if _distintivo(t)}:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _hash_chave(namespace, chave):
+    return hashlib.sha256(f'{namespace}:{chave}'.encode('utf-8')).hexdigest()
+
+
+class BackendMemoria:
+    """LRU em memória, thread-safe. Itens expirados são descartados na leitura."""
+
+    def __init__(self, max_itens):
+        self.max_itens = max(1, int(max_itens))
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, namespace, chave):
+        with self._lock:
+            item = self._dados.get((namespace, chave))
+            if item is None:
+                return None
+            expira, valor = item
+            if expira <= time.monotonic():
+                del self._dados[(namespace, chave)]
+                return None
+            self._dados.move_to_end((namespace, chave))
+            return valor
+
+    def definir(self, namespace, chave, valor, ttl):
+        with self._lock:
+            self._dados[(namespace, chave)] = (time.monotonic() + ttl, valor)
+            self._dados.move_to_end((namespace, chave))
+            while len(self._dados) > self.max_itens:
+                self._dados.popitem(last=False)
+
+    def remover(self, namespace, chave):
+        with self._lock:
+            self._dados.pop((namespace, chave), None)
+
+    def limpar(self, namespace):
+        with self._lock:
+            for k in [k for k in self._dados if k[0] == namespace]:
+                del self._dados[k]
+
+
+class BackendDjango:
+    """Delegado ao cache do Django (Redis, Memcached, LocMem...)."""
+
+    def __init__(self, alias):
+        from django.core.cache import caches
+        self._cache = caches[alias]
+
+    def obter(self, namespace, chave):
+        return self._cache.get(f'presentes:{_hash_chave(namespace, chave)}')
+
+    def definir(self, namespace, chave, valor, ttl):
+        self._cache.set(f'presentes:{_hash_chave(namespace, chave)}', valor, timeout=ttl)
+
+    def remover(self, namespace, chave):
+        self._cache.delete(f'presentes:{_hash_chave(namespace, chave)}')
+
+    def limpar(self, namespace):
+        # O cache do Django não lista chaves por prefixo; as entradas expiram pelo TTL
+        logger.info(f"Cache '{namespace}': limpeza não suportada no backend django, aguardando TTL")
+
+
+class BackendBanco:
+    """
+    Tabela CacheEntrada. Uma fração `poda` das gravações remove expirados e,
+    acima de max_itens, as entradas acessadas há mais tempo (LRU aproximado
+    via acessado_em): o custo da limpeza fica amortizado em vez de somar
+    consultas a cada gravação. Na leitura, acessado_em só é atualizado se
+    tiver mais de `toque` segundos.
+    """
+
+    def __init__(self, max_itens, poda=None, toque=None):
+        self.max_itens = max(1, int(max_itens))
+        self.poda = float(poda if poda is not None else getattr(settings, 'BUSCA_CACHE_PODA', 0.02))
+        self.toque = timedelta(seconds=toque if toque is not None else getattr(settings, 'BUSCA_CACHE_TOQUE', 300))
+
+    def obter(self, namespace, chave):
+        from .models import CacheEntrada
+        agora = timezone.now()
+        hash_chave = _hash_chave(namespace, chave)
+        entrada = CacheEntrada.objects.filter(
+            chave=hash_chave, expira_em__gt=agora
+        ).only('valor', 'acessado_em').first()
+        if entrada is None:
+            return None
+        if entrada.acessado_em < agora - self.toque:
+            CacheEntrada.objects.filter(pk=entrada.pk).update(acessado_em=agora)
+        return entrada.valor
+
+    def definir(self, namespace, chave, valor, ttl):
+        from .models import CacheEntrada
+        agora = timezone.now()
+        CacheEntrada.objects.update_or_create(
+            chave=_hash_chave(namespace, chave),
+            defaults={
+                'namespace': namespace,
+                'valor': valor,
+                'expira_em': agora + timedelta(seconds=ttl),
+                'acessado_em': agora,
+            },
+        )
+        if random.random() < self.poda:
+            self._podar(agora)
+
+    def _podar(self, agora):
+        from .models import CacheEntrada
+        CacheEntrada.objects.filter(expira_em__lte=agora).delete()
+        excedentes = CacheEntrada.objects.count() - self.max_itens
+        if excedentes > 0:
+            antigas = list(
+                CacheEntrada.objects.order_by('acessado_em').values_list('pk', flat=True)[:excedentes]
+            )
+            CacheEntrada.objects.filter(pk__in=antigas).delete()
+
+    def remover(self, namespace, chave):
+        from .models import CacheEntrada
+        CacheEntrada.objects.filter(chave=_hash_chave(namespace, chave)).delete()
+
+    def limpar(self, namespace):
+        from .models import CacheEntrada
+        CacheEntrada.objects.filter(namespace=namespace).delete()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _criar_backend():
+    nome = getattr(settings, 'BUSCA_CACHE_BACKEND', 'memoria')
+    max_itens = getattr(settings, 'BUSCA_CACHE_MAX_ITENS', 1000)
+    if nome == 'django':
+        return BackendDjango(getattr(settings, 'BUSCA_CACHE_ALIAS', 'default'))
+    if nome == 'banco':
+        return BackendBanco(max_itens)
+    if nome != 'memoria':
+        logger.warning(f"BUSCA_CACHE_BACKEND '{nome}' desconhecido, usando 'memoria'")
+    return BackendMemoria(max_itens)
+
+
+def _obter_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _criar_backend()
+    return _backend
+
+
+class CacheResultados:
+    """
+    Cache de um namespace (ex.: 'busca:zoom'). As chaves são normalizadas
+    com normalizar_consulta() (normalizar=False para chaves como URLs);
+    falhas do backend nunca quebram a busca.
+    """
+
+    def __init__(self, namespace, ttl=None, normalizar=True):
+        self.namespace = namespace
+        self.ttl = int(ttl if ttl is not None else getattr(settings, 'BUSCA_CACHE_TTL', 6 * 3600))
+        self.normalizar = normalizar
+
+    def _chave(self, chave):
+        return normalizar_consulta(chave) if self.normalizar else chave
+
+    @property
+    def ativo(self):
+        return self.ttl > 0
+
+    def obter(self, chave):
+        if not self.ativo:
+            return None
+        try:
+            return _obter_backend().obter(self.namespace, self._chave(chave))
+        except Exception as e:
+            logger.warning(f"Cache '{self.namespace}': erro ao ler: {str(e)}")
+            return None
+
+    def definir(self, chave, valor, ttl=None):
+        if not self.ativo:
+            return
+        try:
+            _obter_backend().definir(
+                self.namespace, self._chave(chave), valor, int(ttl or self.ttl)
+            )
+        except Exception as e:
+            logger.warning(f"Cache '{self.namespace}': erro ao gravar: {str(e)}")
+
+    def remover(self, chave):
+        try:
+            _obter_backend().remover(self.namespace, self._chave(chave))
+        except Exception as e:
+            logger.warning(f"Cache '{self.namespace}': erro ao remover: {str(e)}")
+
+    def limpar(self):
+        _obter_backend().limpar(self.namespace)
+
+
+# Chave do índice de impressões digitais de um CacheSemantico; normalizar_consulta
+# remove '_', então nenhuma impressão digital colide com ela
+CHAVE_INDICE = '_indice'
+
+
+class CacheSemantico:
+    """
+    Cache de respostas por produto (ex.: sugestões de IA), sobre um
+    CacheResultados com a impressão digital como chave. Se a descrição
+    exata não estiver no cache, procura a mais parecida, com similaridade
+    acima de `limiar`, entre as gravadas recentemente (até IA_CACHE_INDICE).
+
+    O índice dessas impressões digitais é uma entrada do próprio backend,
+    compartilhada entre processos. A atualização é ler-modificar-gravar:
+    duas gravações simultâneas em processos diferentes podem perder uma
+    impressão digital do índice (a resposta continua no cache pela chave
+    exata).
+    """
+
+    def __init__(self, namespace, ttl=None, limiar=None):
+        self._cache = CacheResultados(namespace, ttl, normalizar=False)
+        self.limiar = float(limiar if limiar is not None else getattr(settings, 'IA_CACHE_SIMILARIDADE', 0.8))
+        self.max_indice = max(1, int(getattr(settings, 'IA_CACHE_INDICE', 2000)))
+        self._lock = threading.Lock()
+
+    @property
+    def ativo(self):
+        return self._cache.ativo
+
+    def _indice(self):
+        return self._cache.obter(CHAVE_INDICE) or []
+
+    def _mais_parecida(self, digital):
+        if self.limiar >= 1:
+            return None
+        melhor, melhor_nota = None, self.limiar
+        for candidata in self._indice():
+            nota = similaridade(digital, candidata)
+            if nota > melhor_nota:
+                melhor, melhor_nota = candidata, nota
+        return melhor
+
+    def _atualizar_indice(self, digital, incluir):
+        with self._lock:
+            indice = [d for d in self._indice() if d != digital]
+            if incluir:
+                # Mais recentes no fim; o índice vive tanto quanto as entradas
+                indice = (indice + [digital])[-self.max_indice:]
+            self._cache.definir(CHAVE_INDICE, indice)
+
+    def _lembrar(self, digital):
+        self._atualizar_indice(digital, incluir=True)
+
+    def _esquecer(self, digital):
+        self._atualizar_indice(digital, incluir=False)
+
+    def obter(self, descricao):
+        digital = impressao_digital(descricao)
+        if not digital or not self.ativo:
+            return None
+        valor = self._cache.obter(digital)
+        if valor is not None:
+            return valor
+        parecida = self._mais_parecida(digital)
+        if parecida is None:
+            return None
+        valor = self._cache.obter(parecida)
+        if valor is None:
+            # Expirou (ou foi descartada) no backend
+            self._esquecer(parecida)
+        return valor
+
+    def definir(self, descricao, valor, ttl=None):
+        digital = impressao_digital(descricao)
+        if not digital or not self.ativo:
+            return
+        self._cache.definir(digital, valor, ttl)
+        self._lembrar(digital)
+
+    def remover(self, descricao):
+        digital = impressao_digital(descricao)
+        self._cache.remover(digital)
+        self._esquecer(digital)
+
+
+_caches_semanticos = {}
+
+
+def obter_cache_semantico(namespace, ttl=None, limiar=None):
+    """Instância compartilhada do cache semântico de um namespace."""
+    with _caches_lock:
+        cache = _caches_semanticos.get(namespace)
+        if cache is None:
+            cache = CacheSemantico(namespace, ttl, limiar)
+            _caches_semanticos[namespace] = cache
+        return cache
+
+
+def obter_cache(namespace, ttl=None, normalizar=True):
+    """Instância compartilhada do cache de um namespace."""
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = CacheResultados(namespace, ttl, normalizar)
+            _caches[namespace] = cache
+        return cache
@@ -145,7 +145,7 @@ class GrupoForm(forms.ModelForm):
 
     class Meta:
         model = Grupo
-        fields = ['nome', 'descricao']
+        fields = ['nome', 'descricao', 'data_evento']
         widgets = {
             'nome': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -157,6 +157,10 @@ class GrupoForm(forms.ModelForm):
                 'rows': 3,
                 'placeholder': 'Descricao do grupo (opcional)'
             }),
+            'data_evento': forms.DateInput(format='%Y-%m-%d', attrs={
+                'class': 'form-control',
+                'type': 'date',
+            }),
         }
 
     def __init__(self, *args, **kwargs):
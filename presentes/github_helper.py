@@ -7,6 +7,8 @@ import logging
 from django.conf import settings
 from datetime import datetime
 
+from . import http_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -98,7 +100,7 @@ def criar_issue_falha_imagem(presente, url_imagem, erro_descricao, usuario=None)
         
         # Fazer request
         logger.info(f"Criando issue no GitHub para presente {presente.id}")
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = http_client.post(url, json=payload, headers=headers, timeout=10)
         
         if response.status_code == 201:
             issue_data = response.json()
@@ -272,7 +274,7 @@ Este tipo de erro indica que:
 
         # Fazer request
         logger.info(f"Criando issue no GitHub para falha de scraping: {dominio}")
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = http_client.post(url, json=payload, headers=headers, timeout=10)
 
         if response.status_code == 201:
             issue_data = response.json()
@@ -371,7 +373,7 @@ def criar_issue_erro_geral(titulo, descricao, contexto=None, labels=None):
             'labels': labels or ['auto-generated'],
         }
         
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = http_client.post(url, json=payload, headers=headers, timeout=10)
         
         if response.status_code == 201:
             issue_data = response.json()
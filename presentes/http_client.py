@@ -0,0 +1,182 @@
+"""
+Cliente HTTP compartilhado para scrapers, IAService, download de imagens e GitHub.
+
+Em vez de um requests.get() avulso por chamada (DNS + TCP + TLS a cada vez),
+todas as chamadas usam a mesma requests.Session do processo:
+- pool keep-alive por host (HTTP_POOL_HOSTS hosts, HTTP_POOL_CONEXOES conexões cada);
+- novas tentativas com backoff exponencial para falhas de conexão e
+  respostas 429/5xx (HTTP_TENTATIVAS, HTTP_BACKOFF), só em métodos idempotentes;
+- limite de requisições simultâneas e de requisições por minuto por host,
+  e disjuntor por host (presentes/limites.py): um site que está bloqueando
+  ou fora do ar é pulado (CircuitoAberto) em vez de consumir um timeout
+  a cada chamada.
+
+Dentro de um request (limites.sem_espera) a chamada não dorme: sem vez no
+host ela levanta EsperaExcedida, e a sessão usada não tem backoff nem
+respeita Retry-After (dormir ali seguraria a vaga do host e a thread do
+gunicorn). O backoff completo fica para o trabalhador da fila.
+
+Os SDKs de IA (Anthropic e OpenAI) usam httpx em vez de requests; seus
+clientes também são criados uma vez por processo (obter_cliente_ia), com
+pool (IA_POOL_CONEXOES) e timeout (IA_TIMEOUT) próprios, e reaproveitados
+por todas as threads. O Gemini é chamado por esta sessão (REST).
+
+A sessão é compartilhada entre threads; por isso não guarda cookies (o
+CookieJar seria estado mutável entre requisições de usuários diferentes).
+Erros continuam sendo as exceções do requests (requests.exceptions.*);
+CircuitoAberto é uma requests.exceptions.ConnectionError.
+"""
+import threading
+
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .limites import CircuitoAberto, aguardar_vez, espera_maxima, extrair_host, fechando_conexoes, limite_host, obter_disjuntor
+
+TIMEOUT_PADRAO = 10
+# Respostas que contam como falha para o disjuntor (bloqueio, limite, servidor fora do ar)
+STATUS_FALHA = frozenset([403, 429, 500, 502, 503, 504])
+
+_sessoes = {}
+_sessao_lock = threading.Lock()
+
+
+def _criar_sessao(interativa=False):
+    if interativa:
+        # Só reconecta na hora (conexão keep-alive fechada pelo servidor)
+        retry = Retry(
+            total=getattr(settings, 'HTTP_TENTATIVAS', 2),
+            backoff_factor=0,
+            status_forcelist=(),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+    else:
+        retry = Retry(
+            total=getattr(settings, 'HTTP_TENTATIVAS', 2),
+            backoff_factor=getattr(settings, 'HTTP_BACKOFF', 0.5),
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            # Devolver a última resposta em vez de MaxRetryError: o chamador
+            # continua tratando o status com response.raise_for_status()
+            raise_on_status=False,
+        )
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, 'HTTP_POOL_HOSTS', 20),
+        pool_maxsize=getattr(settings, 'HTTP_POOL_CONEXOES', 10),
+        max_retries=retry,
+    )
+    sessao = requests.Session()
+    sessao.mount('https://', adapter)
+    sessao.mount('http://', adapter)
+    sessao.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return sessao
+
+
+def obter_sessao(interativa=False):
+    """
+    Sessão HTTP do processo (criada sob demanda, thread-safe). A interativa,
+    usada dentro de requests, não espera entre tentativas.
+    """
+    sessao = _sessoes.get(interativa)
+    if sessao is None:
+        with _sessao_lock:
+            sessao = _sessoes.get(interativa)
+            if sessao is None:
+                sessao = _sessoes[interativa] = _criar_sessao(interativa)
+    return sessao
+
+
+_clientes_ia = {}
+_clientes_ia_lock = threading.Lock()
+
+
+def _criar_cliente_ia(provedor, chave):
+    import httpx
+
+    opcoes = {
+        'limits': httpx.Limits(
+            max_connections=getattr(settings, 'IA_POOL_CONEXOES', 10),
+            max_keepalive_connections=getattr(settings, 'IA_POOL_CONEXOES', 10),
+            keepalive_expiry=60,
+        ),
+        'timeout': httpx.Timeout(getattr(settings, 'IA_TIMEOUT', 30), connect=5.0),
+    }
+    # O roteador de IA já passa para o próximo motor: poucas tentativas no SDK
+    tentativas = getattr(settings, 'IA_SDK_TENTATIVAS', 1)
+    if provedor == 'anthropic':
+        import anthropic
+        return anthropic.Anthropic(
+            api_key=chave, max_retries=tentativas, http_client=anthropic.DefaultHttpxClient(**opcoes)
+        )
+    if provedor == 'openai':
+        import openai
+        return openai.OpenAI(
+            api_key=chave, max_retries=tentativas, http_client=openai.DefaultHttpxClient(**opcoes)
+        )
+    raise ValueError(f"Provedor de IA desconhecido: {provedor}")
+
+
+def obter_cliente_ia(provedor, chave):
+    """
+    Cliente do SDK ('anthropic' ou 'openai') do processo, criado na primeira
+    chamada (thread-safe). Uma troca de chave cria um cliente novo.
+    """
+    with _clientes_ia_lock:
+        cliente = _clientes_ia.get((provedor, chave))
+        if cliente is None:
+            cliente = _criar_cliente_ia(provedor, chave)
+            _clientes_ia[(provedor, chave)] = cliente
+        return cliente
+
+
+def requisitar(metodo, url, bloqueio=None, **kwargs):
+    """
+    Executa a requisição pela sessão compartilhada, respeitando os limites
+    e o disjuntor do host. `bloqueio(resposta) -> bool` identifica páginas
+    de bloqueio servidas com status 200 (contam como falha).
+    """
+    kwargs.setdefault('timeout', TIMEOUT_PADRAO)
+    host = extrair_host(url)
+    disjuntor = obter_disjuntor(host)
+    if not disjuntor.permitir():
+        raise CircuitoAberto(f'{host} em pausa após falhas seguidas')
+    sucesso = None  # None: desistiu antes de acessar a rede (EsperaExcedida)
+    try:
+        aguardar_vez(host)
+        with limite_host(host):
+            sucesso = False
+            resposta = obter_sessao(interativa=espera_maxima() is not None).request(metodo, url, **kwargs)
+        sucesso = resposta.status_code not in STATUS_FALHA and not (bloqueio and bloqueio(resposta))
+        return resposta
+    finally:
+        if sucesso is None:
+            disjuntor.desistir()
+        else:
+            disjuntor.registrar(sucesso)
+
+
+def get(url, **kwargs):
+    return requisitar('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return requisitar('POST', url, **kwargs)
+
+
+async def em_thread(funcao, *args, **kwargs):
+    """
+    Para views async: roda uma chamada bloqueante (scraping, SDKs de IA) numa
+    thread do executor, liberando o event loop (e as demais requisições)
+    enquanto espera a rede. Conexões de banco abertas nessa thread são
+    fechadas ao final.
+    """
+    from asgiref.sync import sync_to_async
+
+    return await sync_to_async(fechando_conexoes(funcao), thread_sensitive=False)(*args, **kwargs)
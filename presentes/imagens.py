@@ -0,0 +1,269 @@
+"""
+Armazenamento das imagens de presentes, grupos e fotos de usuário.
+
+Os bytes ficam na tabela ImagemBlob, com o sha256 do conteúdo como chave,
+e as linhas de Presente/Grupo/Usuario guardam só a referência
+(imagem_blob_id / foto_blob_id). Assim as listagens não trazem imagens
+junto e a mesma foto de produto, cadastrada em vários grupos, é gravada uma vez.
+
+Os campos *_base64 antigos continuam sendo lidos como fallback até serem
+convertidos pelo comando migrar_imagens_blob.
+
+Como o conteúdo de um hash nunca muda, as URLs das imagens levam
+?v=<hash> e podem ficar em cache no navegador para sempre; sem a versão,
+o navegador revalida com If-None-Match e recebe 304 sem o blob ser lido.
+
+Com ?tamanho=card|modal|avatar a imagem é servida reduzida, no melhor
+formato aceito pelo navegador (AVIF se o Pillow suportar, senão WebP,
+senão JPEG/PNG). As variantes são geradas na primeira requisição e
+guardadas em ImagemVariante.
+"""
+import base64
+import hashlib
+import io
+import logging
+
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+logger = logging.getLogger(__name__)
+
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'public, no-cache'
+TAMANHO_VERSAO = 12
+
+# Lado máximo (px) de cada variante; ~2x o tamanho exibido, para telas retina
+TAMANHOS = {
+    'avatar': 128,
+    'card': 480,
+    'modal': 1000,
+}
+# Originais que o Pillow não converte (vetor) ou que perderiam a animação
+TIPOS_SEM_VARIANTE = {'image/svg+xml', 'image/gif'}
+
+
+def guardar_imagem(dados, tipo=None):
+    """Grava os bytes (se ainda não existirem) e retorna o hash que os identifica."""
+    from .models import ImagemBlob
+    hash_imagem = hashlib.sha256(dados).hexdigest()
+    if not ImagemBlob.objects.filter(pk=hash_imagem).exists():
+        try:
+            with transaction.atomic():
+                ImagemBlob.objects.create(
+                    hash=hash_imagem,
+                    dados=dados,
+                    tipo=tipo or 'image/jpeg',
+                    tamanho=len(dados),
+                )
+        except IntegrityError:
+            # Mesma imagem gravada por outra requisição ao mesmo tempo
+            pass
+    return hash_imagem
+
+
+def ler_imagem(hash_imagem, base64_legado=None, tipo=None):
+    """
+    Retorna (bytes, content_type) do blob, caindo para o base64 legado
+    enquanto a linha não foi migrada. (None, None) se não houver imagem.
+    """
+    from .models import ImagemBlob
+    if hash_imagem:
+        linha = ImagemBlob.objects.filter(pk=hash_imagem).values_list('dados', 'tipo').first()
+        if linha:
+            return bytes(linha[0]), tipo or linha[1]
+        logger.warning(f"ImagemBlob {hash_imagem[:12]} não encontrado")
+    if base64_legado:
+        return base64.b64decode(base64_legado), tipo or 'image/jpeg'
+    return None, None
+
+
+def imagens_orfas():
+    """Blobs que não são mais referenciados (imagem trocada ou removida)."""
+    from .models import ImagemBlob
+    return ImagemBlob.objects.filter(
+        presentes__isnull=True,
+        grupos__isnull=True,
+        usuarios__isnull=True,
+    )
+
+
+def url_versionada(caminho, hash_imagem, tamanho=None):
+    """'/presente/1/imagem/' -> '/presente/1/imagem/?v=3b339e49f407&tamanho=card'"""
+    parametros = []
+    if hash_imagem:
+        parametros.append(f'v={hash_imagem[:TAMANHO_VERSAO]}')
+        # Variantes só existem para imagens já no ImagemBlob
+        if tamanho in TAMANHOS:
+            parametros.append(f'tamanho={tamanho}')
+    return f"{caminho}?{'&'.join(parametros)}" if parametros else caminho
+
+
+def _suporta_avif():
+    from PIL import features
+    return features.check('avif')
+
+
+def formato_aceito(request):
+    """Melhor formato de variante que o navegador declara aceitar (header Accept)."""
+    accept = request.META.get('HTTP_ACCEPT', '')
+    if 'image/avif' in accept and _suporta_avif():
+        return 'avif'
+    if 'image/webp' in accept:
+        return 'webp'
+    return 'jpeg'
+
+
+def gerar_variante(dados, lado_maximo, formato):
+    """
+    Reduz a imagem para caber em lado_maximo x lado_maximo e codifica no
+    formato pedido. Retorna (bytes, content_type) ou None se não der para
+    converter (arquivo inválido ou animado).
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    try:
+        with Image.open(io.BytesIO(dados)) as img:
+            if getattr(img, 'is_animated', False):
+                return None
+            # JPEG: decodifica já reduzido (menos memória para fotos grandes)
+            img.draft('RGB', (lado_maximo, lado_maximo))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((lado_maximo, lado_maximo), Image.Resampling.LANCZOS)
+
+            tem_alfa = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+            img = img.convert('RGBA' if tem_alfa else 'RGB')
+            saida = io.BytesIO()
+            if formato == 'avif':
+                img.save(saida, format='AVIF', quality=55)
+                tipo = 'image/avif'
+            elif formato == 'webp':
+                img.save(saida, format='WEBP', quality=80, method=4)
+                tipo = 'image/webp'
+            elif tem_alfa:
+                img.save(saida, format='PNG', optimize=True)
+                tipo = 'image/png'
+            else:
+                img.save(saida, format='JPEG', quality=82, optimize=True, progressive=True)
+                tipo = 'image/jpeg'
+            return saida.getvalue(), tipo
+    except (UnidentifiedImageError, OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Não foi possível gerar variante de imagem: {str(e)}")
+        return None
+
+
+def obter_variante(hash_imagem, tamanho, formato):
+    """
+    (bytes, content_type) da variante, gerando e gravando na primeira vez.
+    (None, None) se o original não puder ser convertido: serve-se o original.
+    """
+    from .models import ImagemBlob, ImagemVariante
+    linha = ImagemVariante.objects.filter(
+        original_id=hash_imagem, tamanho=tamanho, formato=formato
+    ).values_list('dados', 'tipo').first()
+    if linha:
+        return bytes(linha[0]), linha[1]
+
+    original = (
+        ImagemBlob.objects.filter(pk=hash_imagem)
+        .exclude(tipo__in=TIPOS_SEM_VARIANTE)
+        .values_list('dados', 'tipo')
+        .first()
+    )
+    if not original:
+        return None, None
+    original_dados, original_tipo = bytes(original[0]), original[1]
+    gerada = gerar_variante(original_dados, TAMANHOS[tamanho], formato)
+    if gerada is None:
+        return None, None
+    dados, tipo = gerada
+    if len(dados) >= len(original_dados):
+        # Original já é pequeno: a "variante" é ele mesmo (evita reprocessar a cada acesso)
+        dados, tipo = original_dados, original_tipo
+    try:
+        with transaction.atomic():
+            ImagemVariante.objects.create(
+                original_id=hash_imagem,
+                tamanho=tamanho,
+                formato=formato,
+                dados=dados,
+                tipo=tipo,
+                bytes=len(dados),
+            )
+    except IntegrityError:
+        # Gerada em paralelo por outra requisição
+        pass
+    logger.info(f"Variante {tamanho}/{formato} gerada para {hash_imagem[:12]}: {len(original_dados)} -> {len(dados)} bytes")
+    return dados, tipo
+
+
+def _etag_confere(request, etag):
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    # Comparação fraca (RFC 9110): W/"x" equivale a "x"
+    etags = [e[2:] if e.startswith('W/') else e for e in etags]
+    return '*' in etags or etag in etags
+
+
+def responder_imagem(request, hash_imagem, obter):
+    """
+    Resposta HTTP de uma imagem com ETag = hash do conteúdo.
+
+    `obter` é chamado só quando os bytes são necessários, então o 304 de
+    uma revalidação é respondido sem ler o blob. Com ?v= igual ao hash a
+    resposta é imutável (Cache-Control de 1 ano). Com ?tamanho= serve a
+    variante reduzida (ver obter_variante). Retorna None se não houver imagem.
+    """
+    versao = request.GET.get('v', '')
+    tamanho = request.GET.get('tamanho')
+    if hash_imagem and tamanho in TAMANHOS:
+        resposta = _responder_variante(request, hash_imagem, tamanho, versao)
+        if resposta is not None:
+            return resposta
+
+    if hash_imagem:
+        etag = f'"{hash_imagem}"'
+        if _etag_confere(request, etag):
+            resposta = HttpResponseNotModified()
+            resposta['ETag'] = etag
+            resposta['Cache-Control'] = _cache_control(hash_imagem, versao)
+            return resposta
+
+    dados, tipo = obter()
+    if dados is None:
+        return None
+
+    if not hash_imagem:
+        # Linha ainda em base64: o ETag sai do conteúdo já carregado
+        etag = f'"{hashlib.sha256(dados).hexdigest()}"'
+        if _etag_confere(request, etag):
+            resposta = HttpResponseNotModified()
+            resposta['ETag'] = etag
+            resposta['Cache-Control'] = CACHE_REVALIDAR
+            return resposta
+
+    resposta = HttpResponse(dados, content_type=tipo)
+    resposta['ETag'] = etag
+    resposta['Cache-Control'] = _cache_control(hash_imagem, versao)
+    return resposta
+
+
+def _responder_variante(request, hash_imagem, tamanho, versao):
+    formato = formato_aceito(request)
+    # O formato depende do Accept: ETag por variante e Vary para caches intermediários
+    etag = f'"{hash_imagem}-{tamanho}-{formato}"'
+    if _etag_confere(request, etag):
+        resposta = HttpResponseNotModified()
+    else:
+        dados, tipo = obter_variante(hash_imagem, tamanho, formato)
+        if dados is None:
+            return None
+        resposta = HttpResponse(dados, content_type=tipo)
+    resposta['ETag'] = etag
+    resposta['Cache-Control'] = _cache_control(hash_imagem, versao)
+    resposta['Vary'] = 'Accept'
+    return resposta
+
+
+def _cache_control(hash_imagem, versao):
+    if hash_imagem and len(versao) >= TAMANHO_VERSAO and hash_imagem.startswith(versao):
+        return CACHE_IMUTAVEL
+    return CACHE_REVALIDAR
@@ -0,0 +1,422 @@
+"""
+Limites de concorrência para chamadas externas (scraping e APIs de IA).
+
+A pesquisa de preços roda em várias threads; sem limite, cada thread
+abriria conexões simultâneas contra o mesmo site (Zoom, Buscapé, Gemini...)
+e seríamos bloqueados. Aqui ficam:
+- limite_host(): no máximo N requisições simultâneas por host
+  (LIMITE_CONEXOES_POR_HOST, com exceções em LIMITES_POR_HOST);
+- aguardar_vez(): balde de fichas por host, no máximo TAXA_POR_HOST
+  requisições por minuto (exceções em TAXAS_POR_HOST);
+- obter_disjuntor(): disjuntor (circuit breaker) por host. Depois de
+  DISJUNTOR_FALHAS falhas seguidas o host fica em pausa e as chamadas
+  levantam CircuitoAberto na hora, sem esperar timeout; passada a pausa,
+  uma única requisição de teste decide se ele volta ou se a pausa dobra;
+- LimitadorVazao: teto global de tarefas iniciadas por minuto.
+
+Esperar a vez (ficha, vaga no host) só faz sentido fora do request: a
+pesquisa de preços no trabalhador da fila pode dormir até a próxima janela,
+mas um request de usuário que dormisse prenderia uma thread do gunicorn
+por até um minuto. Dentro de sem_espera() (todo request, via
+presentes.middleware.LimitesInterativosMiddleware) a espera vai no máximo
+até LIMITES_ESPERA_INTERATIVA segundos; acima disso a chamada levanta
+EsperaExcedida na hora e a fonte é pulada.
+
+O estado vale para todas as threads do processo. Com LIMITES_COMPARTILHADOS
+(alias de settings.CACHES) a janela de taxa e a pausa do disjuntor também
+são divididas entre processos/instâncias.
+"""
+import contextvars
+import logging
+import threading
+import time
+
+from contextlib import contextmanager
+from functools import wraps
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_semaforos = {}
+_semaforos_lock = threading.Lock()
+
+# Espera máxima (segundos) pela vez do host no contexto atual; None = o quanto for preciso
+_espera_maxima = contextvars.ContextVar('presentes_limites_espera_maxima', default=None)
+
+
+def espera_maxima():
+    """Espera máxima pela vez do host no contexto atual (None fora de sem_espera)."""
+    return _espera_maxima.get()
+
+
+def _espera_padrao():
+    return float(getattr(settings, 'LIMITES_ESPERA_INTERATIVA', 2))
+
+
+@contextmanager
+def sem_espera(max_espera=None):
+    """
+    Chamadas externas feitas dentro do bloco (e nas threads submetidas com
+    fechando_conexoes) esperam no máximo `max_espera` segundos
+    (padrão LIMITES_ESPERA_INTERATIVA) pela vez do host.
+    """
+    token = _espera_maxima.set(_espera_padrao() if max_espera is None else max_espera)
+    try:
+        yield
+    finally:
+        _espera_maxima.reset(token)
+
+
+def iterar_sem_espera(iterador, max_espera=None):
+    """
+    Consome `iterador` no modo sem_espera. Para respostas em streaming: o
+    corpo é gerado depois que o middleware já saiu do request.
+    """
+    contexto = contextvars.copy_context()
+    contexto.run(_espera_maxima.set, _espera_padrao() if max_espera is None else max_espera)
+    while True:
+        try:
+            item = contexto.run(next, iterador)
+        except StopIteration:
+            return
+        yield item
+
+
+def extrair_host(url_ou_host):
+    """'https://www.zoom.com.br/search?q=x' -> 'www.zoom.com.br'"""
+    if '://' in url_ou_host:
+        return urlparse(url_ou_host).netloc.lower()
+    return url_ou_host.lower()
+
+
+def _semaforo(host):
+    with _semaforos_lock:
+        semaforo = _semaforos.get(host)
+        if semaforo is None:
+            limites = getattr(settings, 'LIMITES_POR_HOST', {}) or {}
+            maximo = limites.get(host, getattr(settings, 'LIMITE_CONEXOES_POR_HOST', 4))
+            semaforo = threading.BoundedSemaphore(max(1, int(maximo)))
+            _semaforos[host] = semaforo
+        return semaforo
+
+
+@contextmanager
+def limite_host(url_ou_host, max_espera=None):
+    """
+    Bloqueia enquanto o host já estiver com o máximo de requisições em andamento
+    (no modo sem_espera, ou com `max_espera`, levanta EsperaExcedida depois
+    desse tempo). Já aplicado por presentes/http_client.py; use diretamente
+    apenas em chamadas que não passam por ele (SDKs de IA).
+    """
+    if max_espera is None:
+        max_espera = _espera_maxima.get()
+    host = extrair_host(url_ou_host)
+    semaforo = _semaforo(host)
+    if not semaforo.acquire(timeout=max_espera):
+        raise EsperaExcedida(f'{host} com o máximo de requisições simultâneas')
+    try:
+        yield
+    finally:
+        semaforo.release()
+
+
+def _cache_compartilhado():
+    """Cache do Django usado para dividir o estado entre processos (None = só local)."""
+    alias = getattr(settings, 'LIMITES_COMPARTILHADOS', '')
+    if not alias:
+        return None
+    from django.core.cache import caches
+    return caches[alias]
+
+
+class BaldeFichas:
+    """
+    Balde de fichas: reabastece `por_minuto` fichas por minuto, acumulando
+    até `rajada`. Sem ficha disponível, a requisição reserva a próxima e
+    espera por ela (as reservas saem na ordem de chegada), a não ser que a
+    espera passe de `max_espera`: aí nada é reservado.
+    """
+
+    def __init__(self, por_minuto, rajada):
+        self.por_segundo = por_minuto / 60.0
+        self.capacidade = max(1.0, float(rajada))
+        self._fichas = self.capacidade
+        self._atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reservar(self, max_espera=None):
+        """
+        Consome uma ficha e retorna quantos segundos esperar por ela, ou
+        None (sem consumir) se a espera passaria de `max_espera`.
+        """
+        with self._lock:
+            agora = time.monotonic()
+            self._fichas = min(
+                self.capacidade,
+                self._fichas + (agora - self._atualizado) * self.por_segundo,
+            )
+            self._atualizado = agora
+            espera = max(0.0, (1 - self._fichas) / self.por_segundo)
+            if max_espera is not None and espera > max_espera:
+                return None
+            self._fichas -= 1
+            return espera
+
+
+_baldes = {}
+_baldes_lock = threading.Lock()
+
+
+def _taxa(host):
+    taxas = getattr(settings, 'TAXAS_POR_HOST', {}) or {}
+    return taxas.get(host, getattr(settings, 'TAXA_POR_HOST', 0))
+
+
+def _balde(host):
+    with _baldes_lock:
+        if host not in _baldes:
+            por_minuto = _taxa(host)
+            _baldes[host] = (
+                BaldeFichas(por_minuto, getattr(settings, 'TAXA_RAJADA', 5))
+                if por_minuto and por_minuto > 0 else None
+            )
+        return _baldes[host]
+
+
+def _aguardar_janela_compartilhada(host, por_minuto, max_espera=None):
+    """
+    Contador por janela de 1 minuto no cache compartilhado (teto entre
+    processos). Com `max_espera`, não espera a próxima janela além disso.
+    """
+    try:
+        cache = _cache_compartilhado()
+        if cache is None:
+            return
+        while True:
+            agora = time.time()
+            janela = int(agora // 60)
+            chave = f'presentes:taxa:{host}:{janela}'
+            cache.add(chave, 0, timeout=120)
+            if cache.incr(chave) <= por_minuto:
+                return
+            espera = (janela + 1) * 60 - agora
+            if max_espera is not None and espera > max_espera:
+                # Devolve a vaga: esta chamada não vai acontecer
+                cache.decr(chave)
+                raise EsperaExcedida(f'{host} atingiu {por_minuto} requisições neste minuto')
+            time.sleep(espera)
+    except EsperaExcedida:
+        raise
+    except Exception as e:
+        # Cache fora do ar não pode parar as requisições: fica só o limite local
+        logger.warning(f"Limite de taxa compartilhado indisponível para {host}: {str(e)}")
+
+
+def aguardar_vez(url_ou_host, max_espera=None):
+    """
+    Espera até o host ter ficha disponível (TAXA_POR_HOST por minuto). No
+    modo sem_espera, ou com `max_espera`, levanta EsperaExcedida se a
+    espera passaria desse tempo.
+    """
+    if max_espera is None:
+        max_espera = _espera_maxima.get()
+    host = extrair_host(url_ou_host)
+    balde = _balde(host)
+    if balde is None:
+        return
+    espera = balde.reservar(max_espera)
+    if espera is None:
+        raise EsperaExcedida(f'{host} sem ficha disponível ({_taxa(host)} requisições por minuto)')
+    if espera > 0:
+        time.sleep(espera)
+    _aguardar_janela_compartilhada(
+        host, _taxa(host), None if max_espera is None else max(0.0, max_espera - espera)
+    )
+
+
+class CircuitoAberto(requests.exceptions.ConnectionError):
+    """Chamada recusada sem acessar a rede: o host está em pausa após falhas seguidas."""
+
+
+class EsperaExcedida(CircuitoAberto):
+    """
+    Chamada recusada sem acessar a rede: no modo sem_espera, a vez do host
+    (ficha ou vaga) demoraria mais que a espera máxima. É um CircuitoAberto
+    para os chamadores pularem a fonte do mesmo jeito.
+    """
+
+
+class Disjuntor:
+    """
+    Disjuntor de um host: fechado (normal) -> aberto (pausa, chamadas
+    recusadas) -> meio aberto (uma requisição de teste). O teste bem-sucedido
+    fecha o disjuntor; a falha reabre com o dobro da pausa anterior.
+    """
+
+    FECHADO = 'fechado'
+    ABERTO = 'aberto'
+    MEIO_ABERTO = 'meio_aberto'
+
+    def __init__(self, host, falhas_para_abrir, espera, espera_maxima):
+        self.host = host
+        self.falhas_para_abrir = max(1, int(falhas_para_abrir))
+        self.espera = max(1.0, float(espera))
+        self.espera_maxima = max(self.espera, float(espera_maxima))
+        self.falhas = 0
+        self.aberturas = 0
+        # time.time() (e não monotonic) para poder ser comparado entre processos
+        self.aberto_ate = 0.0
+        self._testando = False
+        self._lock = threading.Lock()
+
+    @property
+    def _chave_compartilhada(self):
+        return f'presentes:disjuntor:{self.host}'
+
+    def _sincronizar(self):
+        """Adota a pausa aberta por outro processo (LIMITES_COMPARTILHADOS)."""
+        try:
+            cache = _cache_compartilhado()
+            if cache is None:
+                return
+            aberto_ate = cache.get(self._chave_compartilhada)
+            if aberto_ate and aberto_ate > self.aberto_ate:
+                self.aberto_ate = aberto_ate
+        except Exception as e:
+            logger.warning(f"Disjuntor compartilhado indisponível para {self.host}: {str(e)}")
+
+    def _publicar(self):
+        try:
+            cache = _cache_compartilhado()
+            if cache is None:
+                return
+            restante = self.aberto_ate - time.time()
+            if restante > 0:
+                cache.set(self._chave_compartilhada, self.aberto_ate, timeout=int(restante) + 1)
+            else:
+                cache.delete(self._chave_compartilhada)
+        except Exception as e:
+            logger.warning(f"Disjuntor compartilhado indisponível para {self.host}: {str(e)}")
+
+    @property
+    def estado(self):
+        if not self.aberto_ate:
+            return self.FECHADO
+        return self.ABERTO if time.time() < self.aberto_ate else self.MEIO_ABERTO
+
+    def permitir(self):
+        """False enquanto o host estiver em pausa (ou já houver um teste em andamento)."""
+        with self._lock:
+            self._sincronizar()
+            estado = self.estado
+            if estado == self.FECHADO:
+                return True
+            if estado == self.ABERTO or self._testando:
+                return False
+            self._testando = True
+            logger.info(f"[DISJUNTOR] {self.host}: pausa encerrada, testando com uma requisição")
+            return True
+
+    def desistir(self):
+        """Chamada liberada por permitir() que não chegou a acessar a rede (EsperaExcedida)."""
+        with self._lock:
+            self._testando = False
+
+    def registrar(self, sucesso):
+        with self._lock:
+            if sucesso:
+                if self.aberto_ate:
+                    logger.info(f"[DISJUNTOR] {self.host}: respondeu, disjuntor fechado")
+                    self.aberto_ate = 0.0
+                    self._publicar()
+                self.falhas = 0
+                self.aberturas = 0
+                self._testando = False
+                return
+            self.falhas += 1
+            if self._testando or self.falhas >= self.falhas_para_abrir:
+                self._abrir()
+
+    def pausar(self, segundos, motivo):
+        """Abre o disjuntor por um tempo conhecido (ex.: cota esgotada), sem contar falhas."""
+        with self._lock:
+            self.aberto_ate = max(self.aberto_ate, time.time() + segundos)
+            self._testando = False
+            self._publicar()
+        logger.warning(f"[DISJUNTOR] {self.host}: {motivo}, pausado por {segundos:.0f}s")
+
+    def _abrir(self):
+        self.aberturas += 1
+        pausa = min(self.espera_maxima, self.espera * 2 ** (self.aberturas - 1))
+        self.aberto_ate = time.time() + pausa
+        self.falhas = 0
+        self._testando = False
+        self._publicar()
+        logger.warning(f"[DISJUNTOR] {self.host}: falhas seguidas, pausado por {pausa:.0f}s")
+
+
+_disjuntores = {}
+_disjuntores_lock = threading.Lock()
+
+
+def obter_disjuntor(url_ou_host):
+    host = extrair_host(url_ou_host)
+    with _disjuntores_lock:
+        disjuntor = _disjuntores.get(host)
+        if disjuntor is None:
+            disjuntor = Disjuntor(
+                host,
+                getattr(settings, 'DISJUNTOR_FALHAS', 5),
+                getattr(settings, 'DISJUNTOR_ESPERA', 60),
+                getattr(settings, 'DISJUNTOR_ESPERA_MAXIMA', 900),
+            )
+            _disjuntores[host] = disjuntor
+        return disjuntor
+
+
+class LimitadorVazao:
+    """
+    Espaça o início das tarefas para no máximo `por_minuto` por minuto,
+    compartilhado entre as threads. `por_minuto` <= 0 desativa o limite.
+    """
+
+    def __init__(self, por_minuto):
+        self.intervalo = 60.0 / por_minuto if por_minuto and por_minuto > 0 else 0.0
+        self._proximo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            espera = self._proximo - agora
+            self._proximo = max(agora, self._proximo) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+
+def fechando_conexoes(funcao):
+    """
+    Envolve `funcao` para rodar numa thread de pool (ThreadPoolExecutor,
+    sync_to_async): as conexões de banco que ela abrir (cache 'banco',
+    IAService.guardar_sugestoes_ia...) são fechadas ao final, em vez de
+    ficarem abertas até a thread ser coletada. A função roda numa cópia do
+    contexto de quem a envolveu (como no sync_to_async), para herdar o modo
+    sem_espera.
+    """
+    contexto = contextvars.copy_context()
+
+    @wraps(funcao)
+    def executar(*args, **kwargs):
+        from django.db import connections
+
+        try:
+            return contexto.run(funcao, *args, **kwargs)
+        finally:
+            connections.close_all()
+
+    return executar
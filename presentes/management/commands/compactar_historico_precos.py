@@ -0,0 +1,38 @@
+"""
+Comando para compactar o histórico de preços antigo (ver presentes/retencao_precos.py).
+
+Uso:
+    python manage.py compactar_historico_precos
+    python manage.py compactar_historico_precos --presente 42
+
+Também roda diariamente pela fila de tarefas.
+"""
+
+from django.core.management.base import BaseCommand
+
+from presentes.models import PrecoHistorico
+from presentes.retencao_precos import compactar_historico, compactar_presente
+
+
+class Command(BaseCommand):
+    help = 'Agrega por dia/semana os pontos antigos do histórico de preços'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--presente',
+            type=int,
+            default=None,
+            help='Compacta só o histórico deste presente'
+        )
+
+    def handle(self, *args, **options):
+        antes = PrecoHistorico.objects.count()
+        if options['presente']:
+            compactar_presente(options['presente'])
+            presentes = 1
+        else:
+            presentes, _ = compactar_historico()
+        depois = PrecoHistorico.objects.count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Histórico compactado: {presentes} presentes, {antes} -> {depois} linhas.'
+        ))
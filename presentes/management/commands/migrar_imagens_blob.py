@@ -0,0 +1,111 @@
+"""
+Converte as imagens antigas em base64 (Presente, Grupo e Usuario) para o
+armazenamento binário ImagemBlob, em lotes.
+
+Uso:
+    python manage.py migrar_imagens_blob
+    python manage.py migrar_imagens_blob --lote 20 --dry-run
+    python manage.py migrar_imagens_blob --remover-orfas
+"""
+import base64
+import binascii
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from presentes.imagens import guardar_imagem, imagens_orfas
+from presentes.models import Grupo, Presente, Usuario
+
+# (modelo, campo base64, campo do blob, campo do tipo)
+ALVOS = [
+    (Presente, 'imagem_base64', 'imagem_blob', 'imagem_tipo'),
+    (Grupo, 'imagem_base64', 'imagem_blob', 'imagem_tipo'),
+    (Usuario, 'foto_base64', 'foto_blob', 'foto_tipo'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Move as imagens em base64 para a tabela ImagemBlob (bytes + hash), em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=50,
+            help='Registros lidos por vez (cada lote traz as imagens para a memória)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Executa sem salvar alterações',
+        )
+        parser.add_argument(
+            '--remover-orfas',
+            action='store_true',
+            help='Remove blobs que não são mais usados por nenhum registro',
+        )
+
+    def handle(self, *args, **options):
+        lote = max(1, options['lote'])
+        dry_run = options['dry_run']
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Modo DRY RUN - nenhuma alteração será salva'))
+
+        for modelo, campo_base64, campo_blob, campo_tipo in ALVOS:
+            self._migrar_modelo(modelo, campo_base64, campo_blob, campo_tipo, lote, dry_run)
+
+        if options['remover_orfas']:
+            orfas = imagens_orfas()
+            total = orfas.count()
+            if not dry_run and total:
+                orfas.delete()
+            self.stdout.write(f'Blobs órfãos removidos: {total}')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('\nNENHUMA ALTERAÇÃO FOI SALVA (modo dry-run)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('\nMigração concluída!'))
+
+    def _migrar_modelo(self, modelo, campo_base64, campo_blob, campo_tipo, lote, dry_run):
+        nome = modelo._meta.verbose_name_plural
+        pendentes = modelo.objects.filter(**{f'{campo_base64}__isnull': False}).exclude(**{campo_base64: ''})
+        total = pendentes.count()
+        self.stdout.write(f'{nome}: {total} imagens em base64 para converter')
+
+        convertidos = 0
+        erros = 0
+        bytes_total = 0
+        ultimo_pk = 0
+        while True:
+            # Paginação por pk (não por offset): cada lote convertido sai do filtro
+            linhas = list(
+                pendentes.filter(pk__gt=ultimo_pk)
+                .order_by('pk')
+                .values_list('pk', campo_base64, campo_tipo)[:lote]
+            )
+            if not linhas:
+                break
+            with transaction.atomic():
+                for pk, texto, tipo in linhas:
+                    ultimo_pk = pk
+                    try:
+                        dados = base64.b64decode(texto)
+                    except (binascii.Error, ValueError) as e:
+                        erros += 1
+                        self.stdout.write(self.style.ERROR(f'  ✗ {nome} {pk}: base64 inválido ({str(e)})'))
+                        continue
+                    bytes_total += len(dados)
+                    convertidos += 1
+                    if dry_run:
+                        continue
+                    hash_imagem = guardar_imagem(dados, tipo)
+                    modelo.objects.filter(pk=pk).update(**{
+                        f'{campo_blob}_id': hash_imagem,
+                        campo_base64: None,
+                    })
+            self.stdout.write(f'  ... {convertidos}/{total}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{nome}: {convertidos} convertidas ({bytes_total / 1024 / 1024:.1f} MB), {erros} erros'
+        ))
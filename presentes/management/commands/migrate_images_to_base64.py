@@ -1,14 +1,14 @@
 from django.core.management.base import BaseCommand
+from presentes import http_client
 from presentes.models import Presente
 import requests
-import base64
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
-    help = 'Migra imagens antigas de presentes para armazenamento base64'
+    help = 'Baixa imagens de presentes sem imagem a partir da URL e grava no banco (ImagemBlob)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -23,10 +23,10 @@ class Command(BaseCommand):
         if dry_run:
             self.stdout.write(self.style.WARNING('Modo DRY RUN - nenhuma alteração será salva'))
 
-        # Encontrar presentes com URL mas sem imagem base64
+        # Encontrar presentes com URL mas sem imagem no banco
         presentes_sem_base64 = Presente.objects.filter(
             url__isnull=False
-        ).exclude(url='').filter(imagem_base64__isnull=True)
+        ).exclude(url='').filter(imagem_base64__isnull=True, imagem_blob__isnull=True)
 
         total = presentes_sem_base64.count()
         self.stdout.write(f'Encontrados {total} presentes com URL para processar')
@@ -49,7 +49,7 @@ class Command(BaseCommand):
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
                 }
 
-                response = requests.get(presente.url, headers=headers, timeout=10)
+                response = http_client.get(presente.url, headers=headers, timeout=10)
                 response.raise_for_status()
 
                 # Verificar se é uma imagem
@@ -61,9 +61,7 @@ class Command(BaseCommand):
                     error_count += 1
                     continue
 
-                # Converter para base64
                 imagem_data = response.content
-                imagem_base64 = base64.b64encode(imagem_data).decode('utf-8')
 
                 # Extrair nome do arquivo da URL
                 nome_arquivo = presente.url.split('/')[-1].split('?')[0]
@@ -72,15 +70,12 @@ class Command(BaseCommand):
 
                 # Salvar
                 if not dry_run:
-                    presente.imagem_base64 = imagem_base64
-                    presente.imagem_nome = nome_arquivo
-                    presente.imagem_tipo = content_type
-                    presente.imagem = None  # Limpar campo antigo
+                    presente.definir_imagem(imagem_data, nome_arquivo, content_type)
                     presente.save()
 
                 success_count += 1
                 self.stdout.write(
-                    self.style.SUCCESS(f'  ✓ Imagem convertida ({len(imagem_data)} bytes)')
+                    self.style.SUCCESS(f'  ✓ Imagem gravada ({len(imagem_data)} bytes)')
                 )
 
             except requests.exceptions.RequestException as e:
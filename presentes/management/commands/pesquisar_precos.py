@@ -3,11 +3,14 @@ Comando para executar a pesquisa de preços de todos os presentes ativos.
 
 Uso:
     python manage.py pesquisar_precos            # respeita o intervalo de 7 dias
+                                                 # (mas sempre retoma uma pesquisa interrompida)
     python manage.py pesquisar_precos --forcar   # executa imediatamente
+    python manage.py pesquisar_precos --workers 8
 """
 
 from django.core.management.base import BaseCommand
 
+from presentes.models import PesquisaPrecoLog
 from presentes.pesquisa_precos import executar_pesquisa, pesquisa_em_atraso
 
 
@@ -20,17 +23,24 @@ class Command(BaseCommand):
             action='store_true',
             help='Executa mesmo que a última pesquisa tenha menos de 7 dias'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Número de presentes pesquisados em paralelo (padrão: PESQUISA_PRECOS_WORKERS)'
+        )
 
     def handle(self, *args, **options):
-        if not options['forcar'] and not pesquisa_em_atraso():
+        interrompida = PesquisaPrecoLog.objects.filter(data_fim__isnull=True).exists()
+        if not options['forcar'] and not interrompida and not pesquisa_em_atraso():
             self.stdout.write(self.style.WARNING(
                 'Última pesquisa tem menos de 7 dias. Use --forcar para executar mesmo assim.'
             ))
             return
 
         self.stdout.write('Iniciando pesquisa de preços...')
-        log = executar_pesquisa(origem='comando')
+        log = executar_pesquisa(origem='comando', workers=options['workers'])
         self.stdout.write(self.style.SUCCESS(
-            f'Pesquisa concluída: {log.sucessos} sucessos, {log.erros} erros '
-            f'de {log.total_presentes} presentes.'
+            f'Pesquisa concluída: {log.sucessos} sucessos, {log.erros} erros, '
+            f'{log.pulados} já atualizados, de {log.total_presentes} presentes.'
         ))
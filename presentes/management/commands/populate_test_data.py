@@ -7,9 +7,8 @@ from django.utils import timezone
 
 from presentes.models import (
     Usuario, Presente, Grupo, GrupoMembro, Compra, Notificacao,
-    SugestaoCompra, PrecoHistorico, PesquisaPrecoLog,
+    SugestaoCompra, PrecoHistorico, PrecoEstatistica, PesquisaPrecoLog,
 )
-import base64
 import os
 import random
 import logging
@@ -29,7 +28,7 @@ CORES_IMAGEM = [
 
 def gerar_imagem_produto(emoji, nome):
     """
-    Gera uma imagem SVG de produto (gradiente + emoji + nome) em base64.
+    Gera uma imagem SVG de produto (gradiente + emoji + nome), em bytes.
     Offline e determinística — substitui o scraping de fotos, que era lento
     e falhava com frequência (bloqueio de bots nas lojas).
     """
@@ -48,7 +47,7 @@ def gerar_imagem_produto(emoji, nome):
         f'<text x="300" y="272" font-size="130" text-anchor="middle">{emoji}</text>'
         f'</svg>'
     )
-    return base64.b64encode(svg.encode('utf-8')).decode('utf-8')
+    return svg.encode('utf-8')
 
 
 class Command(BaseCommand):
@@ -222,17 +221,18 @@ class Command(BaseCommand):
             for descricao, url, preco_base, emoji in amostra:
                 status = 'ATIVO' if random.random() < 0.7 else 'COMPRADO'
 
-                presente = Presente.objects.create(
+                presente = Presente(
                     usuario=usuario,
                     grupo=grupo_teste,
                     descricao=descricao,
                     url=url,
                     preco=preco_base,
                     status=status,
-                    imagem_base64=gerar_imagem_produto(emoji, descricao),
-                    imagem_nome=f'{descricao[:40]}.svg',
-                    imagem_tipo='image/svg+xml'
                 )
+                presente.definir_imagem(
+                    gerar_imagem_produto(emoji, descricao), f'{descricao[:40]}.svg', 'image/svg+xml'
+                )
+                presente.save()
                 presentes_criados += 1
 
                 # Sugestões de compra (2 a 4 lojas com preços ao redor do base)
@@ -263,6 +263,8 @@ class Command(BaseCommand):
                         data=agora - timedelta(weeks=semanas_atras)
                     )
                     historicos_criados += 1
+                # Pontos criados direto (datas retroativas): refazer o resumo
+                PrecoEstatistica.recalcular(presente.pk)
 
                 # Compra + notificação para presentes comprados
                 if status == 'COMPRADO':
@@ -311,15 +313,15 @@ class Command(BaseCommand):
         from django.db.models import Q
         emoji_por_descricao = {d: e for d, _, _, e in presentes_exemplos}
         alvos = Presente.objects.filter(grupo=grupo_teste).filter(
-            Q(imagem_base64__isnull=True) | Q(imagem_base64='') | Q(imagem_tipo='image/svg+xml')
+            Q(imagem_blob__isnull=True, imagem_base64__isnull=True) | Q(imagem_base64='') | Q(imagem_tipo='image/svg+xml')
         )
         imagens_atualizadas = 0
         for presente in alvos:
             emoji = emoji_por_descricao.get(presente.descricao, '🎁')
-            presente.imagem_base64 = gerar_imagem_produto(emoji, presente.descricao)
-            presente.imagem_nome = f'{presente.descricao[:40]}.svg'
-            presente.imagem_tipo = 'image/svg+xml'
-            presente.save(update_fields=['imagem_base64', 'imagem_nome', 'imagem_tipo'])
+            presente.definir_imagem(
+                gerar_imagem_produto(emoji, presente.descricao), f'{presente.descricao[:40]}.svg', 'image/svg+xml'
+            )
+            presente.save(update_fields=['imagem_blob', 'imagem_base64', 'imagem_nome', 'imagem_tipo', 'imagem'])
             imagens_atualizadas += 1
         if imagens_atualizadas:
             self.stdout.write(self.style.SUCCESS(
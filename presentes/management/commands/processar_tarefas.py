@@ -0,0 +1,58 @@
+"""
+Consome a fila de tarefas em background (presentes/tarefas.py).
+
+Uso:
+    python manage.py processar_tarefas               # loop contínuo (serviço worker)
+    python manage.py processar_tarefas --workers 4
+    python manage.py processar_tarefas --uma-vez     # processa o que estiver disponível e sai
+
+Rodando como serviço separado, desative o trabalhador embutido no processo
+web com TAREFAS_TRABALHADOR_EMBUTIDO=False.
+"""
+
+from django.core.management.base import BaseCommand
+
+from presentes.models import Tarefa
+from presentes.pesquisa_precos import retomar_pesquisas
+from presentes.tarefas import Trabalhador
+
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas em background da fila persistente (buscas de preços, pesquisa semanal)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Tarefas executadas ao mesmo tempo (padrão: TAREFAS_WORKERS)'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=None,
+            help='Segundos entre consultas à fila quando ociosa (padrão: TAREFAS_INTERVALO)'
+        )
+        parser.add_argument(
+            '--uma-vez',
+            action='store_true',
+            help='Processa as tarefas disponíveis e termina (para cron)'
+        )
+
+    def handle(self, *args, **options):
+        trabalhador = Trabalhador(workers=options['workers'], intervalo=options['intervalo'])
+        retomar_pesquisas()
+        pendentes = Tarefa.objects.filter(status='pendente').count()
+        self.stdout.write(f'Trabalhador {trabalhador.id}: {trabalhador.workers} workers, {pendentes} tarefas pendentes')
+
+        if options['uma_vez']:
+            trabalhador.executar_ate_esvaziar()
+            restantes = Tarefa.objects.filter(status='pendente').count()
+            self.stdout.write(self.style.SUCCESS(f'Fila processada. Pendentes (em espera/backoff): {restantes}'))
+            return
+
+        try:
+            trabalhador.executar_continuamente()
+        except KeyboardInterrupt:
+            trabalhador.parar()
+            self.stdout.write(self.style.WARNING('Interrompido; tarefas em execução voltam para a fila quando o lease vencer'))
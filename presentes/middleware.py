@@ -0,0 +1,73 @@
+"""
+Middlewares do projeto e de terceiros adaptados para rodar também em modo ASGI.
+
+No ASGI (GUNICORN_ASGI=True, workers uvicorn) o Django só executa as
+views async no event loop se todos os middlewares aceitarem chamadas
+async; um único middleware só-síncrono faz a requisição inteira voltar
+para uma thread. O WhiteNoiseMiddleware 6.x é só-síncrono.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .limites import sem_espera
+
+
+class WhiteNoiseAsyncMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware que aceita get_response async: arquivos estáticos
+    são servidos numa thread (leitura de disco) e o resto segue async.
+    No WSGI o comportamento é o do WhiteNoise original.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class LimitesInterativosMiddleware:
+    """
+    Roda o request no modo sem_espera de presentes/limites.py: sem vez no
+    host externo dentro de LIMITES_ESPERA_INTERATIVA segundos, a chamada
+    (scraping, Zoom/Buscapé, IA, download de imagem) levanta EsperaExcedida
+    em vez de dormir segurando a thread do gunicorn. A espera completa fica
+    para o trabalhador da fila, que roda fora de requests.
+
+    Respostas em streaming geram o corpo depois deste middleware; elas usam
+    limites.iterar_sem_espera.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with sem_espera():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with sem_espera():
+            return await self.get_response(request)
@@ -0,0 +1,28 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presentes', '0007_precohistorico_pesquisaprecolog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheEntrada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('namespace', models.CharField(max_length=50)),
+                ('chave', models.CharField(help_text='sha256 de namespace + chave normalizada', max_length=64, unique=True)),
+                ('valor', models.JSONField()),
+                ('expira_em', models.DateTimeField()),
+                ('acessado_em', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Entrada de Cache',
+                'verbose_name_plural': 'Entradas de Cache',
+                'indexes': [models.Index(fields=['expira_em'], name='cache_expira_idx'), models.Index(fields=['acessado_em'], name='cache_acessado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presentes', '0008_cacheentrada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImagemBlob',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('dados', models.BinaryField()),
+                ('tipo', models.CharField(default='image/jpeg', help_text='MIME type da imagem', max_length=50)),
+                ('tamanho', models.PositiveIntegerField(default=0, help_text='Tamanho em bytes')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Imagem',
+                'verbose_name_plural': 'Imagens',
+            },
+        ),
+        migrations.AlterField(
+            model_name='grupo',
+            name='imagem_base64',
+            field=models.TextField(blank=True, help_text='Legado: imagem em base64 (ver migrar_imagens_blob)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='presente',
+            name='imagem_base64',
+            field=models.TextField(blank=True, help_text='Legado: imagem em base64 (ver migrar_imagens_blob)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='usuario',
+            name='foto_base64',
+            field=models.TextField(blank=True, help_text='Legado: foto em base64 (ver migrar_imagens_blob)', null=True),
+        ),
+        migrations.AddField(
+            model_name='grupo',
+            name='imagem_blob',
+            field=models.ForeignKey(blank=True, help_text='Bytes da imagem (ImagemBlob)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='grupos', to='presentes.imagemblob'),
+        ),
+        migrations.AddField(
+            model_name='presente',
+            name='imagem_blob',
+            field=models.ForeignKey(blank=True, help_text='Bytes da imagem (ImagemBlob)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='presentes', to='presentes.imagemblob'),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='foto_blob',
+            field=models.ForeignKey(blank=True, help_text='Bytes da foto (ImagemBlob)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usuarios', to='presentes.imagemblob'),
+        ),
+    ]
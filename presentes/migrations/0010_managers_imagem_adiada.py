@@ -0,0 +1,30 @@
+import presentes.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presentes', '0009_imagemblob'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='grupo',
+            options={'base_manager_name': 'objects', 'ordering': ['-data_criacao'], 'verbose_name': 'Grupo', 'verbose_name_plural': 'Grupos'},
+        ),
+        migrations.AlterModelOptions(
+            name='presente',
+            options={'base_manager_name': 'objects', 'ordering': ['-data_cadastro'], 'verbose_name': 'Presente', 'verbose_name_plural': 'Presentes'},
+        ),
+        migrations.AlterModelOptions(
+            name='usuario',
+            options={'base_manager_name': 'objects', 'verbose_name': 'Usuário', 'verbose_name_plural': 'Usuários'},
+        ),
+        migrations.AlterModelManagers(
+            name='usuario',
+            managers=[
+                ('objects', presentes.models.UsuarioManager()),
+            ],
+        ),
+    ]
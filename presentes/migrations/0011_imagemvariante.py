@@ -0,0 +1,31 @@
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presentes', '0010_managers_imagem_adiada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImagemVariante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tamanho', models.CharField(help_text='Nome do tamanho: avatar, card, modal', max_length=20)),
+                ('formato', models.CharField(help_text='Formato pedido: avif, webp ou jpeg', max_length=10)),
+                ('dados', models.BinaryField()),
+                ('tipo', models.CharField(help_text='MIME type gerado', max_length=50)),
+                ('bytes', models.PositiveIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('original', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variantes', to='presentes.imagemblob')),
+            ],
+            options={
+                'verbose_name': 'Variante de Imagem',
+                'verbose_name_plural': 'Variantes de Imagem',
+                'constraints': [models.UniqueConstraint(fields=('original', 'tamanho', 'formato'), name='variante_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presentes', '0011_imagemvariante'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarefa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(help_text='Nome registrado em presentes.tarefas.TAREFAS', max_length=50)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('prioridade', models.SmallIntegerField(default=50, help_text='Menor executa primeiro')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], default='pendente', max_length=20)),
+                ('chave', models.CharField(blank=True, help_text='Evita tarefas duplicadas: só uma pendente/executando por chave', max_length=100, null=True)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('max_tentativas', models.PositiveSmallIntegerField(default=5)),
+                ('disponivel_em', models.DateTimeField(default=django.utils.timezone.now, help_text='Não executa antes disso (backoff)')),
+                ('bloqueada_ate', models.DateTimeField(blank=True, help_text='Fim do lease do worker atual', null=True)),
+                ('bloqueada_por', models.CharField(blank=True, default='', max_length=100)),
+                ('ultimo_erro', models.TextField(blank=True, default='')),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciada_em', models.DateTimeField(blank=True, null=True)),
+                ('concluida_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Tarefa',
+                'verbose_name_plural': 'Tarefas',
+                'ordering': ['-criada_em'],
+                'indexes': [models.Index(fields=['status', 'prioridade', 'disponivel_em'], name='tarefa_fila_idx'), models.Index(fields=['status', 'bloqueada_ate'], name='tarefa_lease_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['pendente', 'executando'])), fields=('chave',), name='tarefa_chave_ativa_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presentes', '0012_tarefa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pesquisaprecolog',
+            name='pulados',
+            field=models.IntegerField(default=0, help_text='Presentes já atualizados durante esta pesquisa'),
+        ),
+        migrations.CreateModel(
+            name='PesquisaPrecoItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('sucesso', 'Sucesso'), ('erro', 'Erro'), ('pulado', 'Pulado (já atualizado)')], default='pendente', max_length=20)),
+                ('mensagem', models.CharField(blank=True, default='', max_length=255)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens', to='presentes.pesquisaprecolog')),
+                ('presente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens_pesquisa', to='presentes.presente')),
+            ],
+            options={
+                'verbose_name': 'Item de Pesquisa de Preços',
+                'verbose_name_plural': 'Itens de Pesquisa de Preços',
+                'indexes': [models.Index(fields=['log', 'status'], name='pesquisa_item_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('log', 'presente'), name='pesquisa_item_unico')],
+            },
+        ),
+    ]
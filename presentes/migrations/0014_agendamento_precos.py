@@ -0,0 +1,31 @@
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presentes', '0013_pesquisaprecoitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grupo',
+            name='data_evento',
+            field=models.DateField(blank=True, help_text='Data da troca de presentes (antecipa a atualização de preços perto dela)', null=True),
+        ),
+        migrations.AddField(
+            model_name='presente',
+            name='proxima_atualizacao',
+            field=models.DateTimeField(blank=True, help_text='Quando os preços devem ser pesquisados de novo (vazio = o quanto antes)', null=True),
+        ),
+        migrations.AddField(
+            model_name='presente',
+            name='visualizado_em',
+            field=models.DateTimeField(blank=True, help_text='Última vez que outro membro viu o presente (precisão de 1h)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='presente',
+            index=models.Index(fields=['status', 'proxima_atualizacao'], name='presente_agenda_idx'),
+        ),
+    ]
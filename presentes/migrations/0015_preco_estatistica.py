@@ -0,0 +1,60 @@
+# Generated by Django 5.1.9 on 2026-10-17 20:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, OuterRef, Subquery, Sum
+
+
+def preencher_estatisticas(apps, schema_editor):
+    """Calcula as estatísticas dos presentes que já têm histórico de preços."""
+    PrecoHistorico = apps.get_model('presentes', 'PrecoHistorico')
+    PrecoEstatistica = apps.get_model('presentes', 'PrecoEstatistica')
+
+    pontos = PrecoHistorico.objects.filter(preco__gt=0)
+    ultimo = pontos.filter(presente_id=OuterRef('presente_id')).order_by('-data', '-id')
+    resumos = (
+        pontos.values('presente_id')
+        .annotate(
+            total=Count('id'),
+            soma=Sum('preco'),
+            minimo=Min('preco'),
+            maximo=Max('preco'),
+            ultimo_preco=Subquery(ultimo.values('preco')[:1]),
+            atualizado_em=Subquery(ultimo.values('data')[:1]),
+        )
+        .order_by()
+    )
+    lote = []
+    for resumo in resumos.iterator(chunk_size=1000):
+        lote.append(PrecoEstatistica(**resumo))
+        if len(lote) >= 1000:
+            PrecoEstatistica.objects.bulk_create(lote)
+            lote = []
+    PrecoEstatistica.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presentes', '0014_agendamento_precos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecoEstatistica',
+            fields=[
+                ('presente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estatistica_preco', serialize=False, to='presentes.presente')),
+                ('ultimo_preco', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total', models.PositiveIntegerField(default=0, help_text='Pontos no histórico')),
+                ('soma', models.DecimalField(decimal_places=2, help_text='Soma dos preços (média = soma / total)', max_digits=16)),
+                ('minimo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('maximo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('atualizado_em', models.DateTimeField(help_text='Data do último ponto do histórico')),
+            ],
+            options={
+                'verbose_name': 'Estatística de Preço',
+                'verbose_name_plural': 'Estatísticas de Preço',
+            },
+        ),
+        migrations.RunPython(preencher_estatisticas, migrations.RunPython.noop),
+    ]
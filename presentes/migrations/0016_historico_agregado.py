@@ -0,0 +1,38 @@
+# Generated by Django 5.1.9 on 2026-10-17 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presentes', '0015_preco_estatistica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='precohistorico',
+            name='granularidade',
+            field=models.CharField(blank=True, choices=[('', 'Ponto'), ('dia', 'Agregado diário'), ('semana', 'Agregado semanal')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='precohistorico',
+            name='pontos',
+            field=models.PositiveIntegerField(default=1, help_text='Pontos originais representados por esta linha'),
+        ),
+        migrations.AddField(
+            model_name='precohistorico',
+            name='preco_maximo',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Agregados: maior preço do período', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='precohistorico',
+            name='preco_medio',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Agregados: média ponderada do período', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='precohistorico',
+            name='preco_minimo',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Agregados: menor preço do período', max_digits=10, null=True),
+        ),
+    ]
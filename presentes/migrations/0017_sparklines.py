@@ -0,0 +1,18 @@
+# Generated by Django 5.1.9 on 2026-10-17 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presentes', '0016_historico_agregado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='precoestatistica',
+            name='sparklines',
+            field=models.JSONField(blank=True, default=dict, help_text='Geometria pronta dos gráficos de evolução, por variante (presentes/sparkline.py)'),
+        ),
+    ]
@@ -1,7 +1,86 @@
-from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.db import IntegrityError, models, transaction
+from django.db.models import ExpressionWrapper, F, Max, Min, Q, Sum, Value, Window
+from django.db.models.functions import Coalesce, Greatest, Least, RowNumber
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.utils import timezone
 import secrets
+from decimal import Decimal
+
+
+def _anotacao_imagem(campo_blob, campo_base64):
+    """Booleano calculado no banco: tem blob ou base64 legado (sem trazer a coluna)."""
+    return ExpressionWrapper(
+        Q(**{f'{campo_blob}__isnull': False})
+        | (Q(**{f'{campo_base64}__isnull': False}) & ~Q(**{campo_base64: ''})),
+        output_field=models.BooleanField(),
+    )
+
+
+class ImagemAdiadaManager(models.Manager):
+    """
+    Manager padrão de Grupo e Presente: não carrega imagem_base64 (legado,
+    pode ter megabytes) e anota possui_imagem, usado por tem_imagem().
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer('imagem_base64').annotate(
+            possui_imagem=_anotacao_imagem('imagem_blob', 'imagem_base64')
+        )
+
+
+class UsuarioManager(UserManager):
+    """Como ImagemAdiadaManager, para a foto do usuario (foto_base64 / possui_foto)."""
+
+    def get_queryset(self):
+        return super().get_queryset().defer('foto_base64').annotate(
+            possui_foto=_anotacao_imagem('foto_blob', 'foto_base64')
+        )
+
+
+class ImagemBlob(models.Model):
+    """
+    Bytes de uma imagem (presente, grupo ou foto de usuário), endereçados pelo
+    sha256 do conteúdo. Ficam fora das tabelas principais para que as listagens
+    não carreguem imagens; imagens iguais são gravadas uma vez só.
+    Gravação/leitura em presentes/imagens.py.
+    """
+    hash = models.CharField(max_length=64, primary_key=True)
+    dados = models.BinaryField()
+    tipo = models.CharField(max_length=50, default='image/jpeg', help_text='MIME type da imagem')
+    tamanho = models.PositiveIntegerField(default=0, help_text='Tamanho em bytes')
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Imagem'
+        verbose_name_plural = 'Imagens'
+
+    def __str__(self):
+        return f"{self.hash[:12]} ({self.tipo}, {self.tamanho} bytes)"
+
+
+class ImagemVariante(models.Model):
+    """
+    Versão reduzida de um ImagemBlob (card, modal, avatar) num formato
+    aceito pelo navegador (avif/webp/jpeg). Gerada sob demanda na primeira
+    requisição com ?tamanho= e reaproveitada depois (presentes/imagens.py).
+    """
+    original = models.ForeignKey(ImagemBlob, on_delete=models.CASCADE, related_name='variantes')
+    tamanho = models.CharField(max_length=20, help_text='Nome do tamanho: avatar, card, modal')
+    formato = models.CharField(max_length=10, help_text='Formato pedido: avif, webp ou jpeg')
+    dados = models.BinaryField()
+    tipo = models.CharField(max_length=50, help_text='MIME type gerado')
+    bytes = models.PositiveIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Variante de Imagem'
+        verbose_name_plural = 'Variantes de Imagem'
+        constraints = [
+            models.UniqueConstraint(fields=['original', 'tamanho', 'formato'], name='variante_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.original_id[:12]} {self.tamanho}/{self.formato} ({self.bytes} bytes)"
 
 
 class Grupo(models.Model):
@@ -14,15 +93,32 @@ class Grupo(models.Model):
     codigo_convite = models.CharField(max_length=32, unique=True, editable=False)
     ativo = models.BooleanField(default=True)
     data_criacao = models.DateTimeField(auto_now_add=True)
+    data_evento = models.DateField(
+        null=True,
+        blank=True,
+        help_text='Data da troca de presentes (antecipa a atualização de preços perto dela)'
+    )
 
     # Campos para imagem do grupo (mesmo padrao de Presente)
-    imagem_base64 = models.TextField(blank=True, null=True, help_text='Imagem codificada em base64')
+    imagem_blob = models.ForeignKey(
+        ImagemBlob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='grupos',
+        help_text='Bytes da imagem (ImagemBlob)'
+    )
+    imagem_base64 = models.TextField(blank=True, null=True, help_text='Legado: imagem em base64 (ver migrar_imagens_blob)')
     imagem_nome = models.CharField(max_length=255, blank=True, null=True, help_text='Nome original do arquivo')
     imagem_tipo = models.CharField(max_length=50, blank=True, null=True, help_text='MIME type da imagem')
 
+    objects = ImagemAdiadaManager()
+
     class Meta:
         verbose_name = 'Grupo'
         verbose_name_plural = 'Grupos'
+        # Acesso por FK (ex.: usuario.grupo_ativo) também sem a coluna pesada
+        base_manager_name = 'objects'
         ordering = ['-data_criacao']
         indexes = [
             models.Index(fields=['codigo_convite'], name='grupo_codigo_idx'),
@@ -45,15 +141,36 @@ class Grupo(models.Model):
         return f"{base_url}/grupos/convite/{self.codigo_convite}/"
 
     def tem_imagem(self):
-        """Verifica se o grupo tem imagem"""
-        return bool(self.imagem_base64)
-
-    def get_imagem_url(self):
-        """Retorna a URL da imagem do grupo"""
-        if self.imagem_base64:
-            return f'/grupo/{self.id}/imagem/'
+        """Verifica se o grupo tem imagem (usa a anotação possui_imagem, se houver)"""
+        if 'possui_imagem' in self.__dict__:
+            return self.possui_imagem
+        return bool(self.imagem_blob_id or self.imagem_base64)
+
+    def get_imagem_url(self, tamanho=None):
+        """Retorna a URL da imagem do grupo (versionada pelo hash; tamanho: avatar/card/modal)"""
+        if self.tem_imagem():
+            from .imagens import url_versionada
+            return url_versionada(f'/grupo/{self.id}/imagem/', self.imagem_blob_id, tamanho)
         return None
 
+    def definir_imagem(self, dados, nome=None, tipo=None):
+        """Grava os bytes no ImagemBlob e aponta o grupo para ele (não chama save)."""
+        from .imagens import guardar_imagem
+        self.imagem_blob_id = guardar_imagem(dados, tipo)
+        self.imagem_nome = nome
+        self.imagem_tipo = tipo
+        self.imagem_base64 = None
+        self.possui_imagem = True
+
+    def obter_imagem(self):
+        """Retorna (bytes, content_type) da imagem, ou (None, None)."""
+        from .imagens import ler_imagem
+        if not self.tem_imagem():
+            return None, None
+        # Só lê a coluna adiada imagem_base64 se a linha ainda não foi migrada
+        base64_legado = None if self.imagem_blob_id else self.imagem_base64
+        return ler_imagem(self.imagem_blob_id, base64_legado, self.imagem_tipo)
+
 
 class Usuario(AbstractUser):
     email = models.EmailField(unique=True)
@@ -61,7 +178,15 @@ class Usuario(AbstractUser):
     ativo = models.BooleanField(default=True)
     data_cadastro = models.DateTimeField(auto_now_add=True)
     avatar = models.CharField(max_length=50, blank=True, default='avatar-1', help_text='ID do avatar pre-definido')
-    foto_base64 = models.TextField(blank=True, null=True, help_text='Foto do usuario em base64')
+    foto_blob = models.ForeignKey(
+        ImagemBlob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='usuarios',
+        help_text='Bytes da foto (ImagemBlob)'
+    )
+    foto_base64 = models.TextField(blank=True, null=True, help_text='Legado: foto em base64 (ver migrar_imagens_blob)')
     foto_tipo = models.CharField(max_length=50, blank=True, null=True, help_text='MIME type da foto')
     grupo_ativo = models.ForeignKey(
         Grupo,
@@ -75,13 +200,52 @@ class Usuario(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
+    objects = UsuarioManager()
+
     class Meta:
         verbose_name = 'Usuário'
         verbose_name_plural = 'Usuários'
+        base_manager_name = 'objects'
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+    def tem_foto(self):
+        """Verifica se o usuario enviou uma foto (senão usa o avatar emoji)"""
+        if 'possui_foto' in self.__dict__:
+            return self.possui_foto
+        return bool(self.foto_blob_id or self.foto_base64)
+
+    def get_foto_url(self, tamanho=None):
+        """Retorna a URL da foto do usuario (versionada pelo hash; tamanho: avatar/card/modal)"""
+        if self.tem_foto():
+            from .imagens import url_versionada
+            return url_versionada(f'/usuario/{self.id}/foto/', self.foto_blob_id, tamanho)
+        return None
+
+    def definir_foto(self, dados, tipo=None):
+        """Grava a foto no ImagemBlob (não chama save)."""
+        from .imagens import guardar_imagem
+        self.foto_blob_id = guardar_imagem(dados, tipo)
+        self.foto_tipo = tipo
+        self.foto_base64 = None
+        self.possui_foto = True
+
+    def remover_foto(self):
+        """Volta a usar o avatar emoji (não chama save)."""
+        self.foto_blob_id = None
+        self.foto_tipo = None
+        self.foto_base64 = None
+        self.possui_foto = False
+
+    def obter_foto(self):
+        """Retorna (bytes, content_type) da foto, ou (None, None)."""
+        from .imagens import ler_imagem
+        if not self.tem_foto():
+            return None, None
+        base64_legado = None if self.foto_blob_id else self.foto_base64
+        return ler_imagem(self.foto_blob_id, base64_legado, self.foto_tipo)
+
     def get_grupos(self):
         """Retorna todos os grupos que o usuario pertence"""
         return Grupo.objects.filter(membros__usuario=self, ativo=True).distinct()
@@ -147,17 +311,40 @@ class Presente(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ATIVO')
     data_cadastro = models.DateTimeField(auto_now_add=True)
 
+    # Agendamento da atualização de preços (presentes/pesquisa_precos.py)
+    proxima_atualizacao = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Quando os preços devem ser pesquisados de novo (vazio = o quanto antes)'
+    )
+    visualizado_em = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Última vez que outro membro viu o presente (precisão de 1h)'
+    )
+
     # Campo antigo (mantido para compatibilidade)
     imagem = models.ImageField(upload_to='presentes/', blank=True, null=True)
 
     # Campos novos para armazenar imagem no BD
-    imagem_base64 = models.TextField(blank=True, null=True, help_text='Imagem codificada em base64')
+    imagem_blob = models.ForeignKey(
+        ImagemBlob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='presentes',
+        help_text='Bytes da imagem (ImagemBlob)'
+    )
+    imagem_base64 = models.TextField(blank=True, null=True, help_text='Legado: imagem em base64 (ver migrar_imagens_blob)')
     imagem_nome = models.CharField(max_length=255, blank=True, null=True, help_text='Nome original do arquivo')
     imagem_tipo = models.CharField(max_length=50, blank=True, null=True, help_text='MIME type da imagem')
 
+    objects = ImagemAdiadaManager()
+
     class Meta:
         verbose_name = 'Presente'
         verbose_name_plural = 'Presentes'
+        base_manager_name = 'objects'
         ordering = ['-data_cadastro']
         indexes = [
             models.Index(fields=['grupo', 'usuario', 'status'], name='presente_grp_user_status_idx'),
@@ -166,23 +353,51 @@ class Presente(models.Model):
             models.Index(fields=['usuario', 'status'], name='presente_usuario_status_idx'),
             models.Index(fields=['status', '-data_cadastro'], name='presente_status_data_idx'),
             models.Index(fields=['-data_cadastro'], name='presente_data_idx'),
+            models.Index(fields=['status', 'proxima_atualizacao'], name='presente_agenda_idx'),
         ]
 
     def __str__(self):
         return f"{self.descricao[:50]} - {self.usuario}"
 
+    def _imagem_no_banco(self):
+        """Blob ou base64 legado (usa a anotação possui_imagem, se houver)"""
+        if 'possui_imagem' in self.__dict__:
+            return self.possui_imagem
+        return bool(self.imagem_blob_id or self.imagem_base64)
+
     def tem_imagem(self):
         """Verifica se o presente tem imagem (novo formato ou antigo)"""
-        return bool(self.imagem_base64 or self.imagem)
+        return bool(self._imagem_no_banco() or self.imagem)
 
-    def get_imagem_url(self):
-        """Retorna a URL da imagem (novo formato tem prioridade)"""
-        if self.imagem_base64:
-            return f'/presente/{self.id}/imagem/'
+    def get_imagem_url(self, tamanho=None):
+        """Retorna a URL da imagem (novo formato tem prioridade; tamanho: avatar/card/modal)"""
+        if self._imagem_no_banco():
+            from .imagens import url_versionada
+            return url_versionada(f'/presente/{self.id}/imagem/', self.imagem_blob_id, tamanho)
         elif self.imagem:
             return self.imagem.url
         return None
 
+    def definir_imagem(self, dados, nome=None, tipo=None):
+        """Grava os bytes no ImagemBlob e aponta o presente para ele (não chama save)."""
+        from .imagens import guardar_imagem
+        self.imagem_blob_id = guardar_imagem(dados, tipo)
+        self.imagem_nome = nome
+        self.imagem_tipo = tipo
+        self.imagem_base64 = None
+        self.possui_imagem = True
+        # Limpar o campo antigo para economizar espaço
+        self.imagem = None
+
+    def obter_imagem(self):
+        """Retorna (bytes, content_type) da imagem no banco, ou (None, None)."""
+        from .imagens import ler_imagem
+        if not self._imagem_no_banco():
+            return None, None
+        # Só lê a coluna adiada imagem_base64 se a linha ainda não foi migrada
+        base64_legado = None if self.imagem_blob_id else self.imagem_base64
+        return ler_imagem(self.imagem_blob_id, base64_legado, self.imagem_tipo)
+
     def registrar_preco(self, preco, loja='', fonte='sistema'):
         """Registra um ponto no histórico de preços (sem duplicar o último valor)."""
         if preco is None:
@@ -190,29 +405,34 @@ class Presente(models.Model):
         ultimo = self.historico_precos.order_by('-data').first()
         if ultimo and ultimo.preco == preco:
             return None
-        return PrecoHistorico.objects.create(
+        ponto = PrecoHistorico.objects.create(
             presente=self,
             preco=preco,
             loja=(loja or '')[:200],
             fonte=fonte
         )
+        PrecoEstatistica.registrar(self.pk, ponto.preco, ponto.data)
+        return ponto
 
     def temperatura(self):
         """
         Temperatura do preço: compara o preço mais recente com a média do histórico.
         Quente (caiu >= 5%) = bom momento de compra; Frio (subiu >= 5%) = aguardar.
-        Usa o cache do prefetch_related('historico_precos') quando disponível.
+        Lê as estatísticas materializadas (PrecoEstatistica), sem carregar o
+        histórico; nas listagens use select_related('estatistica_preco').
         """
-        pontos = sorted(self.historico_precos.all(), key=lambda p: p.data)
-        precos = [float(p.preco) for p in pontos if p.preco]
-        if len(precos) < 2:
+        try:
+            estatistica = self.estatistica_preco
+        except PrecoEstatistica.DoesNotExist:
+            estatistica = None
+        if estatistica is None or estatistica.total < 2:
             return {
                 'codigo': 'sem_dados', 'icone': 'bi-thermometer-half',
                 'label': 'Sem histórico', 'css': 'bg-base-200 text-base-content/50',
                 'variacao': None,
             }
-        atual = precos[-1]
-        media = sum(precos[:-1]) / len(precos[:-1])
+        atual = float(estatistica.ultimo_preco)
+        media = estatistica.media_anterior
         variacao = ((atual - media) / media * 100) if media else 0
         if variacao <= -5:
             return {
@@ -233,11 +453,38 @@ class Presente(models.Model):
         }
 
 
+class PrecoHistoricoQuerySet(models.QuerySet):
+    def ultimos(self, n):
+        """
+        Só os últimos n pontos de cada presente, numa consulta (ROW_NUMBER()
+        particionado por presente), em ordem cronológica. Pode ser usado
+        como queryset de Prefetch('historico_precos', ...).
+        """
+        return self.annotate(
+            posicao=Window(
+                RowNumber(),
+                partition_by=[F('presente_id')],
+                order_by=[F('data').desc(), F('id').desc()],
+            )
+        ).filter(posicao__lte=n).order_by('presente_id', 'data', 'id')
+
+
 class PrecoHistorico(models.Model):
     """
     Ponto do histórico de preços de um presente (estilo priceHistory do LPII).
     Alimentado no cadastro, nas buscas de sugestões e na pesquisa semanal.
+
+    Pontos antigos são agregados por dia ou semana (presentes/retencao_precos.py):
+    a linha agregada mantém o último preço do período em `preco` e guarda a
+    média ponderada, mínimo/máximo do período e quantos pontos originais
+    representa.
     """
+    GRANULARIDADE_CHOICES = [
+        ('', 'Ponto'),
+        ('dia', 'Agregado diário'),
+        ('semana', 'Agregado semanal'),
+    ]
+
     presente = models.ForeignKey(
         Presente,
         on_delete=models.CASCADE,
@@ -251,6 +498,13 @@ class PrecoHistorico(models.Model):
         help_text='Origem do registro: cadastro, sugestao, aplicado, pesquisa_semanal'
     )
     data = models.DateTimeField(auto_now_add=True)
+    granularidade = models.CharField(max_length=10, choices=GRANULARIDADE_CHOICES, default='', blank=True)
+    preco_minimo = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text='Agregados: menor preço do período')
+    preco_maximo = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text='Agregados: maior preço do período')
+    preco_medio = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text='Agregados: média ponderada do período')
+    pontos = models.PositiveIntegerField(default=1, help_text='Pontos originais representados por esta linha')
+
+    objects = PrecoHistoricoQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Histórico de Preço'
@@ -264,6 +518,105 @@ class PrecoHistorico(models.Model):
         return f"{self.presente_id} - R$ {self.preco} ({self.data:%d/%m/%Y})"
 
 
+class PrecoEstatistica(models.Model):
+    """
+    Resumo do histórico de preços de um presente (só preços > 0), mantido
+    incrementalmente por Presente.registrar_preco. Permite calcular a
+    temperatura sem ler as linhas de PrecoHistorico.
+    """
+    presente = models.OneToOneField(
+        Presente,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='estatistica_preco'
+    )
+    ultimo_preco = models.DecimalField(max_digits=10, decimal_places=2)
+    total = models.PositiveIntegerField(default=0, help_text='Pontos no histórico')
+    soma = models.DecimalField(max_digits=16, decimal_places=2, help_text='Soma dos preços (média = soma / total)')
+    minimo = models.DecimalField(max_digits=10, decimal_places=2)
+    maximo = models.DecimalField(max_digits=10, decimal_places=2)
+    atualizado_em = models.DateTimeField(help_text='Data do último ponto do histórico')
+    sparklines = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Geometria pronta dos gráficos de evolução, por variante (presentes/sparkline.py)'
+    )
+
+    class Meta:
+        verbose_name = 'Estatística de Preço'
+        verbose_name_plural = 'Estatísticas de Preço'
+
+    def __str__(self):
+        return f"{self.presente_id} - {self.total} pontos, último R$ {self.ultimo_preco}"
+
+    @property
+    def media(self):
+        return float(self.soma) / self.total if self.total else None
+
+    @property
+    def media_anterior(self):
+        """Média dos preços anteriores ao último (base da temperatura)."""
+        if self.total < 2:
+            return None
+        return float(self.soma - self.ultimo_preco) / (self.total - 1)
+
+    @classmethod
+    def registrar(cls, presente_id, preco, data):
+        """Soma um novo ponto às estatísticas (UPDATE atômico; cria no primeiro ponto)."""
+        if not preco:
+            return
+        preco = Decimal(str(preco)).quantize(Decimal('0.01'))
+        atualizadas = cls.objects.filter(presente_id=presente_id).update(
+            ultimo_preco=preco,
+            total=F('total') + 1,
+            soma=F('soma') + preco,
+            minimo=Least('minimo', Value(preco)),
+            maximo=Greatest('maximo', Value(preco)),
+            atualizado_em=data,
+        )
+        if not atualizadas:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(
+                        presente_id=presente_id, ultimo_preco=preco, total=1, soma=preco,
+                        minimo=preco, maximo=preco, atualizado_em=data,
+                    )
+            except IntegrityError:
+                # Criada em paralelo pelo primeiro ponto de outra requisição
+                cls.registrar(presente_id, preco, data)
+                return
+        cls.atualizar_sparklines(presente_id)
+
+    @classmethod
+    def atualizar_sparklines(cls, presente_id):
+        """Recalcula e grava a geometria dos gráficos do presente; retorna o dict gravado."""
+        from .sparkline import calcular_sparklines
+        sparklines = calcular_sparklines(presente_id)
+        cls.objects.filter(presente_id=presente_id).update(sparklines=sparklines)
+        return sparklines
+
+    @classmethod
+    def recalcular(cls, presente_id):
+        """Refaz as estatísticas a partir do histórico (após editar ou apagar pontos)."""
+        pontos = PrecoHistorico.objects.filter(presente_id=presente_id, preco__gt=0)
+        # Linhas agregadas valem pelos pontos que representam
+        resumo = pontos.aggregate(
+            total=Sum('pontos'),
+            soma=Sum(Coalesce('preco_medio', 'preco') * F('pontos')),
+            minimo=Min(Coalesce('preco_minimo', 'preco')),
+            maximo=Max(Coalesce('preco_maximo', 'preco')),
+        )
+        ultimo = pontos.order_by('-data', '-id').values_list('preco', 'data').first()
+        if ultimo is None:
+            cls.objects.filter(presente_id=presente_id).delete()
+            return
+        cls.objects.update_or_create(
+            presente_id=presente_id,
+            defaults={**resumo, 'ultimo_preco': ultimo[0], 'atualizado_em': ultimo[1]},
+        )
+        cls.atualizar_sparklines(presente_id)
+
+
 class PesquisaPrecoLog(models.Model):
     """Registro de execuções da pesquisa de preços (semanal automática ou manual)."""
     ORIGEM_CHOICES = [
@@ -277,6 +630,7 @@ class PesquisaPrecoLog(models.Model):
     total_presentes = models.IntegerField(default=0)
     sucessos = models.IntegerField(default=0)
     erros = models.IntegerField(default=0)
+    pulados = models.IntegerField(default=0, help_text='Presentes já atualizados durante esta pesquisa')
 
     class Meta:
         verbose_name = 'Pesquisa de Preços'
@@ -287,6 +641,114 @@ class PesquisaPrecoLog(models.Model):
         return f"Pesquisa {self.get_origem_display()} em {self.data_inicio:%d/%m/%Y %H:%M}"
 
 
+class PesquisaPrecoItem(models.Model):
+    """
+    Progresso de um presente dentro de uma pesquisa de preços (checkpoint).
+    Permite retomar a pesquisa após reinício sem refazer os já concluídos.
+    """
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('sucesso', 'Sucesso'),
+        ('erro', 'Erro'),
+        ('pulado', 'Pulado (já atualizado)'),
+    ]
+    log = models.ForeignKey(PesquisaPrecoLog, on_delete=models.CASCADE, related_name='itens')
+    presente = models.ForeignKey(Presente, on_delete=models.CASCADE, related_name='itens_pesquisa')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    mensagem = models.CharField(max_length=255, blank=True, default='')
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Item de Pesquisa de Preços'
+        verbose_name_plural = 'Itens de Pesquisa de Preços'
+        constraints = [
+            models.UniqueConstraint(fields=['log', 'presente'], name='pesquisa_item_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['log', 'status'], name='pesquisa_item_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.log_id}/{self.presente_id}: {self.status}"
+
+
+class CacheEntrada(models.Model):
+    """
+    Entrada do cache de resultados em banco (backend 'banco' de presentes/cache.py).
+    Compartilhado entre processos/instâncias, ao contrário do cache em memória.
+    """
+    namespace = models.CharField(max_length=50)
+    chave = models.CharField(max_length=64, unique=True, help_text='sha256 de namespace + chave normalizada')
+    valor = models.JSONField()
+    expira_em = models.DateTimeField()
+    acessado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Entrada de Cache'
+        verbose_name_plural = 'Entradas de Cache'
+        indexes = [
+            models.Index(fields=['expira_em'], name='cache_expira_idx'),
+            models.Index(fields=['acessado_em'], name='cache_acessado_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.namespace}:{self.chave[:12]}"
+
+
+class Tarefa(models.Model):
+    """
+    Tarefa da fila de trabalhos em background (presentes/tarefas.py).
+
+    Sobrevive ao reinício do worker do gunicorn: uma tarefa em execução
+    cujo lease (bloqueada_ate) venceu volta a ser reivindicada por outro
+    processo. Menor `prioridade` executa primeiro.
+    """
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('executando', 'Executando'),
+        ('concluida', 'Concluída'),
+        ('falhou', 'Falhou'),
+    ]
+    tipo = models.CharField(max_length=50, help_text='Nome registrado em presentes.tarefas.TAREFAS')
+    parametros = models.JSONField(default=dict, blank=True)
+    prioridade = models.SmallIntegerField(default=50, help_text='Menor executa primeiro')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    chave = models.CharField(
+        max_length=100,
+        null=True,
+        blank=True,
+        help_text='Evita tarefas duplicadas: só uma pendente/executando por chave'
+    )
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    max_tentativas = models.PositiveSmallIntegerField(default=5)
+    disponivel_em = models.DateTimeField(default=timezone.now, help_text='Não executa antes disso (backoff)')
+    bloqueada_ate = models.DateTimeField(null=True, blank=True, help_text='Fim do lease do worker atual')
+    bloqueada_por = models.CharField(max_length=100, blank=True, default='')
+    ultimo_erro = models.TextField(blank=True, default='')
+    criada_em = models.DateTimeField(auto_now_add=True)
+    iniciada_em = models.DateTimeField(null=True, blank=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Tarefa'
+        verbose_name_plural = 'Tarefas'
+        ordering = ['-criada_em']
+        indexes = [
+            models.Index(fields=['status', 'prioridade', 'disponivel_em'], name='tarefa_fila_idx'),
+            models.Index(fields=['status', 'bloqueada_ate'], name='tarefa_lease_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['chave'],
+                condition=Q(status__in=['pendente', 'executando']),
+                name='tarefa_chave_ativa_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.get_status_display()})"
+
+
 class Compra(models.Model):
     grupo = models.ForeignKey(
         Grupo,
@@ -0,0 +1,129 @@
+"""
+Paginação por cursor (keyset) da visualização por produto de lista_usuarios.
+
+Com OFFSET o banco monta e descarta todas as linhas anteriores à página
+pedida; com cursor cada página continua de onde a anterior parou
+(WHERE chave > última chave vista ... LIMIT n). O custo de uma página não
+cresce com o tamanho do grupo, e presentes cadastrados ou comprados entre
+duas páginas não causam repetições nem buracos.
+
+A chave de cada ordenação é (status, campo escolhido, id):
+- status vem primeiro para manter os disponíveis antes dos comprados
+  ('ATIVO' < 'COMPRADO'), usando o índice (grupo, status, -data_cadastro);
+- id desempata presentes com o mesmo valor no campo escolhido;
+- preço e melhor preço podem ser nulos e NULL não é comparável, então
+  entram com Coalesce para um sentinela que os deixa por último nos dois
+  sentidos.
+
+O cursor é assinado (django.core.signing): um cursor adulterado, expirado
+ou de outra ordenação só faz a listagem recomeçar da primeira página.
+"""
+from decimal import Decimal
+
+from django.core import signing
+from django.db.models import DecimalField, F, Q, Value
+from django.db.models.functions import Coalesce
+
+SALT_CURSOR = 'presentes.paginacao.cursor'
+# Maior valor de DecimalField(max_digits=10, decimal_places=2)
+SEM_PRECO_CRESCENTE = Decimal('99999999.99')
+SEM_PRECO_DECRESCENTE = Decimal('-1')
+
+# opção de ?ordenar= -> (campo ou anotação, descendente)
+ORDENACOES = {
+    'produto': ('descricao', False),
+    '-produto': ('descricao', True),
+    'usuario': ('usuario__first_name', False),
+    '-usuario': ('usuario__first_name', True),
+    'preco': ('preco', False),
+    '-preco': ('preco', True),
+    'melhor_preco': ('melhor_preco', False),
+    '-melhor_preco': ('melhor_preco', True),
+    'data': ('data_cadastro', False),
+    '-data': ('data_cadastro', True),
+}
+ORDENACAO_PADRAO = '-data'
+CAMPOS_PRECO = {'preco', 'melhor_preco'}
+
+
+def normalizar_ordenacao(ordenar_por):
+    """Opção válida de ORDENACOES ('-data_cadastro', o padrão antigo, vira '-data')."""
+    return ordenar_por if ordenar_por in ORDENACOES else ORDENACAO_PADRAO
+
+
+def _chave(ordenar_por):
+    campo, descendente = ORDENACOES[ordenar_por]
+    if campo in CAMPOS_PRECO:
+        sentinela = SEM_PRECO_DECRESCENTE if descendente else SEM_PRECO_CRESCENTE
+        expressao = Coalesce(
+            F(campo), Value(sentinela),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+    else:
+        expressao = F(campo)
+    return expressao, descendente
+
+
+def _serializar(valor):
+    # Decimal e datetime voltam como string; os lookups do campo convertem de volta
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def _depois_de(chaves, valores):
+    """Q de "vem depois de valores" na ordem lexicográfica de chaves [(nome, descendente)]."""
+    filtro = Q()
+    for i, (nome, descendente) in enumerate(chaves):
+        condicao = Q(**{f'{nome}__{"lt" if descendente else "gt"}': valores[i]})
+        for j, (nome_anterior, _) in enumerate(chaves[:i]):
+            condicao &= Q(**{nome_anterior: valores[j]})
+        filtro |= condicao
+    return filtro
+
+
+def ler_cursor(cursor, ordenar_por):
+    """Valores da chave guardados no cursor, ou None (primeira página)."""
+    if not cursor:
+        return None
+    try:
+        dados = signing.loads(cursor, salt=SALT_CURSOR)
+    except signing.BadSignature:
+        return None
+    if not isinstance(dados, dict) or dados.get('o') != ordenar_por:
+        return None
+    valores = dados.get('v')
+    if not isinstance(valores, list) or len(valores) != 3:
+        return None
+    return valores
+
+
+def paginar_por_cursor(queryset, ordenar_por, cursor=None, por_pagina=30):
+    """
+    Uma página de `queryset` na ordenação `ordenar_por` (opção de ORDENACOES),
+    começando depois do cursor. Retorna (itens, cursor da próxima página ou None).
+    """
+    ordenar_por = normalizar_ordenacao(ordenar_por)
+    expressao, descendente = _chave(ordenar_por)
+    chaves = [('status', False), ('chave_ordenacao', descendente), ('id', descendente)]
+
+    queryset = queryset.annotate(chave_ordenacao=expressao).order_by(
+        *(f'-{nome}' if desc else nome for nome, desc in chaves)
+    )
+    valores = ler_cursor(cursor, ordenar_por)
+    if valores is not None:
+        queryset = queryset.filter(_depois_de(chaves, valores))
+
+    # Um a mais só para saber se existe próxima página
+    itens = list(queryset[:por_pagina + 1])
+    if len(itens) <= por_pagina:
+        return itens, None
+    itens = itens[:por_pagina]
+    ultimo = itens[-1]
+    proximo = signing.dumps(
+        {'o': ordenar_por, 'v': [_serializar(ultimo.status), _serializar(ultimo.chave_ordenacao), ultimo.id]},
+        salt=SALT_CURSOR,
+    )
+    return itens, proximo
@@ -5,24 +5,67 @@ A cada semana o sistema refaz a busca de sugestões/preços de todos os
 presentes ativos, alimentando o histórico (PrecoHistorico) usado pelo
 indicador de temperatura e pelo gráfico de evolução.
 
-Como o Render Free Tier não possui cron, a pesquisa é disparada de duas formas:
-- Automática: middleware verifica a cada request (com throttle de 1h por
-  processo) se a última execução tem mais de 7 dias e dispara em background.
+Agendamento por presente (PRECOS_AGENDAMENTO, padrão): em vez de refazer
+todos a cada 7 dias, cada presente tem sua proxima_atualizacao, calculada
+a partir da volatilidade do histórico de preços, da proximidade da data do
+evento do grupo e de visualizações recentes. A cada PRECOS_TICK segundos o
+middleware enfileira só os presentes vencidos, no máximo PRECOS_LOTE por vez.
+
+Pesquisa completa (todos os presentes de uma vez):
+- Automática: com PRECOS_AGENDAMENTO=False, o middleware verifica se a
+  última execução tem mais de 7 dias e a enfileira.
 - Externa: comando `python manage.py pesquisar_precos` para cron/agendador.
+
+Cada execução vira uma tarefa 'pesquisar_presente' por presente na fila
+persistente (presentes/tarefas.py), com prioridade de varredura: a busca
+de preços de um presente recém-cadastrado (prioridade de usuário) passa
+na frente. O trabalhador da fila limita quantos presentes rodam ao mesmo
+tempo (TAREFAS_WORKERS); o teto global de PESQUISA_PRECOS_POR_MINUTO
+presentes por minuto e os limites por site (requisições simultâneas,
+requisições por minuto e disjuntor) continuam valendo (ver
+presentes/limites.py): um site bloqueando é pulado até voltar, e o tempo
+da pesquisa fica com as fontes que estão respondendo.
+
+A parte de IA é consultada em lote: em vez das tarefas individuais entram
+tarefas 'consultar_ia_lote' com IA_LOTE_TAMANHO presentes por chamada ao
+Gemini, e só depois da chamada cada lote enfileira as tarefas dos seus
+presentes, que usam a sua parte da resposta (pelo cache de sugestões de
+IA). Quem ficar de fora (resposta parcial ou chamada com erro) consulta a
+IA individualmente.
+
+O progresso fica em PesquisaPrecoItem (um por presente): após um reinício
+a pesquisa continua do ponto em que parou (retomar_pesquisas) e presentes
+já atualizados durante a pesquisa, inclusive pela busca do próprio
+usuário, são pulados.
 """
 import logging
+import random
+import statistics
 import threading
 import time
 
 from datetime import timedelta
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
 from django.utils import timezone
 
+from .cache import impressao_digital
+from .tarefas import garantir_trabalhador_embutido
+
 logger = logging.getLogger(__name__)
 
 INTERVALO_PESQUISA = timedelta(days=7)
 
+# Chave de deduplicação: uma pesquisa completa na fila por vez
+CHAVE_PESQUISA = 'pesquisa-precos'
+# Tarefas da pesquisa completa (as que executar_pesquisa processa)
+TIPOS_PESQUISA = ('pesquisar_presente', 'consultar_ia_lote')
+
 _lock = threading.Lock()
+_limitador = None
 
 
 def pesquisa_em_atraso():
@@ -32,88 +75,555 @@ def pesquisa_em_atraso():
     return ultima is None or timezone.now() - ultima.data_inicio >= INTERVALO_PESQUISA
 
 
-def executar_pesquisa(origem='automatica', log=None):
+def _obter_limitador():
+    global _limitador
+    if _limitador is None:
+        from .limites import LimitadorVazao
+        with _lock:
+            if _limitador is None:
+                _limitador = LimitadorVazao(getattr(settings, 'PESQUISA_PRECOS_POR_MINUTO', 0))
+    return _limitador
+
+
+def _contabilizar(log_id, presente_id, status, mensagem=''):
     """
-    Executa a pesquisa de preços para todos os presentes ativos (síncrono).
-    Cada presente tem suas sugestões atualizadas e o melhor preço gravado
-    no histórico (via IAService._registrar_historico).
+    Registra o resultado de um presente (checkpoint) e soma no log; encerra o
+    log quando todos terminaram. Só conta se o item ainda estava pendente:
+    uma tarefa reexecutada após lease vencido não conta duas vezes.
     """
-    from .models import Presente, PesquisaPrecoLog
+    from .models import PesquisaPrecoItem, PesquisaPrecoLog
+    atualizados = PesquisaPrecoItem.objects.filter(
+        log_id=log_id, presente_id=presente_id, status='pendente'
+    ).update(status=status, mensagem=(mensagem or '')[:255], atualizado_em=timezone.now())
+    if not atualizados:
+        return
+    campo = {'sucesso': 'sucessos', 'erro': 'erros', 'pulado': 'pulados'}[status]
+    PesquisaPrecoLog.objects.filter(pk=log_id).update(**{campo: F(campo) + 1})
+    _encerrar_se_concluido(log_id)
+
+
+def _encerrar_se_concluido(log_id):
+    from .models import PesquisaPrecoLog
+    PesquisaPrecoLog.objects.filter(
+        pk=log_id,
+        data_fim__isnull=True,
+        total_presentes__lte=F('sucessos') + F('erros') + F('pulados'),
+    ).update(data_fim=timezone.now())
+
+
+# ----------------------------------------------------------------------------
+# Tarefas (registradas em presentes.tarefas.TAREFAS)
+# ----------------------------------------------------------------------------
+
+def tarefa_buscar_precos_presente(presente_id):
+    """Busca de sugestões/preços de um presente recém-cadastrado."""
+    from .models import Presente
     from .services import IAService
 
-    if log is None:
-        log = PesquisaPrecoLog.objects.create(origem=origem)
+    presente = Presente.objects.select_related('usuario').filter(pk=presente_id).first()
+    if presente is None:
+        return
+    sucesso, mensagem = IAService.buscar_sugestoes_reais(presente)
+    if not sucesso:
+        logger.warning(f"[PESQUISA-PRECOS] Presente {presente_id}: {mensagem}")
+
 
-    presentes = Presente.objects.filter(status='ATIVO').select_related('usuario')
-    log.total_presentes = presentes.count()
-    log.save(update_fields=['total_presentes'])
+def tarefa_pesquisa_precos(origem='automatica', log_id=None):
+    """
+    Abre o log da pesquisa, grava um item pendente por presente ativo e
+    enfileira uma tarefa por item. Tudo numa transação: uma nova tentativa
+    não duplica presentes.
+    """
+    from .models import Presente, PesquisaPrecoItem, PesquisaPrecoLog
 
-    logger.info(f"[PESQUISA-PRECOS] Iniciando ({origem}) para {log.total_presentes} presentes")
+    with transaction.atomic():
+        if log_id is None:
+            log = PesquisaPrecoLog.objects.create(origem=origem)
+        else:
+            log = PesquisaPrecoLog.objects.get(pk=log_id)
+        presentes_ids = list(
+            Presente.objects.filter(status='ATIVO').order_by('id').values_list('id', flat=True)
+        )
+        PesquisaPrecoItem.objects.bulk_create(
+            [PesquisaPrecoItem(log=log, presente_id=presente_id) for presente_id in presentes_ids],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+        log.total_presentes = len(presentes_ids)
+        campos = ['total_presentes']
+        if not presentes_ids:
+            log.data_fim = timezone.now()
+            campos.append('data_fim')
+        log.save(update_fields=campos)
+        if not _enfileirar_lotes_ia(presentes_ids, log.pk):
+            _enfileirar_itens(log.pk, presentes_ids)
 
-    sucessos = erros = 0
-    for presente in presentes:
-        try:
-            sucesso, mensagem = IAService.buscar_sugestoes_reais(presente)
-            if sucesso:
-                sucessos += 1
-            else:
-                erros += 1
-                logger.warning(f"[PESQUISA-PRECOS] Presente {presente.id}: {mensagem}")
-        except Exception as e:
-            erros += 1
-            logger.error(f"[PESQUISA-PRECOS] Erro no presente {presente.id}: {str(e)}")
-
-    log.sucessos = sucessos
-    log.erros = erros
-    log.data_fim = timezone.now()
-    log.save(update_fields=['sucessos', 'erros', 'data_fim'])
-
-    logger.info(f"[PESQUISA-PRECOS] Concluída: {sucessos} sucessos, {erros} erros")
+    logger.info(f"[PESQUISA-PRECOS] Pesquisa ({origem}) enfileirada para {log.total_presentes} presentes")
     return log
 
 
-def disparar_pesquisa_se_necessario():
+def _enfileirar_itens(log_id, presentes_ids):
+    from .tarefas import PRIORIDADE_VARREDURA, enfileirar_varios
+    enfileirar_varios(
+        'pesquisar_presente',
+        [{'presente_id': presente_id, 'log_id': log_id} for presente_id in presentes_ids],
+        prioridade=PRIORIDADE_VARREDURA,
+    )
+
+
+def _enfileirar_atualizacoes(presentes_ids):
+    from .tarefas import PRIORIDADE_VARREDURA, enfileirar
+    for presente_id in presentes_ids:
+        enfileirar(
+            'atualizar_preco_presente',
+            {'presente_id': presente_id},
+            prioridade=PRIORIDADE_VARREDURA,
+            chave=f'atualizar-preco:{presente_id}',
+        )
+
+
+def _enfileirar_individuais(presentes_ids, log_id=None):
+    """Tarefas de cada presente: itens da pesquisa `log_id` ou atualizações agendadas."""
+    if log_id is None:
+        _enfileirar_atualizacoes(presentes_ids)
+    else:
+        _enfileirar_itens(log_id, presentes_ids)
+
+
+def _enfileirar_lotes_ia(presentes_ids, log_id=None):
     """
-    Dispara a pesquisa semanal em background se estiver em atraso.
-    O log é criado antes da thread iniciar para evitar disparos duplicados.
-    Retorna True se uma pesquisa foi disparada.
+    Agrupa os presentes em consultas de IA em lote (IA_LOTE_TAMANHO por
+    chamada). Cada lote enfileira as tarefas individuais dos seus presentes
+    depois da chamada, com o resultado já no cache de sugestões de IA (ver
+    IAService._produtos_ia). Retorna False se o lote está desativado: aí
+    quem chamou enfileira as tarefas individuais direto.
     """
-    from .models import PesquisaPrecoLog
+    tamanho = getattr(settings, 'IA_LOTE_TAMANHO', 10)
+    if tamanho <= 1 or not presentes_ids:
+        return False
+    if not settings.GEMINI_API_KEY or settings.GEMINI_API_KEY == 'sua-chave-gemini':
+        return False
+    if getattr(settings, 'IA_CACHE_TTL', 12 * 3600) <= 0:
+        # A resposta do lote chega às tarefas individuais pelo cache
+        logger.info(
+            f"[PESQUISA-PRECOS] IA em lote desativada (IA_CACHE_TTL=0): "
+            f"{len(presentes_ids)} presentes consultam a IA individualmente"
+        )
+        return False
+    from .tarefas import PRIORIDADE_PREPARACAO, enfileirar_varios
+    enfileirar_varios(
+        'consultar_ia_lote',
+        [
+            {'presentes_ids': presentes_ids[i:i + tamanho], 'log_id': log_id}
+            for i in range(0, len(presentes_ids), tamanho)
+        ],
+        prioridade=PRIORIDADE_PREPARACAO,
+    )
+    return True
+
+
+def tarefa_consultar_ia_lote(presentes_ids, log_id=None):
+    """
+    Uma chamada ao Gemini para vários presentes e, depois dela, as tarefas
+    individuais desses presentes. Presentes que não vierem na resposta (ou
+    a chamada inteira, se falhar) ficam para a consulta individual de cada
+    tarefa, como antes.
+    """
+    try:
+        _consultar_ia_lote(presentes_ids)
+    except Exception as e:
+        logger.warning(
+            f"[PESQUISA-PRECOS] Consulta de IA em lote falhou ({len(presentes_ids)} presentes), "
+            f"ficam as consultas individuais: {str(e)}"
+        )
+    _enfileirar_individuais(presentes_ids, log_id)
+
+
+def tarefa_consultar_ia_lote_desistir(presentes_ids, log_id=None):
+    """Lote que esgotou as tentativas: os presentes seguem com a consulta individual."""
+    _enfileirar_individuais(presentes_ids, log_id)
+
+
+def _consultar_ia_lote(presentes_ids):
+    from .models import Presente
+    from .services import IAService
+
+    # Descrições já no cache ou equivalentes entre presentes são consultadas uma vez só
+    unicos = {}
+    for presente in Presente.objects.filter(pk__in=presentes_ids, status='ATIVO').only('id', 'descricao', 'preco'):
+        if IAService.sugestoes_ia_em_cache(presente.descricao) is None:
+            unicos.setdefault(impressao_digital(presente.descricao), presente)
+    if not unicos:
+        return
+
+    resultado = IAService.consultar_gemini_lote(list(unicos.values()))
+    for presente in unicos.values():
+        IAService.guardar_sugestoes_ia(presente.descricao, 'Gemini (lote)', resultado.get(presente.id))
+    logger.info(f"[PESQUISA-PRECOS] IA em lote: {len(resultado)}/{len(unicos)} presentes em uma chamada")
+
+
+def _atualizado_desde(presente_id, inicio):
+    """True se o presente já teve sugestões buscadas depois de `inicio` (ex.: busca do próprio usuário)."""
+    from .models import SugestaoCompra
+    return SugestaoCompra.objects.filter(presente_id=presente_id, data_busca__gte=inicio).exists()
+
+
+def tarefa_pesquisar_presente(presente_id, log_id):
+    """Pesquisa um presente da varredura e registra o checkpoint."""
+    from .models import PesquisaPrecoItem, Presente
+    from .services import IAService
+
+    item = (
+        PesquisaPrecoItem.objects.filter(log_id=log_id, presente_id=presente_id)
+        .select_related('log')
+        .first()
+    )
+    if item is None or item.status != 'pendente':
+        # Já processado antes de um reinício (ou presente excluído com o item)
+        return
+    if _atualizado_desde(presente_id, item.log.data_inicio):
+        _contabilizar(log_id, presente_id, 'pulado', 'Já atualizado durante esta pesquisa')
+        return
+
+    _obter_limitador().aguardar()
+    presente = Presente.objects.select_related('usuario').filter(pk=presente_id).first()
+    if presente is None:
+        return
+    sucesso, mensagem = IAService.buscar_sugestoes_reais(presente)
+    if not sucesso:
+        logger.warning(f"[PESQUISA-PRECOS] Presente {presente_id}: {mensagem}")
+    _contabilizar(log_id, presente_id, 'sucesso' if sucesso else 'erro', mensagem)
+
+
+def tarefa_pesquisar_presente_desistir(presente_id, log_id):
+    """Presente que esgotou as tentativas conta como erro (e pode encerrar o log)."""
+    _contabilizar(log_id, presente_id, 'erro', 'Tentativas esgotadas')
+
+
+def tarefa_atualizar_preco_presente(presente_id):
+    """Atualização agendada de um presente vencido (ver agendar_vencidos)."""
+    from .models import Presente
+    from .services import IAService
+
+    try:
+        presente = Presente.objects.select_related('usuario').filter(pk=presente_id, status='ATIVO').first()
+        if presente is None:
+            return
+        minimo = timedelta(hours=getattr(settings, 'PRECOS_INTERVALO_MINIMO', 12))
+        if _atualizado_desde(presente_id, timezone.now() - minimo):
+            # Já atualizado por outro caminho (busca do usuário, pesquisa completa)
+            return
+        _obter_limitador().aguardar()
+        sucesso, mensagem = IAService.buscar_sugestoes_reais(presente)
+        if not sucesso:
+            logger.warning(f"[PESQUISA-PRECOS] Presente {presente_id}: {mensagem}")
+    finally:
+        # Sucesso ou não, o presente volta para a agenda (a reserva de agendar_vencidos é provisória)
+        reagendar_presente(presente_id)
+
+
+# ----------------------------------------------------------------------------
+# Agendamento por presente
+# ----------------------------------------------------------------------------
+
+def _fator_volatilidade(precos):
+    """
+    Coeficiente de variação dos últimos preços: 2% é o normal (fator 1);
+    preço parado espaça até 2x, preço oscilando antecipa até 1/4.
+    """
+    if len(precos) < 3:
+        return 1.0
+    media = statistics.fmean(precos)
+    if media <= 0:
+        return 1.0
+    variacao = statistics.pstdev(precos) / media
+    return min(2.0, max(0.25, 0.02 / max(variacao, 0.005)))
+
+
+def _fator_evento(data_evento, hoje):
+    if data_evento is None:
+        return 1.0
+    dias = (data_evento - hoje).days
+    if dias < 0:
+        return 2.0   # evento já passou
+    if dias <= 7:
+        return 0.25
+    if dias <= 30:
+        return 0.5
+    return 1.0
+
+
+def _fator_visualizacao(visualizado_em, agora):
+    if visualizado_em is None or agora - visualizado_em > timedelta(days=30):
+        return 1.5
+    if agora - visualizado_em <= timedelta(days=3):
+        return 0.5
+    return 1.0
 
+
+def calcular_proxima_atualizacao(presente_id, agora=None):
+    """
+    Próxima pesquisa de preços do presente: PRECOS_INTERVALO_BASE horas
+    ajustado por volatilidade, evento e visualização, limitado entre
+    PRECOS_INTERVALO_MINIMO e PRECOS_INTERVALO_MAXIMO, com ±10% de variação
+    para não concentrar presentes no mesmo tick.
+    """
+    from .models import PrecoHistorico, Presente
+
+    agora = agora or timezone.now()
+    dados = Presente.objects.filter(pk=presente_id).values_list('grupo__data_evento', 'visualizado_em').first()
+    if dados is None:
+        return None
+    data_evento, visualizado_em = dados
+    precos = [
+        float(preco) for preco in PrecoHistorico.objects.filter(
+            presente_id=presente_id, data__gte=agora - timedelta(days=90)
+        ).order_by('-data').values_list('preco', flat=True)[:10]
+    ]
+
+    horas = getattr(settings, 'PRECOS_INTERVALO_BASE', 168)
+    horas *= _fator_volatilidade(precos)
+    horas *= _fator_evento(data_evento, timezone.localdate(agora))
+    horas *= _fator_visualizacao(visualizado_em, agora)
+    horas = min(
+        getattr(settings, 'PRECOS_INTERVALO_MAXIMO', 672),
+        max(getattr(settings, 'PRECOS_INTERVALO_MINIMO', 12), horas),
+    )
+    return agora + timedelta(hours=horas * random.uniform(0.9, 1.1))
+
+
+def reagendar_presente(presente_id):
+    """Recalcula e grava a proxima_atualizacao do presente (após cada pesquisa)."""
+    from .models import Presente
+    proxima = calcular_proxima_atualizacao(presente_id)
+    if proxima is not None:
+        Presente.objects.filter(pk=presente_id).update(proxima_atualizacao=proxima)
+
+
+def agendar_vencidos(limite=None):
+    """
+    Enfileira até `limite` (PRECOS_LOTE) presentes ativos com
+    proxima_atualizacao vencida (ou nunca agendados), os mais atrasados
+    primeiro. Retorna quantos foram enfileirados.
+    """
+    from .models import Presente
+
+    agora = timezone.now()
+    limite = limite or getattr(settings, 'PRECOS_LOTE', 20)
+    ids = list(
+        Presente.objects.filter(status='ATIVO')
+        .filter(Q(proxima_atualizacao__isnull=True) | Q(proxima_atualizacao__lte=agora))
+        .order_by(F('proxima_atualizacao').asc(nulls_first=True), 'id')
+        .values_list('id', flat=True)[:limite]
+    )
+    if not ids:
+        return 0
+    # Reserva provisória: o próximo tick não pega os mesmos antes de executarem
+    Presente.objects.filter(pk__in=ids).update(proxima_atualizacao=agora + timedelta(hours=6))
+    if not _enfileirar_lotes_ia(ids):
+        _enfileirar_atualizacoes(ids)
+    logger.info(f"[PESQUISA-PRECOS] {len(ids)} presentes vencidos enfileirados para atualização")
+    return len(ids)
+
+
+def registrar_visualizacao(presentes_ids):
+    """Marca presentes vistos por outro membro (no máximo uma escrita por hora por presente)."""
+    from .models import Presente
+    agora = timezone.now()
+    Presente.objects.filter(pk__in=list(presentes_ids)).filter(
+        Q(visualizado_em__isnull=True) | Q(visualizado_em__lt=agora - timedelta(hours=1))
+    ).update(visualizado_em=agora)
+
+
+# ----------------------------------------------------------------------------
+# Disparo e retomada
+# ----------------------------------------------------------------------------
+
+def retomar_pesquisas():
+    """
+    Retoma pesquisas abertas (sem data_fim) a partir do checkpoint: itens
+    pendentes sem tarefa na fila (perdida num reinício ou numa execução
+    síncrona interrompida) são enfileirados de novo. Pesquisas antigas sem
+    itens (anteriores aos checkpoints) são encerradas. Retorna o log aberto
+    mais recente, ou None.
+    """
+    from .models import PesquisaPrecoItem, PesquisaPrecoLog, Tarefa
+
+    aberto = None
+    for log in PesquisaPrecoLog.objects.filter(data_fim__isnull=True).order_by('data_inicio'):
+        pendentes = set(
+            PesquisaPrecoItem.objects.filter(log=log, status='pendente').values_list('presente_id', flat=True)
+        )
+        if not pendentes:
+            if not PesquisaPrecoItem.objects.filter(log=log).exists() and \
+                    timezone.now() - log.data_inicio < timedelta(hours=1):
+                # Recém-criado: os itens ainda estão sendo gravados
+                aberto = log
+                continue
+            PesquisaPrecoLog.objects.filter(pk=log.pk, data_fim__isnull=True).update(data_fim=timezone.now())
+            logger.info(f"[PESQUISA-PRECOS] Pesquisa {log.pk} encerrada na retomada (sem itens pendentes)")
+            continue
+
+        na_fila = set(
+            Tarefa.objects.filter(
+                tipo='pesquisar_presente',
+                status__in=['pendente', 'executando'],
+                parametros__log_id=log.pk,
+            ).values_list('parametros__presente_id', flat=True)
+        )
+        # Presentes de lotes de IA ainda na fila: o lote enfileira as tarefas deles
+        for ids in Tarefa.objects.filter(
+            tipo='consultar_ia_lote',
+            status__in=['pendente', 'executando'],
+            parametros__log_id=log.pk,
+        ).values_list('parametros__presentes_ids', flat=True):
+            na_fila.update(ids)
+        perdidos = sorted(pendentes - na_fila)
+        if perdidos:
+            _enfileirar_itens(log.pk, perdidos)
+            logger.info(
+                f"[PESQUISA-PRECOS] Retomando pesquisa {log.pk}: {len(perdidos)} presentes reenfileirados "
+                f"({log.sucessos + log.erros + log.pulados}/{log.total_presentes} já concluídos)"
+            )
+        aberto = log
+    return aberto
+
+
+def executar_pesquisa(origem='automatica', log=None, workers=None):
+    """
+    Executa a pesquisa de preços de todos os presentes ativos (síncrono):
+    retoma a pesquisa aberta, se houver (senão abre uma nova), e processa as
+    tarefas da pesquisa (TIPOS_PESQUISA) neste processo com `workers`
+    threads (padrão: PESQUISA_PRECOS_WORKERS) até acabarem. As demais
+    tarefas da fila ficam para o trabalhador.
+    """
+    from .tarefas import Trabalhador
+
+    workers = max(1, workers or getattr(settings, 'PESQUISA_PRECOS_WORKERS', 4))
+    if log is None:
+        log = retomar_pesquisas()
+    if log is None:
+        log = tarefa_pesquisa_precos(origem=origem)
+    logger.info(f"[PESQUISA-PRECOS] Processando a fila com {workers} workers")
+    Trabalhador(workers=workers, tipos=TIPOS_PESQUISA).executar_ate_esvaziar()
+    log.refresh_from_db()
+    logger.info(f"[PESQUISA-PRECOS] Concluída: {log.sucessos} sucessos, {log.erros} erros, {log.pulados} pulados")
+    return log
+
+
+def agendar_pesquisa(origem):
+    """
+    Enfileira a pesquisa completa (uma por vez: se já houver uma na fila,
+    retorna a existente). O trabalhador da fila a executa em background.
+    """
+    from .tarefas import PRIORIDADE_NORMAL, enfileirar
+    return enfileirar(
+        'pesquisa_precos',
+        {'origem': origem},
+        prioridade=PRIORIDADE_NORMAL,
+        chave=CHAVE_PESQUISA,
+    )
+
+
+def disparar_pesquisa_se_necessario():
+    """
+    Retoma pesquisas interrompidas e enfileira a semanal se estiver em atraso.
+    Retorna True se a pesquisa foi enfileirada (ou já estava na fila).
+    """
     with _lock:
+        retomar_pesquisas()
         if not pesquisa_em_atraso():
             return False
-        log = PesquisaPrecoLog.objects.create(origem='automatica')
+        agendar_pesquisa('automatica')
+    logger.info("[PESQUISA-PRECOS] Pesquisa semanal automática enfileirada")
+    return True
+
+
+def verificar_atualizacoes():
+    """
+    Tick periódico: retoma pesquisas interrompidas e enfileira os presentes
+    vencidos (PRECOS_AGENDAMENTO) ou a pesquisa semanal completa, além da
+    compactação diária do histórico (presentes/retencao_precos.py).
+    """
+    from .retencao_precos import agendar_compactacao
+
+    agendar_compactacao()
+    if not getattr(settings, 'PRECOS_AGENDAMENTO', True):
+        return disparar_pesquisa_se_necessario()
+    with _lock:
+        retomar_pesquisas()
+    return agendar_vencidos() > 0
 
-    thread = threading.Thread(
-        target=executar_pesquisa,
-        kwargs={'origem': 'automatica', 'log': log},
-        daemon=True
+
+def tarefa_verificar_atualizacoes():
+    """Tarefa da fila (presentes.tarefas.TAREFAS) que roda o tick fora do request."""
+    verificar_atualizacoes()
+
+
+def agendar_verificacao():
+    """
+    Enfileira o tick (verificar_atualizacoes) para o trabalhador da fila.
+    A chave evita acumular ticks enquanto um ainda está pendente; sem novas
+    tentativas, porque o próximo tick já repete o trabalho.
+    """
+    from .tarefas import PRIORIDADE_NORMAL, enfileirar
+    return enfileirar(
+        'verificar_atualizacoes',
+        prioridade=PRIORIDADE_NORMAL,
+        chave='verificar_atualizacoes',
+        max_tentativas=1,
     )
-    thread.start()
-    logger.info("[PESQUISA-PRECOS] Pesquisa semanal automática disparada em background")
-    return True
 
 
 class PesquisaPrecoMiddleware:
     """
-    Verifica (no máximo 1x por hora por processo) se a pesquisa semanal de
-    preços está em atraso e a dispara em background. Substitui o cron no
-    Render Free Tier: roda sempre que houver tráfego na aplicação.
+    Enfileira verificar_atualizacoes() no máximo a cada PRECOS_TICK segundos
+    por processo. Substitui o cron no Render Free Tier: roda sempre que
+    houver tráfego na aplicação. O tick em si (retomar pesquisas, agendar
+    vencidos, compactação) roda no trabalhador da fila, não no request.
+
+    Também garante o trabalhador embutido da fila de tarefas neste processo
+    (TAREFAS_TRABALHADOR_EMBUTIDO), já que o plano free não tem worker separado.
+
+    Aceita chamadas síncronas (WSGI) e async (ASGI); no async o
+    enfileiramento, que acessa o banco, roda numa thread.
     """
-    CHECK_INTERVAL_SEGUNDOS = 3600
+    sync_capable = True
+    async_capable = True
+
     _ultima_checagem = 0.0
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self.intervalo = getattr(settings, 'PRECOS_TICK', 600)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
-    def __call__(self, request):
+    def _tick_vencido(self):
         agora = time.monotonic()
-        if agora - PesquisaPrecoMiddleware._ultima_checagem > self.CHECK_INTERVAL_SEGUNDOS:
+        if agora - PesquisaPrecoMiddleware._ultima_checagem > self.intervalo:
             PesquisaPrecoMiddleware._ultima_checagem = agora
-            try:
-                disparar_pesquisa_se_necessario()
-            except Exception:
-                # Banco indisponível/migração pendente não pode derrubar o request
-                logger.exception("[PESQUISA-PRECOS] Erro ao verificar pesquisa semanal")
+            return True
+        return False
+
+    @staticmethod
+    def _verificar():
+        try:
+            agendar_verificacao()
+        except Exception:
+            # Banco indisponível/migração pendente não pode derrubar o request
+            logger.exception("[PESQUISA-PRECOS] Erro ao agendar verificação de preços")
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        garantir_trabalhador_embutido()
+        if self._tick_vencido():
+            self._verificar()
         return self.get_response(request)
+
+    async def __acall__(self, request):
+        garantir_trabalhador_embutido()
+        if self._tick_vencido():
+            await sync_to_async(self._verificar)()
+        return await self.get_response(request)
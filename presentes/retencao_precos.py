@@ -0,0 +1,137 @@
+"""
+Retenção do histórico de preços (PrecoHistorico).
+
+Cada varredura, busca de sugestões e "aplicar preço" grava um ponto, então
+o histórico cresce sem limite. A compactação diária mantém:
+- resolução completa nos últimos PRECOS_HISTORICO_COMPLETO_DIAS dias;
+- um ponto por dia até PRECOS_HISTORICO_DIARIO_DIAS dias;
+- um ponto por semana (ISO, segunda a domingo) antes disso.
+
+Os pontos de um período viram uma linha só (a última do período, que
+mantém data, loja, fonte e o preço real em `preco`, com o qual
+registrar_preco compara o próximo): preco_medio guarda a média ponderada,
+preco_minimo/preco_maximo a faixa e `pontos` quantos originais ela
+representa. Pontos com preço zero antigos são descartados (nenhuma
+leitura do histórico os usa).
+
+As estatísticas materializadas (PrecoEstatistica) não mudam: continuam
+resumindo todos os pontos já registrados.
+"""
+import logging
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _limites(agora):
+    completo = agora - timedelta(days=getattr(settings, 'PRECOS_HISTORICO_COMPLETO_DIAS', 30))
+    diario = agora - timedelta(days=getattr(settings, 'PRECOS_HISTORICO_DIARIO_DIAS', 180))
+    return completo, min(completo, diario)
+
+
+def _periodo(data, granularidade):
+    dia = timezone.localdate(data)
+    if granularidade == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    return dia
+
+
+def _mesclar(grupo, granularidade):
+    """Atualiza a última linha do período com o agregado e retorna os pks das demais."""
+    pontos = sum(p.pontos for p in grupo)
+    media = sum((p.preco_medio or p.preco) * p.pontos for p in grupo) / pontos
+    ultimo = grupo[-1]
+    ultimo.preco_medio = Decimal(media).quantize(Decimal('0.01'))
+    ultimo.preco_minimo = min(p.preco_minimo or p.preco for p in grupo)
+    ultimo.preco_maximo = max(p.preco_maximo or p.preco for p in grupo)
+    ultimo.pontos = pontos
+    ultimo.granularidade = granularidade
+    ultimo.save(update_fields=['preco_medio', 'preco_minimo', 'preco_maximo', 'pontos', 'granularidade'])
+    return [p.pk for p in grupo[:-1]]
+
+
+def compactar_presente(presente_id, agora=None):
+    """Compacta o histórico antigo de um presente. Retorna quantas linhas foram removidas."""
+    from .models import PrecoEstatistica, PrecoHistorico
+
+    agora = agora or timezone.now()
+    limite_completo, limite_diario = _limites(agora)
+    with transaction.atomic():
+        antigos = PrecoHistorico.objects.select_for_update().filter(
+            presente_id=presente_id, data__lt=limite_completo
+        ).order_by('data', 'id')
+
+        periodos = defaultdict(list)
+        remover = []
+        for ponto in antigos:
+            if not ponto.preco:
+                remover.append(ponto.pk)
+                continue
+            granularidade = 'semana' if ponto.data < limite_diario else 'dia'
+            periodos[(granularidade, _periodo(ponto.data, granularidade))].append(ponto)
+
+        for (granularidade, _), grupo in periodos.items():
+            if len(grupo) > 1:
+                remover.extend(_mesclar(grupo, granularidade))
+            elif grupo[0].granularidade != granularidade:
+                # Sozinho no período: só marca, para não ser revisitado amanhã
+                grupo[0].granularidade = granularidade
+                grupo[0].save(update_fields=['granularidade'])
+
+        if remover:
+            PrecoHistorico.objects.filter(pk__in=remover).delete()
+    if remover:
+        # Pontos do gráfico podem ter sido agregados
+        PrecoEstatistica.atualizar_sparklines(presente_id)
+    return len(remover)
+
+
+def presentes_a_compactar(agora=None):
+    """Presentes com pontos antigos ainda na resolução de origem."""
+    from .models import PrecoHistorico
+
+    limite_completo, limite_diario = _limites(agora or timezone.now())
+    return (
+        PrecoHistorico.objects.filter(
+            Q(data__lt=limite_completo, granularidade='')
+            | Q(data__lt=limite_diario, granularidade='dia')
+        )
+        .order_by()
+        .values_list('presente_id', flat=True)
+        .distinct()
+    )
+
+
+def compactar_historico(agora=None):
+    """Compacta o histórico de todos os presentes. Retorna (presentes, linhas removidas)."""
+    agora = agora or timezone.now()
+    presentes_ids = list(presentes_a_compactar(agora))
+    removidas = 0
+    for presente_id in presentes_ids:
+        removidas += compactar_presente(presente_id, agora)
+    if presentes_ids:
+        logger.info(f"[HISTORICO-PRECOS] {len(presentes_ids)} presentes compactados, {removidas} linhas removidas")
+    return len(presentes_ids), removidas
+
+
+def tarefa_compactar_historico():
+    """Tarefa diária (registrada em presentes.tarefas.TAREFAS)."""
+    compactar_historico()
+
+
+def agendar_compactacao():
+    """Enfileira a compactação uma vez por dia (chamado no tick de pesquisa_precos)."""
+    from .models import Tarefa
+    from .tarefas import PRIORIDADE_VARREDURA, enfileirar
+
+    chave = f'compactar_historico:{timezone.localdate().isoformat()}'
+    if not Tarefa.objects.filter(chave=chave).exists():
+        enfileirar('compactar_historico', prioridade=PRIORIDADE_VARREDURA, chave=chave)
@@ -0,0 +1,253 @@
+"""
+Roteador dos motores de IA usados no botão "Buscar sugestões".
+
+Antes os motores eram tentados sempre na mesma ordem e cada motor fora do
+ar custava um timeout inteiro antes de passar ao próximo. Aqui cada motor tem:
+- janela móvel das últimas IA_ROTEADOR_JANELA chamadas (latência e erros);
+- disjuntor (presentes/limites.py): IA_ROTEADOR_FALHAS falhas seguidas
+  pausam o motor, e cota esgotada (429, insufficient_quota, crédito
+  insuficiente) pausa por IA_ROTEADOR_PAUSA_COTA segundos.
+
+A ordem é a de custo (MOTORES), com os motores cuja taxa de erro passa de
+IA_ROTEADOR_ERRO_MAXIMO indo para o fim. Com IA_ROTEADOR_HEDGE, se o motor
+atual não responder dentro do seu p95 de latência, o próximo é disparado em
+paralelo e vale a primeira resposta com sugestões.
+
+Antes de qualquer motor, consulta o cache de sugestões de IA
+(IAService.sugestoes_ia_em_cache): o mesmo produto, ou um com descrição
+equivalente, buscado há menos de IA_CACHE_TTL segundos não gera nova
+chamada paga.
+
+estatisticas() expõe o estado de cada motor (/api/ia/status/).
+"""
+import logging
+import statistics
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .limites import Disjuntor, EsperaExcedida, fechando_conexoes
+
+logger = logging.getLogger(__name__)
+
+# (nome, setting da chave, método do IAService) em ordem de custo crescente
+MOTORES = [
+    ('Gemini', 'GEMINI_API_KEY', 'consultar_gemini'),
+    ('ChatGPT', 'OPENAI_API_KEY', 'consultar_chatgpt'),
+    ('Claude', 'ANTHROPIC_API_KEY', 'consultar_claude'),
+]
+# Trechos das mensagens de erro de cota/crédito das três APIs
+MARCAS_COTA = ('insufficient_quota', 'resource_exhausted', 'credit balance', 'quota')
+# Abaixo disso o p95 não é confiável e vale IA_ROTEADOR_HEDGE_PADRAO
+AMOSTRAS_MINIMAS = 5
+
+
+class EstatisticasMotor:
+    """Latência e erros recentes de um motor, mais o disjuntor que o pausa."""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self._chamadas = deque(maxlen=max(1, getattr(settings, 'IA_ROTEADOR_JANELA', 50)))
+        self._lock = threading.Lock()
+        self.ultimo_erro = ''
+        self.disjuntor = Disjuntor(
+            f'ia:{nome.lower()}',
+            getattr(settings, 'IA_ROTEADOR_FALHAS', 3),
+            getattr(settings, 'IA_ROTEADOR_ESPERA', 60),
+            getattr(settings, 'IA_ROTEADOR_ESPERA_MAXIMA', 1800),
+        )
+
+    def registrar(self, latencia, sucesso, erro=''):
+        with self._lock:
+            self._chamadas.append((latencia, sucesso))
+            if erro:
+                self.ultimo_erro = erro[:200]
+        self.disjuntor.registrar(sucesso)
+
+    @property
+    def total(self):
+        return len(self._chamadas)
+
+    def taxa_erro(self):
+        with self._lock:
+            if not self._chamadas:
+                return 0.0
+            return sum(1 for _, sucesso in self._chamadas if not sucesso) / len(self._chamadas)
+
+    def latencia(self, percentil):
+        """Percentil da latência das chamadas bem-sucedidas (None sem amostras suficientes)."""
+        with self._lock:
+            latencias = [latencia for latencia, sucesso in self._chamadas if sucesso]
+        if len(latencias) < AMOSTRAS_MINIMAS:
+            return None
+        return statistics.quantiles(latencias, n=100, method='inclusive')[percentil - 1]
+
+
+_estatisticas = {}
+_estatisticas_lock = threading.Lock()
+
+
+def _obter_estatisticas(nome):
+    with _estatisticas_lock:
+        if nome not in _estatisticas:
+            _estatisticas[nome] = EstatisticasMotor(nome)
+        return _estatisticas[nome]
+
+
+def _configurado(setting):
+    chave = getattr(settings, setting, '')
+    return bool(chave) and not chave.startswith('sua-chave')
+
+
+def _cota_esgotada(erro):
+    status = getattr(erro, 'status_code', None) or getattr(getattr(erro, 'response', None), 'status_code', None)
+    if status == 429:
+        return True
+    texto = str(erro).lower()
+    return any(marca in texto for marca in MARCAS_COTA)
+
+
+def _ordem():
+    """Motores configurados e fora de pausa: saudáveis primeiro, por custo."""
+    erro_maximo = getattr(settings, 'IA_ROTEADOR_ERRO_MAXIMO', 0.5)
+    candidatos = []
+    for indice, (nome, setting, metodo) in enumerate(MOTORES):
+        if not _configurado(setting):
+            continue
+        estatisticas = _obter_estatisticas(nome)
+        if estatisticas.disjuntor.estado == Disjuntor.ABERTO:
+            logger.info(f"[IA] {nome}: em pausa, pulando")
+            continue
+        instavel = estatisticas.total >= AMOSTRAS_MINIMAS and estatisticas.taxa_erro() > erro_maximo
+        candidatos.append((instavel, indice, nome, metodo, estatisticas))
+    candidatos.sort(key=lambda c: (c[0], c[1]))
+    return [(nome, metodo, estatisticas) for _, _, nome, metodo, estatisticas in candidatos]
+
+
+def _limiar_hedge(estatisticas):
+    p95 = estatisticas.latencia(95)
+    if p95 is None:
+        p95 = getattr(settings, 'IA_ROTEADOR_HEDGE_PADRAO', 10)
+    return max(2.0, p95)
+
+
+def _executar(nome, metodo, estatisticas, presente):
+    """
+    Roda um motor e registra latência/erro (também quando a resposta já não
+    é esperada). Não grava no cache: só a resposta escolhida é guardada,
+    por consultar_motores, para um motor perdedor do hedge não sobrescrevê-la.
+    """
+    from .services import IAService
+    inicio = time.monotonic()
+    try:
+        sugestoes = getattr(IAService, metodo)(presente)
+    except EsperaExcedida as e:
+        # Host saturado num request: o motor não falhou, só foi pulado
+        logger.warning(f"[IA] {nome} pulado: {str(e)}")
+        return None
+    except Exception as e:
+        latencia = time.monotonic() - inicio
+        estatisticas.registrar(latencia, False, str(e))
+        if _cota_esgotada(e):
+            estatisticas.disjuntor.pausar(getattr(settings, 'IA_ROTEADOR_PAUSA_COTA', 3600), 'cota esgotada')
+        logger.warning(f"[IA] {nome} falhou em {latencia:.1f}s: {str(e)}")
+        return None
+    estatisticas.registrar(time.monotonic() - inicio, True)
+    return sugestoes
+
+
+def consultar_motores(presente):
+    """
+    Consulta os motores pela ordem de _ordem(), com hedge pelo p95 e prazo
+    total de IA_ROTEADOR_PRAZO segundos. Retorna (nome, sugestões) do
+    primeiro motor com sugestões, ou None se nenhum respondeu.
+    """
+    from .services import IAService
+
+    em_cache = IAService.sugestoes_ia_em_cache(presente.descricao)
+    if em_cache:
+        return 'cache', em_cache
+
+    fila = _ordem()
+    if not fila:
+        logger.warning("[IA] Nenhum motor de IA disponível")
+        return None
+
+    hedge = getattr(settings, 'IA_ROTEADOR_HEDGE', True)
+    limite = time.monotonic() + getattr(settings, 'IA_ROTEADOR_PRAZO', 45)
+    executor = ThreadPoolExecutor(max_workers=len(fila), thread_name_prefix='motores-ia')
+    em_andamento = {}
+    ultimo = None  # (estatísticas, início) do motor disparado por último
+
+    def disparar():
+        nonlocal ultimo
+        while fila:
+            nome, metodo, estatisticas = fila.pop(0)
+            # Meio aberto: só a primeira chamada após a pausa passa (teste)
+            if not estatisticas.disjuntor.permitir():
+                continue
+            futuro = executor.submit(fechando_conexoes(_executar), nome, metodo, estatisticas, presente)
+            em_andamento[futuro] = nome
+            ultimo = (estatisticas, time.monotonic())
+            return nome
+        return None
+
+    try:
+        while True:
+            if not em_andamento and not disparar():
+                break
+            agora = time.monotonic()
+            espera = limite - agora
+            if espera <= 0:
+                logger.warning(f"[IA] Prazo esgotado aguardando {', '.join(em_andamento.values())}")
+                break
+            hedge_em = None
+            if hedge and fila:
+                hedge_em = ultimo[1] + _limiar_hedge(ultimo[0]) - agora
+                espera = min(espera, max(0.0, hedge_em))
+
+            feitos, _ = wait(em_andamento, timeout=espera, return_when=FIRST_COMPLETED)
+            if not feitos:
+                if hedge_em is not None and hedge_em <= espera:
+                    lentos = ', '.join(em_andamento.values())
+                    proximo = disparar()
+                    if proximo:
+                        logger.info(f"[IA] {lentos} acima do p95, disparando também {proximo}")
+                continue
+            for futuro in feitos:
+                nome = em_andamento.pop(futuro)
+                sugestoes = futuro.result()
+                if sugestoes:
+                    IAService.guardar_sugestoes_ia(presente.descricao, nome, sugestoes)
+                    return nome, sugestoes
+                if sugestoes is not None:
+                    logger.warning(f"[IA] {nome} não retornou sugestões. Tentando próximo motor...")
+    finally:
+        # Motores ainda rodando terminam sozinhos e só atualizam as estatísticas
+        executor.shutdown(wait=False, cancel_futures=True)
+    return None
+
+
+def estatisticas():
+    """Estado atual de cada motor (para o endpoint de status e logs)."""
+    agora = time.time()
+    resultado = []
+    for nome, setting, _ in MOTORES:
+        dados = _obter_estatisticas(nome)
+        p50, p95 = dados.latencia(50), dados.latencia(95)
+        resultado.append({
+            'motor': nome,
+            'configurado': _configurado(setting),
+            'estado': dados.disjuntor.estado,
+            'pausado_por': max(0, round(dados.disjuntor.aberto_ate - agora)),
+            'chamadas': dados.total,
+            'taxa_erro': round(dados.taxa_erro(), 3),
+            'latencia_p50': round(p50, 2) if p50 is not None else None,
+            'latencia_p95': round(p95, 2) if p95 is not None else None,
+            'ultimo_erro': dados.ultimo_erro,
+        })
+    return resultado
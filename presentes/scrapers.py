@@ -4,10 +4,17 @@ Cada loja tem sua própria lógica de extração otimizada.
 """
 import requests
 from bs4 import BeautifulSoup
+import copy
 import re
 import logging
+import time
 from urllib.parse import urlparse
 
+from django.conf import settings
+
+from . import http_client
+from .cache import obter_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,6 +33,11 @@ class ParsingError(ScrapingError):
     pass
 
 
+class NaoModificado(ScrapingError):
+    """Resposta 304: a pagina nao mudou desde a versao em cache - usar o resultado guardado"""
+    pass
+
+
 class BaseScraper:
     """Classe base para scrapers de lojas"""
 
@@ -35,18 +47,37 @@ class BaseScraper:
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
         }
+        # Validadores HTTP (ETag/Last-Modified) para revalidação condicional:
+        # 'validadores' vem do cache (enviados na requisição) e
+        # 'validadores_resposta' guarda os devolvidos pelo site
+        self.validadores = {}
+        self.validadores_resposta = {}
 
     def get_soup(self, url, timeout=10):
         """
         Obtém BeautifulSoup de uma URL.
 
         Lanca NetworkError para erros HTTP/rede (404, 500, timeout, etc.)
+        Lanca NaoModificado se o site responder 304 a uma requisição condicional.
         Retorna BeautifulSoup se sucesso.
         """
+        headers = dict(self.headers)
+        if self.validadores.get('etag'):
+            headers['If-None-Match'] = self.validadores['etag']
+        if self.validadores.get('last_modified'):
+            headers['If-Modified-Since'] = self.validadores['last_modified']
         try:
-            response = requests.get(url, headers=self.headers, timeout=timeout)
+            response = http_client.get(url, headers=headers, timeout=timeout)
+            if response.status_code == 304 and any(self.validadores.values()):
+                raise NaoModificado(f"Pagina nao modificada: {url}")
             response.raise_for_status()
+            self.validadores_resposta = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
             return BeautifulSoup(response.content, 'html.parser')
+        except NaoModificado:
+            raise
         except requests.exceptions.Timeout as e:
             logger.error(f"Timeout ao acessar {url}: {str(e)}")
             raise NetworkError(f"Timeout ao acessar URL: {str(e)}")
@@ -487,9 +518,72 @@ class ScraperFactory:
                 'error_message': str,
                 'partial_data': {'titulo': ..., 'preco': ..., 'imagem_url': ...}
               }
+
+        O resultado fica em cache por URL (presentes/cache.py), com TTL próprio
+        para sucesso, erro de parsing e erro de rede (PRODUTO_CACHE_TTL_*).
+        Vencido o prazo de um sucesso, a página é pedida com If-None-Match /
+        If-Modified-Since; um 304 renova o resultado guardado sem novo parsing.
+        """
+        chave = url.strip().split('#')[0]
+        cache = obter_cache(
+            'produto:url',
+            ttl=getattr(settings, 'PRODUTO_CACHE_TTL_SUCESSO', 7 * 24 * 3600),
+            normalizar=False,
+        )
+        em_cache = cache.obter(chave)
+        if em_cache and em_cache['fresco_ate'] > time.time():
+            logger.info(f"Dados do produto em cache para {chave[:80]}")
+            return copy.deepcopy(em_cache['resultado'])
+
+        validadores = {}
+        if em_cache and em_cache['resultado'].get('success'):
+            validadores = em_cache.get('validadores') or {}
+
+        try:
+            resultado = ScraperFactory._extrair_sem_cache(url, validadores)
+        except NaoModificado:
+            logger.info(f"Página não modificada (304), reaproveitando cache: {chave[:80]}")
+            resultado = dict(em_cache['resultado'], validadores=validadores)
+
+        ScraperFactory._guardar_resultado(cache, chave, resultado)
+        resultado.pop('validadores', None)
+        return resultado
+
+    @staticmethod
+    def _guardar_resultado(cache, chave, resultado):
+        """
+        Sucesso fica fresco por PRODUTO_CACHE_TTL_SUCESSO e é mantido por mais
+        PRODUTO_CACHE_REVALIDACAO para revalidação condicional; falhas
+        (cache negativo) só pelo TTL do tipo de erro.
+        """
+        validadores = resultado.get('validadores') or {}
+        if resultado.get('success'):
+            ttl = retencao = cache.ttl
+            if any(validadores.values()):
+                retencao += getattr(settings, 'PRODUTO_CACHE_REVALIDACAO', 30 * 24 * 3600)
+        elif resultado.get('error_type') == 'parsing':
+            ttl = retencao = getattr(settings, 'PRODUTO_CACHE_TTL_PARSING', 24 * 3600)
+        else:
+            ttl = retencao = getattr(settings, 'PRODUTO_CACHE_TTL_REDE', 15 * 60)
+        if ttl <= 0:
+            return
+        guardado = {k: v for k, v in resultado.items() if k != 'validadores'}
+        cache.definir(chave, {
+            'resultado': guardado,
+            'validadores': validadores,
+            'fresco_ate': time.time() + ttl,
+        }, ttl=retencao)
+
+    @staticmethod
+    def _extrair_sem_cache(url, validadores=None):
+        """
+        Extração propriamente dita (ver extract_product_info). Em caso de
+        sucesso inclui 'validadores' (ETag/Last-Modified) no dict.
+        Lanca NaoModificado se a requisição condicional devolver 304.
         """
         try:
             scraper, is_generic = ScraperFactory.get_scraper(url)
+            scraper.validadores = validadores or {}
             titulo, preco, imagem_url = scraper.extract(url)
 
             # Se usou scraper genérico e teve sucesso, criar issue sugerindo suporte específico
@@ -589,9 +683,13 @@ class {domain.split('.')[0].title()}Scraper(BaseScraper):
                 'titulo': titulo,
                 'preco': preco,
                 'imagem_url': imagem_url,
-                'used_generic_scraper': is_generic
+                'used_generic_scraper': is_generic,
+                'validadores': scraper.validadores_resposta,
             }
 
+        except NaoModificado:
+            raise
+
         except NetworkError as e:
             # Erro de rede/HTTP (404, 500, timeout, etc.)
             # NAO deve gerar issue no GitHub
@@ -1,11 +1,14 @@
-import anthropic
-import openai
 import requests
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from urllib.parse import quote_plus
 from bs4 import BeautifulSoup
 from django.conf import settings
+from . import http_client
+from .cache import obter_cache, obter_cache_semantico
+from .limites import CircuitoAberto, fechando_conexoes, limite_host
 from .models import SugestaoCompra
 
 logger = logging.getLogger(__name__)
@@ -20,16 +23,80 @@ class IAService:
         'Connection': 'keep-alive',
         'Upgrade-Insecure-Requests': '1'
     }
+    # Trechos das páginas de desafio anti-robô (Cloudflare, DataDome, PerimeterX)
+    MARCAS_BLOQUEIO = ('/cdn-cgi/challenge-platform', 'captcha-delivery.com', 'px-captcha')
+
+    @staticmethod
+    def _pagina_bloqueada(response):
+        """Desafio anti-robô servido com status 200: conta como falha no disjuntor do host."""
+        trecho = response.text[:20000]
+        return any(marca in trecho for marca in IAService.MARCAS_BLOQUEIO)
+
+    @staticmethod
+    def _busca_em_cache(fonte, query, max_results):
+        """
+        Resultado já buscado para a mesma descrição normalizada (presentes/cache.py).
+        Só vale se a busca original pediu pelo menos max_results produtos.
+        """
+        em_cache = obter_cache(f'busca:{fonte.lower()}').obter(query)
+        if not em_cache or em_cache.get('max_results', 0) < max_results:
+            return None
+        produtos = [dict(p) for p in em_cache['produtos'][:max_results]]
+        logger.info(f"{fonte}: {len(produtos)} produtos do cache para '{query}'")
+        return produtos
+
+    @staticmethod
+    def _guardar_busca(fonte, query, max_results, produtos):
+        # Listas vazias não entram no cache: costumam ser bloqueio ou mudança de layout
+        if produtos:
+            obter_cache(f'busca:{fonte.lower()}').definir(
+                query, {'max_results': max_results, 'produtos': produtos}
+            )
+
+    @staticmethod
+    def _cache_ia():
+        return obter_cache_semantico('ia:sugestoes', ttl=getattr(settings, 'IA_CACHE_TTL', 12 * 3600))
+
+    @staticmethod
+    def sugestoes_ia_em_cache(descricao):
+        """
+        Sugestões de IA recentes para a mesma descrição ou uma equivalente
+        ('Air Fryer Mondial 4L' ~ 'air fryer mondial 4 litros'), ou None.
+        """
+        em_cache = IAService._cache_ia().obter(descricao)
+        if em_cache is None:
+            return None
+        logger.info(
+            f"[IA] {len(em_cache['sugestoes'])} sugestões do cache para '{descricao}' "
+            f"({em_cache.get('motor')}, buscadas para '{em_cache.get('descricao')}')"
+        )
+        return em_cache['sugestoes']
+
+    @staticmethod
+    def guardar_sugestoes_ia(descricao, motor, sugestoes):
+        """Guarda a resposta de um motor de IA com a origem (motor e descrição consultada)."""
+        # Listas vazias não entram: a próxima busca tenta de novo
+        if sugestoes:
+            IAService._cache_ia().definir(descricao, {
+                'motor': motor,
+                'descricao': descricao,
+                'sugestoes': sugestoes,
+            })
 
     @staticmethod
     def buscar_preco_zoom(query, max_results=5):
         """Busca preços no site Zoom"""
+        em_cache = IAService._busca_em_cache('Zoom', query, max_results)
+        if em_cache is not None:
+            return em_cache
         try:
             # URL do Zoom com busca
             url = f"https://www.zoom.com.br/search?q={quote_plus(query)}"
             logger.info(f"Buscando no Zoom: {url}")
 
-            response = requests.get(url, headers=IAService.HEADERS, timeout=10)
+            response = http_client.get(
+                url, headers=IAService.HEADERS, timeout=10, bloqueio=IAService._pagina_bloqueada
+            )
             response.raise_for_status()
 
             # Log do status e tamanho da resposta
@@ -132,8 +199,12 @@ class IAService:
                     continue
 
             logger.info(f"Zoom: Total de {len(produtos)} produtos válidos encontrados")
+            IAService._guardar_busca('Zoom', query, max_results, produtos)
             return produtos
 
+        except CircuitoAberto as e:
+            logger.warning(f"Zoom pulado: {str(e)}")
+            return []
         except Exception as e:
             logger.error(f"Erro ao buscar no Zoom: {str(e)}")
             import traceback
@@ -143,12 +214,17 @@ class IAService:
     @staticmethod
     def buscar_preco_buscape(query, max_results=5):
         """Busca preços no site Buscapé"""
+        em_cache = IAService._busca_em_cache('Buscape', query, max_results)
+        if em_cache is not None:
+            return em_cache
         try:
             # URL do Buscapé com busca
             url = f"https://www.buscape.com.br/search?q={quote_plus(query)}"
             logger.info(f"Buscando no Buscapé: {url}")
 
-            response = requests.get(url, headers=IAService.HEADERS, timeout=10)
+            response = http_client.get(
+                url, headers=IAService.HEADERS, timeout=10, bloqueio=IAService._pagina_bloqueada
+            )
             response.raise_for_status()
 
             # Log do status e tamanho da resposta
@@ -259,8 +335,12 @@ class IAService:
                     continue
 
             logger.info(f"Buscapé: Total de {len(produtos)} produtos válidos encontrados")
+            IAService._guardar_busca('Buscape', query, max_results, produtos)
             return produtos
 
+        except CircuitoAberto as e:
+            logger.warning(f"Buscapé pulado: {str(e)}")
+            return []
         except Exception as e:
             logger.error(f"Erro ao buscar no Buscapé: {str(e)}")
             import traceback
@@ -268,124 +348,190 @@ class IAService:
             return []
 
     @staticmethod
-    def buscar_sugestoes_reais(presente):
-        """Busca sugestões combinando IA + Zoom + Buscapé"""
+    def _produtos_ia(presente):
+        """
+        Sugestões do Gemini no formato dos scrapers (sem gravar no banco).
+        Reaproveita o cache de sugestões de IA (sugestoes_ia_em_cache),
+        preenchido também pela consulta em lote da pesquisa de preços.
+        """
+        sugestoes = IAService.sugestoes_ia_em_cache(presente.descricao)
+        if sugestoes is None:
+            sugestoes = IAService.consultar_gemini(presente)
+            IAService.guardar_sugestoes_ia(presente.descricao, 'Gemini', sugestoes)
+
+        produtos = []
+        for sug in sugestoes:
+            try:
+                preco = float(sug.get('preco') or 0)
+            except (TypeError, ValueError):
+                preco = 0.0
+            produtos.append({
+                'loja': sug.get('loja', ''),
+                'preco': preco,
+                'url': sug.get('url') or '',
+                'fonte': 'IA'
+            })
+        return produtos
+
+    @staticmethod
+    def _fontes(presente):
+        """Fontes de preço consultadas na busca de sugestões, na ordem de mescla."""
+        query = presente.descricao
+        return {
+            'IA Gemini': lambda: IAService._produtos_ia(presente),
+            'Zoom': lambda: IAService.buscar_preco_zoom(query, max_results=3),
+            'Buscapé': lambda: IAService.buscar_preco_buscape(query, max_results=3),
+        }
+
+    @staticmethod
+    def _coletar_fontes_conforme_chegam(presente, prazo=None):
+        """
+        Consulta IA Gemini, Zoom e Buscapé em paralelo e gera
+        (fonte, produtos, erro) à medida que cada uma responde, dentro do
+        prazo total compartilhado (BUSCA_SUGESTOES_PRAZO). Fontes que não
+        responderem a tempo saem com erro de prazo, ao final.
+        """
+        fontes = IAService._fontes(presente)
+        if prazo is None:
+            prazo = getattr(settings, 'BUSCA_SUGESTOES_PRAZO', 30)
+
+        executor = ThreadPoolExecutor(max_workers=len(fontes), thread_name_prefix='fontes-precos')
+        futuros = {executor.submit(fechando_conexoes(funcao)): nome for nome, funcao in fontes.items()}
+        pendentes = set(futuros)
         try:
-            query = presente.descricao
-            logger.info(f"Buscando preços com IA + Zoom + Buscapé para: {query}")
+            for futuro in as_completed(futuros, timeout=prazo):
+                pendentes.discard(futuro)
+                nome = futuros[futuro]
+                try:
+                    yield nome, futuro.result() or [], None
+                except Exception as e:
+                    logger.error(f"Erro ao buscar em {nome}: {str(e)}")
+                    yield nome, [], str(e)
+        except FuturesTimeoutError:
+            for futuro in pendentes:
+                logger.warning(f"{futuros[futuro]} não respondeu em {prazo}s, ignorando")
+                yield futuros[futuro], [], f'Sem resposta em {prazo}s'
+        finally:
+            # Não esperar fontes atrasadas: as threads terminam sozinhas no timeout HTTP
+            executor.shutdown(wait=False, cancel_futures=True)
 
-            todos_produtos = []
+    @staticmethod
+    def _mesclar_fontes(por_fonte, presente):
+        """Mescla na ordem fixa das fontes (IA, Zoom, Buscapé), como na busca sequencial."""
+        todos_produtos = []
+        for nome in IAService._fontes(presente):
+            produtos = por_fonte.get(nome)
+            if produtos:
+                todos_produtos.extend(produtos)
+                logger.info(f"Adicionados {len(produtos)} produtos de {nome}")
+            elif nome in por_fonte:
+                logger.warning(f"{nome} não retornou produtos")
+        return todos_produtos
 
-            # 1. Buscar com IA Gemini (free tier - principal)
-            try:
-                logger.info("Tentando buscar com IA Gemini...")
-                sucesso_ia, mensagem_ia = IAService.buscar_sugestoes_gemini(presente)
-                if sucesso_ia:
-                    logger.info(f"IA Gemini: {mensagem_ia}")
-                    # IA já salvou as sugestões, vamos pegá-las
-                    sugestoes_ia = SugestaoCompra.objects.filter(presente=presente)
-                    for sug in sugestoes_ia:
-                        todos_produtos.append({
-                            'loja': sug.local_compra,
-                            'preco': float(sug.preco_sugerido) if sug.preco_sugerido else 0.0,
-                            'url': sug.url_compra or '',
-                            'fonte': 'IA'
-                        })
-                    logger.info(f"Adicionados {len(sugestoes_ia)} produtos da IA")
-                else:
-                    logger.warning(f"IA Gemini não retornou sugestões: {mensagem_ia}")
-            except Exception as e:
-                logger.error(f"Erro ao buscar com IA Gemini: {str(e)}")
+    @staticmethod
+    def _coletar_fontes(presente, prazo=None):
+        """Produtos de todas as fontes que responderam no prazo, numa lista única."""
+        por_fonte = {
+            nome: produtos
+            for nome, produtos, _ in IAService._coletar_fontes_conforme_chegam(presente, prazo)
+        }
+        return IAService._mesclar_fontes(por_fonte, presente)
 
-            # 2. Buscar no Zoom
-            try:
-                logger.info("Tentando buscar no Zoom...")
-                produtos_zoom = IAService.buscar_preco_zoom(query, max_results=3)
-                if produtos_zoom:
-                    todos_produtos.extend(produtos_zoom)
-                    logger.info(f"Adicionados {len(produtos_zoom)} produtos do Zoom")
-            except Exception as e:
-                logger.error(f"Erro ao buscar no Zoom: {str(e)}")
-
-            # 3. Buscar no Buscapé
-            try:
-                logger.info("Tentando buscar no Buscapé...")
-                produtos_buscape = IAService.buscar_preco_buscape(query, max_results=3)
-                if produtos_buscape:
-                    todos_produtos.extend(produtos_buscape)
-                    logger.info(f"Adicionados {len(produtos_buscape)} produtos do Buscapé")
-            except Exception as e:
-                logger.error(f"Erro ao buscar no Buscapé: {str(e)}")
+    @staticmethod
+    def _ranquear_produtos(todos_produtos, limite=10):
+        """
+        Ordena por preço (menor primeiro, sem preço no fim), descarta outliers
+        e deixa uma oferta por loja, a mais barata. Retorna até `limite`
+        dicts {'loja', 'url', 'preco', 'fonte'} já prontos para gravar.
+        """
+        # Ordenar por preço (menor primeiro), ignorando preços zerados
+        todos_produtos_com_preco = [p for p in todos_produtos if p.get('preco', 0) > 0]
+        if todos_produtos_com_preco:
+            todos_produtos_com_preco.sort(key=lambda x: x['preco'])
+
+            # Descartar outliers: preços muito fora da mediana costumam ser
+            # produto errado no resultado do scraper (acessório ou kit)
+            precos = [p['preco'] for p in todos_produtos_com_preco]
+            mediana = precos[len(precos) // 2]
+            todos_produtos_com_preco = [
+                p for p in todos_produtos_com_preco
+                if mediana * 0.35 <= p['preco'] <= mediana * 2.5
+            ]
 
-            if not todos_produtos:
-                logger.warning("Nenhum produto encontrado em nenhuma fonte")
-                return False, "Não foram encontrados produtos nas fontes de busca."
+            # Pegar os melhores preços primeiro, depois os sem preço
+            todos_produtos_sem_preco = [p for p in todos_produtos if p.get('preco', 0) == 0]
+            todos_produtos = todos_produtos_com_preco + todos_produtos_sem_preco
 
-            # Ordenar por preço (menor primeiro), ignorando preços zerados
-            todos_produtos_com_preco = [p for p in todos_produtos if p.get('preco', 0) > 0]
-            if todos_produtos_com_preco:
-                todos_produtos_com_preco.sort(key=lambda x: x['preco'])
-
-                # Descartar outliers: preços muito fora da mediana costumam ser
-                # produto errado no resultado do scraper (acessório ou kit)
-                precos = [p['preco'] for p in todos_produtos_com_preco]
-                mediana = precos[len(precos) // 2]
-                todos_produtos_com_preco = [
-                    p for p in todos_produtos_com_preco
-                    if mediana * 0.35 <= p['preco'] <= mediana * 2.5
-                ]
+        ranqueados = []
+        lojas_vistas = set()
+        for produto in todos_produtos:
+            if len(ranqueados) >= limite:
+                break
 
-                # Pegar os melhores preços primeiro, depois os sem preço
-                todos_produtos_sem_preco = [p for p in todos_produtos if p.get('preco', 0) == 0]
-                todos_produtos = todos_produtos_com_preco + todos_produtos_sem_preco
+            loja_nome = IAService._limpar_nome_loja(produto.get('loja', ''))
+            url = (produto.get('url') or '').strip()
+            preco = produto.get('preco') if produto.get('preco', 0) > 0 else None
 
-            # Limpar sugestões antigas e salvar novas (se não foram salvas pela IA)
-            SugestaoCompra.objects.filter(presente=presente).delete()
+            # Validar dados antes de salvar
+            if not loja_nome:
+                logger.warning(f"Ignorando sugestão sem nome de loja: {produto}")
+                continue
 
-            # Salvar até 10 melhores sugestões (uma por loja, a mais barata)
-            sugestoes_salvas = 0
-            lojas_salvas = set()
-            for produto in todos_produtos:
-                if sugestoes_salvas >= 10:
-                    break
+            if not url:
+                logger.warning(f"Ignorando sugestão sem URL: {produto}")
+                continue
 
-                loja_nome = IAService._limpar_nome_loja(produto.get('loja', ''))
-                url = produto.get('url', '').strip()
-                preco = produto.get('preco') if produto.get('preco', 0) > 0 else None
+            # Deduplicar por loja: como a lista está ordenada por preço,
+            # a primeira ocorrência de cada loja já é a mais barata
+            chave_loja = loja_nome.lower()
+            if chave_loja in lojas_vistas:
+                continue
+            lojas_vistas.add(chave_loja)
 
-                # Validar dados antes de salvar
-                if not loja_nome:
-                    logger.warning(f"Ignorando sugestão sem nome de loja: {produto}")
-                    continue
+            ranqueados.append({'loja': loja_nome, 'url': url, 'preco': preco, 'fonte': produto.get('fonte', '')})
+        return ranqueados
 
-                if not url:
-                    logger.warning(f"Ignorando sugestão sem URL: {produto}")
-                    continue
+    @staticmethod
+    def _gravar_sugestoes_reais(presente, ranqueados):
+        """Troca as sugestões do presente pelas ranqueadas e atualiza histórico, agenda e foto."""
+        # Limpar sugestões antigas e salvar novas (se não foram salvas pela IA)
+        SugestaoCompra.objects.filter(presente=presente).delete()
 
-                # Deduplicar por loja: como a lista está ordenada por preço,
-                # a primeira ocorrência de cada loja já é a mais barata
-                chave_loja = loja_nome.lower()
-                if chave_loja in lojas_salvas:
-                    continue
-                lojas_salvas.add(chave_loja)
+        for produto in ranqueados:
+            logger.info(f"Salvando sugestão: loja='{produto['loja']}', url='{produto['url']}', preco={produto['preco']}")
+            SugestaoCompra.objects.create(
+                grupo=presente.grupo,
+                presente=presente,
+                local_compra=produto['loja'],
+                url_compra=produto['url'],
+                preco_sugerido=produto['preco']
+            )
 
-                logger.info(f"Salvando sugestão: loja='{loja_nome}', url='{url}', preco={preco}")
+        IAService._registrar_historico(presente)
 
-                SugestaoCompra.objects.create(
-                    grupo=presente.grupo,
-                    presente=presente,
-                    local_compra=loja_nome,
-                    url_compra=url,
-                    preco_sugerido=preco
-                )
-                sugestoes_salvas += 1
+        # Próxima atualização conforme a volatilidade do preço (agendamento por presente)
+        from .pesquisa_precos import reagendar_presente
+        reagendar_presente(presente.id)
+
+        # Aproveitar a atualização para baixar a foto de produtos sem imagem
+        IAService.buscar_imagem_para_presente(presente)
 
-            IAService._registrar_historico(presente)
+        return f"Encontradas {len(ranqueados)} sugestões válidas de IA + Zoom + Buscapé!"
 
-            # Aproveitar a atualização para baixar a foto de produtos sem imagem
-            IAService.buscar_imagem_para_presente(presente)
+    @staticmethod
+    def buscar_sugestoes_reais(presente):
+        """Busca sugestões combinando IA + Zoom + Buscapé (consultados em paralelo)"""
+        try:
+            logger.info(f"Buscando preços com IA + Zoom + Buscapé para: {presente.descricao}")
+
+            todos_produtos = IAService._coletar_fontes(presente)
+
+            if not todos_produtos:
+                logger.warning("Nenhum produto encontrado em nenhuma fonte")
+                return False, "Não foram encontrados produtos nas fontes de busca."
 
-            return True, f"Encontradas {sugestoes_salvas} sugestões válidas de IA + Zoom + Buscapé!"
+            ranqueados = IAService._ranquear_produtos(todos_produtos)
+            return True, IAService._gravar_sugestoes_reais(presente, ranqueados)
 
         except Exception as e:
             logger.error(f"Erro ao buscar sugestões: {str(e)}")
@@ -394,21 +540,54 @@ class IAService:
             return False, f"Erro ao buscar preços: {str(e)}"
 
     @staticmethod
-    def buscar_sugestoes_claude(presente):
-        """Busca sugestões usando Claude AI"""
+    def buscar_sugestoes_em_etapas(presente):
+        """
+        Mesma busca de buscar_sugestoes_reais, gerando eventos para o
+        streaming (/buscar-sugestoes/<pk>/stream/):
+        - {'tipo': 'fonte', ...} a cada fonte que responde, com os produtos
+          dela e o ranking parcial de tudo o que já chegou;
+        - {'tipo': 'resultado', ...} no fim, com o ranking final (o mesmo
+          gravado em SugestaoCompra) e a mensagem para o usuário.
+        """
+        logger.info(f"Buscando preços (streaming) com IA + Zoom + Buscapé para: {presente.descricao}")
+        por_fonte = {}
         try:
-            client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
-        except TypeError as e:
-            logger.error(f"Erro ao inicializar cliente Anthropic: {str(e)}")
-            # Tentar com configuração básica sem argumentos extras
-            try:
-                import os
-                os.environ['ANTHROPIC_API_KEY'] = settings.ANTHROPIC_API_KEY
-                client = anthropic.Anthropic()
-            except Exception as e2:
-                logger.error(f"Erro ao inicializar cliente Anthropic (tentativa 2): {str(e2)}")
-                return False, f"Erro ao configurar o motor de busca: {str(e2)}"
-        
+            for nome, produtos, erro in IAService._coletar_fontes_conforme_chegam(presente):
+                por_fonte[nome] = produtos
+                yield {
+                    'tipo': 'fonte',
+                    'fonte': nome,
+                    'produtos': produtos,
+                    'erro': erro,
+                    'ranking': IAService._ranquear_produtos(IAService._mesclar_fontes(por_fonte, presente)),
+                }
+
+            todos_produtos = IAService._mesclar_fontes(por_fonte, presente)
+            if not todos_produtos:
+                logger.warning("Nenhum produto encontrado em nenhuma fonte")
+                yield {'tipo': 'resultado', 'sucesso': False, 'sugestoes': [],
+                       'mensagem': "Não foram encontrados produtos nas fontes de busca."}
+                return
+
+            ranqueados = IAService._ranquear_produtos(todos_produtos)
+            mensagem = IAService._gravar_sugestoes_reais(presente, ranqueados)
+            yield {'tipo': 'resultado', 'sucesso': True, 'sugestoes': ranqueados, 'mensagem': mensagem}
+
+        except Exception as e:
+            logger.error(f"Erro ao buscar sugestões: {str(e)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            yield {'tipo': 'resultado', 'sucesso': False, 'sugestoes': [],
+                   'mensagem': f"Erro ao buscar preços: {str(e)}"}
+
+    @staticmethod
+    def consultar_claude(presente):
+        """
+        Consulta o Claude e retorna a lista de sugestões [{loja, url, preco}],
+        sem gravar no banco. Lança exceção em caso de falha.
+        """
+        client = http_client.obter_cliente_ia('anthropic', settings.ANTHROPIC_API_KEY)
+
         prompt = f"""
         Encontre 5 lojas online no Brasil que vendem o seguinte produto: {presente.descricao}
         Preço estimado: R$ {presente.preco if presente.preco else 'Não informado'}
@@ -426,12 +605,12 @@ class IAService:
         
         Busque por lojas reais e conhecidas como Amazon, Mercado Livre, Magazine Luiza, Americanas, etc.
         """
-        
-        try:
-            # Haiku 4.5: modelo atual mais barato ($1/$5 por MTok) — suficiente
-            # para extração JSON simples. O anterior (claude-sonnet-4-20250514)
-            # foi descontinuado e aposenta em 15/06/2026.
-            modelo = getattr(settings, 'ANTHROPIC_MODEL', 'claude-haiku-4-5')
+
+        # Haiku 4.5: modelo atual mais barato ($1/$5 por MTok) — suficiente
+        # para extração JSON simples. O anterior (claude-sonnet-4-20250514)
+        # foi descontinuado e aposenta em 15/06/2026.
+        modelo = getattr(settings, 'ANTHROPIC_MODEL', 'claude-haiku-4-5')
+        with limite_host('api.anthropic.com'):
             message = client.messages.create(
                 model=modelo,
                 max_tokens=1024,
@@ -439,24 +618,29 @@ class IAService:
                     {"role": "user", "content": prompt}
                 ]
             )
-            
-            resposta = message.content[0].text
-            # Limpar markdown se existir
-            resposta = resposta.replace('```json', '').replace('```', '').strip()
-            dados = json.loads(resposta)
-            
-            # Salvar sugestões
-            IAService._salvar_sugestoes(presente, dados['sugestoes'])
+
+        resposta = message.content[0].text
+        # Limpar markdown se existir
+        resposta = resposta.replace('```json', '').replace('```', '').strip()
+        return json.loads(resposta)['sugestoes']
+
+    @staticmethod
+    def buscar_sugestoes_claude(presente):
+        """Busca sugestões usando Claude AI"""
+        try:
+            IAService._salvar_sugestoes(presente, IAService.consultar_claude(presente))
             return True, "Sugestões encontradas com sucesso!"
-            
         except Exception as e:
             return False, f"Erro ao buscar sugestões: {str(e)}"
-    
+
     @staticmethod
-    def buscar_sugestoes_chatgpt(presente):
-        """Busca sugestões usando ChatGPT"""
-        openai.api_key = settings.OPENAI_API_KEY
-        
+    def consultar_chatgpt(presente):
+        """
+        Consulta o ChatGPT e retorna a lista de sugestões [{loja, url, preco}],
+        sem gravar no banco. Lança exceção em caso de falha.
+        """
+        client = http_client.obter_cliente_ia('openai', settings.OPENAI_API_KEY)
+
         prompt = f"""
         Encontre 5 lojas online no Brasil que vendem: {presente.descricao}
         Preço estimado: R$ {presente.preco if presente.preco else 'Não informado'}
@@ -468,40 +652,39 @@ class IAService:
             ]
         }}
         """
-        
-        try:
-            modelo = getattr(settings, 'OPENAI_MODEL', 'gpt-4o-mini')
-            response = openai.chat.completions.create(
+
+        modelo = getattr(settings, 'OPENAI_MODEL', 'gpt-4o-mini')
+        with limite_host('api.openai.com'):
+            response = client.chat.completions.create(
                 model=modelo,
                 messages=[
                     {"role": "system", "content": "Você é um assistente que busca produtos em lojas brasileiras."},
                     {"role": "user", "content": prompt}
                 ]
             )
-            
-            resposta = response.choices[0].message.content
-            resposta = resposta.replace('```json', '').replace('```', '').strip()
-            dados = json.loads(resposta)
-            
-            IAService._salvar_sugestoes(presente, dados['sugestoes'])
+
+        resposta = response.choices[0].message.content
+        resposta = resposta.replace('```json', '').replace('```', '').strip()
+        return json.loads(resposta)['sugestoes']
+
+    @staticmethod
+    def buscar_sugestoes_chatgpt(presente):
+        """Busca sugestões usando ChatGPT"""
+        try:
+            IAService._salvar_sugestoes(presente, IAService.consultar_chatgpt(presente))
             return True, "Sugestões encontradas com sucesso!"
-            
         except Exception as e:
             return False, f"Erro ao buscar sugestões: {str(e)}"
-    
+
     @staticmethod
-    def buscar_sugestoes_gemini(presente):
-        """Busca sugestões usando Google Gemini (free tier - gemini-2.5-flash)"""
+    def consultar_gemini(presente):
+        """
+        Consulta o Google Gemini (free tier - gemini-2.5-flash) e retorna a
+        lista de sugestões [{loja, url, preco}], sem gravar no banco.
+        Lança exceção em caso de falha de rede ou resposta inválida.
+        """
         if not settings.GEMINI_API_KEY or settings.GEMINI_API_KEY == 'sua-chave-gemini':
-            logger.warning("GEMINI_API_KEY não configurada")
-            return False, "Chave da API Gemini não configurada."
-
-        # Modelo gratuito do Gemini (free tier generoso)
-        modelo = getattr(settings, 'GEMINI_MODEL', 'gemini-2.5-flash')
-        url = (
-            f"https://generativelanguage.googleapis.com/v1beta/models/"
-            f"{modelo}:generateContent?key={settings.GEMINI_API_KEY}"
-        )
+            raise ValueError("Chave da API Gemini não configurada.")
 
         prompt = f"""
         Encontre 5 lojas online no Brasil que vendem o seguinte produto: {presente.descricao}
@@ -517,6 +700,17 @@ class IAService:
         Busque por lojas reais e conhecidas como Amazon, Mercado Livre, Magazine Luiza, Americanas, Kabum, etc.
         """
 
+        return IAService._chamar_gemini(prompt)['sugestoes']
+
+    @staticmethod
+    def _chamar_gemini(prompt, timeout=30):
+        """Envia o prompt ao Gemini pedindo resposta em JSON e retorna o JSON decodificado."""
+        # Modelo gratuito do Gemini (free tier generoso)
+        modelo = getattr(settings, 'GEMINI_MODEL', 'gemini-2.5-flash')
+        url = (
+            f"https://generativelanguage.googleapis.com/v1beta/models/"
+            f"{modelo}:generateContent?key={settings.GEMINI_API_KEY}"
+        )
         payload = {
             "contents": [{
                 "parts": [{"text": prompt}]
@@ -527,16 +721,80 @@ class IAService:
             }
         }
 
-        try:
-            response = requests.post(url, json=payload, timeout=30)
-            response.raise_for_status()
-            dados = response.json()
+        response = http_client.post(url, json=payload, timeout=timeout)
+        response.raise_for_status()
+        dados = response.json()
 
-            texto = dados['candidates'][0]['content']['parts'][0]['text']
-            texto = texto.replace('```json', '').replace('```', '').strip()
-            sugestoes = json.loads(texto)
+        texto = dados['candidates'][0]['content']['parts'][0]['text']
+        texto = texto.replace('```json', '').replace('```', '').strip()
+        return json.loads(texto)
+
+    @staticmethod
+    def consultar_gemini_lote(presentes):
+        """
+        Uma única consulta ao Gemini para vários presentes (pesquisa de preços).
+        Retorna {presente_id: [{loja, url, preco}]} apenas com os itens que
+        vieram válidos; os que faltarem ficam para a consulta individual.
+        Lança exceção em caso de falha de rede ou resposta inválida.
+        """
+        if not settings.GEMINI_API_KEY or settings.GEMINI_API_KEY == 'sua-chave-gemini':
+            raise ValueError("Chave da API Gemini não configurada.")
+
+        itens = '\n'.join(
+            json.dumps({
+                'id': presente.id,
+                'produto': presente.descricao,
+                'preco_estimado': float(presente.preco) if presente.preco else None,
+            }, ensure_ascii=False)
+            for presente in presentes
+        )
+        prompt = f"""
+        Para cada produto da lista abaixo, encontre até 5 lojas online no Brasil que o vendem.
+
+        Produtos (um JSON por linha):
+        {itens}
+
+        Retorne APENAS um JSON válido (sem markdown, sem texto extra) no formato:
+        {{
+            "itens": [
+                {{
+                    "id": 1,
+                    "sugestoes": [
+                        {{"loja": "Nome da Loja", "url": "https://www.loja.com.br/produto", "preco": 199.90}}
+                    ]
+                }}
+            ]
+        }}
+
+        Repita o "id" de cada produto. Busque por lojas reais e conhecidas como Amazon, Mercado Livre, Magazine Luiza, Americanas, Kabum, etc.
+        """
 
-            IAService._salvar_sugestoes(presente, sugestoes['sugestoes'])
+        # Resposta maior que a de um presente: mais prazo que a consulta individual
+        dados = IAService._chamar_gemini(prompt, timeout=60)
+        ids = {presente.id for presente in presentes}
+        resultado = {}
+        for item in dados.get('itens') or []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                presente_id = int(item.get('id'))
+            except (TypeError, ValueError):
+                continue
+            sugestoes = item.get('sugestoes')
+            if presente_id in ids and isinstance(sugestoes, list):
+                resultado[presente_id] = [sug for sug in sugestoes if isinstance(sug, dict)]
+        return resultado
+
+    @staticmethod
+    def buscar_sugestoes_gemini(presente):
+        """Busca sugestões usando Google Gemini e grava no banco"""
+        if not settings.GEMINI_API_KEY or settings.GEMINI_API_KEY == 'sua-chave-gemini':
+            logger.warning("GEMINI_API_KEY não configurada")
+            return False, "Chave da API Gemini não configurada."
+
+        try:
+            sugestoes = IAService.consultar_gemini(presente)
+            IAService._salvar_sugestoes(presente, sugestoes)
             return True, "Sugestões encontradas com sucesso via Gemini!"
 
         except requests.exceptions.RequestException as e:
@@ -548,7 +806,7 @@ class IAService:
         except Exception as e:
             logger.error(f"Erro ao buscar sugestões com Gemini: {str(e)}")
             return False, f"Erro ao buscar sugestões: {str(e)}"
-    
+
     @staticmethod
     def buscar_imagem_para_presente(presente):
         """
@@ -558,7 +816,6 @@ class IAService:
         if presente.tem_imagem() or not presente.url:
             return False
         try:
-            import base64
             from .scrapers import ScraperFactory
 
             resultado = ScraperFactory.extract_product_info(presente.url)
@@ -573,7 +830,7 @@ class IAService:
                 logger.info(f"Sem imagem disponível para presente {presente.id}")
                 return False
 
-            resp = requests.get(imagem_url, headers=IAService.HEADERS, timeout=15)
+            resp = http_client.get(imagem_url, headers=IAService.HEADERS, timeout=15)
             resp.raise_for_status()
 
             content_type = resp.headers.get('content-type', '').split(';')[0].strip()
@@ -582,10 +839,12 @@ class IAService:
             if len(resp.content) > 5 * 1024 * 1024:
                 return False
 
-            presente.imagem_base64 = base64.b64encode(resp.content).decode('utf-8')
-            presente.imagem_nome = imagem_url.split('/')[-1].split('?')[0][:255] or 'produto.jpg'
-            presente.imagem_tipo = content_type
-            presente.save(update_fields=['imagem_base64', 'imagem_nome', 'imagem_tipo'])
+            presente.definir_imagem(
+                resp.content,
+                imagem_url.split('/')[-1].split('?')[0][:255] or 'produto.jpg',
+                content_type,
+            )
+            presente.save(update_fields=['imagem_blob', 'imagem_base64', 'imagem_nome', 'imagem_tipo', 'imagem'])
             logger.info(f"Imagem baixada para presente {presente.id} ({content_type})")
             return True
         except Exception as e:
@@ -612,31 +871,36 @@ class IAService:
     @staticmethod
     def buscar_sugestoes_com_fallback(presente):
         """
-        Busca sugestões tentando os motores de IA em ordem de custo crescente:
-        Gemini (free tier) -> ChatGPT (gpt-4o-mini) -> Claude (haiku 4.5).
-        Se um motor falhar (sem crédito, chave inválida, indisponível),
-        passa automaticamente para o próximo.
+        Busca sugestões nos motores de IA pelo roteador (presentes/roteador_ia.py):
+        em ordem de custo crescente, Gemini (free tier) -> ChatGPT (gpt-4o-mini)
+        -> Claude (haiku 4.5), pulando motores em pausa (falhas seguidas ou cota
+        esgotada) e disparando o próximo se o atual demorar mais que o seu p95.
         """
-        motores = [
-            ('Gemini', settings.GEMINI_API_KEY, IAService.buscar_sugestoes_gemini),
-            ('ChatGPT', settings.OPENAI_API_KEY, IAService.buscar_sugestoes_chatgpt),
-            ('Claude', settings.ANTHROPIC_API_KEY, IAService.buscar_sugestoes_claude),
-        ]
+        from .roteador_ia import consultar_motores
 
-        for nome, chave, funcao in motores:
-            if not chave or chave.startswith('sua-chave'):
-                logger.info(f"[IA] {nome}: chave não configurada, pulando para o próximo motor")
-                continue
-            try:
-                sucesso, mensagem = funcao(presente)
-                if sucesso:
-                    logger.info(f"[IA] Sugestões obtidas com {nome}")
-                    return True, "Sugestões encontradas com sucesso!"
-                logger.warning(f"[IA] {nome} não retornou sugestões: {mensagem}. Tentando próximo motor...")
-            except Exception as e:
-                logger.warning(f"[IA] {nome} falhou: {str(e)}. Tentando próximo motor...")
-
-        return False, "Os motores de busca estão indisponíveis no momento. Tente novamente mais tarde."
+        return IAService._concluir_busca_ia(presente, consultar_motores(presente))
+
+    @staticmethod
+    async def abuscar_sugestoes_com_fallback(presente):
+        """
+        Versão async de buscar_sugestoes_com_fallback (views async): os
+        motores são consultados fora do event loop e a gravação vai para
+        sync_to_async.
+        """
+        from asgiref.sync import sync_to_async
+        from .roteador_ia import consultar_motores
+
+        resultado = await http_client.em_thread(consultar_motores, presente)
+        return await sync_to_async(IAService._concluir_busca_ia)(presente, resultado)
+
+    @staticmethod
+    def _concluir_busca_ia(presente, resultado):
+        if resultado is None:
+            return False, "Os motores de busca estão indisponíveis no momento. Tente novamente mais tarde."
+        nome, sugestoes = resultado
+        IAService._salvar_sugestoes(presente, sugestoes)
+        logger.info(f"[IA] Sugestões obtidas com {nome}")
+        return True, "Sugestões encontradas com sucesso!"
 
     @staticmethod
     def _limpar_nome_loja(nome):
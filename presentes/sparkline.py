@@ -0,0 +1,127 @@
+"""
+Gráfico de evolução de preço (sparkline no estilo do PriceComparisonModal
+do LPII).
+
+A geometria SVG só muda quando o histórico muda, então é calculada uma vez
+por alteração (Presente.registrar_preco, recalcular, compactação) e
+guardada em PrecoEstatistica.sparklines, uma entrada por variante de
+tamanho. As páginas só leem o JSON pronto; entradas ausentes ou de uma
+VERSAO anterior são recalculadas na primeira leitura.
+"""
+from django.utils import timezone
+
+PONTOS_SPARKLINE = 12
+# variante -> (largura, altura) do viewBox
+VARIANTES = {
+    'pagina': (600, 220),   # ver_sugestoes
+    'modal': (500, 190),    # modal de produto em lista_usuarios
+}
+# Incrementar ao mudar a geometria: invalida os sparklines guardados
+VERSAO = 1
+
+
+def _formatar_preco(preco):
+    """Decimal -> '1234,56' (como o Django exibe com LANGUAGE_CODE=pt-br)."""
+    return f'{preco:.2f}'.replace('.', ',')
+
+
+def montar_sparkline(historico, largura=600, altura=220):
+    """
+    Calcula as coordenadas SVG do gráfico de histórico de preços,
+    no estilo do PriceComparisonModal do LPII: grade horizontal com
+    valores, área em gradiente rose, linha 2.5px e pontos brancos.
+    O resultado é serializável em JSON (guardado em PrecoEstatistica).
+    """
+    pontos_validos = [h for h in historico if h.preco][-PONTOS_SPARKLINE:]
+    if len(pontos_validos) < 2:
+        return None
+
+    pad_esq, pad_dir, pad_top, pad_inf = 64, 20, 16, 34
+    plot_largura = largura - pad_esq - pad_dir
+    plot_altura = altura - pad_top - pad_inf
+    y_base = altura - pad_inf
+
+    precos = [float(h.preco) for h in pontos_validos]
+    p_min = min(precos) * 0.95
+    p_max = max(precos) * 1.05
+    faixa = (p_max - p_min) or 1.0
+
+    def get_y(valor):
+        return y_base - ((valor - p_min) * plot_altura) / faixa
+
+    n = len(pontos_validos)
+    # Rotular no máximo ~4 datas (primeira, intermediárias e última)
+    passo_rotulo = max(1, (n - 1) // 3 or 1)
+    indices_rotulo = set(range(0, n, passo_rotulo)) | {n - 1}
+
+    # IMPORTANTE: coordenadas formatadas como string em Python (ponto decimal).
+    # Com LANGUAGE_CODE=pt-br o Django renderiza floats com vírgula no template
+    # ("217,5"), o que é inválido como atributo SVG e quebra o gráfico.
+    pontos = []
+    for i, h in enumerate(pontos_validos):
+        x = pad_esq + i * plot_largura / (n - 1)
+        pontos.append({
+            'x': f'{x:.1f}',
+            'y': f'{get_y(float(h.preco)):.1f}',
+            'preco_fmt': _formatar_preco(h.preco), 'loja': h.loja,
+            'data_completa': timezone.localtime(h.data).strftime('%d/%m/%Y'),
+            'data_fmt': h.data.strftime('%d/%m'),
+            'rotulo': i in indices_rotulo,
+        })
+
+    # Grade horizontal com 4 níveis de preço (valores já formatados)
+    grades = []
+    for i in range(4):
+        valor = p_min + faixa * i / 3
+        grades.append({
+            'y': f'{get_y(valor):.1f}',
+            'y_texto': f'{get_y(valor) + 4:.1f}',
+            'valor_fmt': f'R$ {valor:,.0f}'.replace(',', '.'),
+        })
+
+    polyline = ' '.join(f"{p['x']},{p['y']}" for p in pontos)
+    area = f"M {pontos[0]['x']},{y_base} L " + ' L '.join(
+        f"{p['x']},{p['y']}" for p in pontos
+    ) + f" L {pontos[-1]['x']},{y_base} Z"
+
+    return {
+        'pontos': pontos, 'grades': grades,
+        'polyline': polyline, 'area': area,
+        'largura': largura, 'altura': altura,
+        'pad_esq': pad_esq, 'grade_x2': largura - pad_dir,
+        'pad_esq_texto': pad_esq - 8,
+        'y_base': y_base, 'y_rotulo': y_base + 22,
+        'min': min(precos), 'max': max(precos),
+    }
+
+
+def calcular_sparklines(presente_id):
+    """Todas as variantes a partir dos últimos PONTOS_SPARKLINE pontos (uma consulta)."""
+    from .models import PrecoHistorico
+
+    historico = list(
+        PrecoHistorico.objects.filter(presente_id=presente_id, preco__gt=0).ultimos(PONTOS_SPARKLINE)
+    )
+    sparklines = {'versao': VERSAO}
+    for variante, (largura, altura) in VARIANTES.items():
+        sparklines[variante] = montar_sparkline(historico, largura, altura)
+    return sparklines
+
+
+def sparkline_do_presente(presente, variante):
+    """
+    Sparkline guardado do presente (None se tiver menos de 2 pontos).
+    Usa select_related('estatistica_preco') quando disponível.
+    """
+    from .models import PrecoEstatistica
+
+    try:
+        estatistica = presente.estatistica_preco
+    except PrecoEstatistica.DoesNotExist:
+        return None
+    if estatistica.total < 2:
+        return None
+    sparklines = estatistica.sparklines or {}
+    if sparklines.get('versao') != VERSAO or variante not in sparklines:
+        sparklines = PrecoEstatistica.atualizar_sparklines(presente.pk)
+    return sparklines.get(variante)
@@ -0,0 +1,375 @@
+"""
+Fila de tarefas em background, persistida no banco (modelo Tarefa).
+
+Substitui as threading.Thread(daemon=True) avulsas: a tarefa fica gravada
+antes de executar, então um reinício do worker do gunicorn (max_requests,
+deploy) não a perde, e vários processos podem consumir a mesma fila sem
+executar a mesma tarefa duas vezes.
+
+- enfileirar(tipo, parametros, prioridade, chave): grava a tarefa;
+  `chave` impede duplicatas enquanto houver uma pendente/executando.
+- Trabalhador: reivindica tarefas com SELECT ... FOR UPDATE SKIP LOCKED
+  (menor prioridade primeiro), executa num pool limitado de threads e
+  renova o lease (bloqueada_ate) enquanto a tarefa roda. Tarefa cujo
+  lease venceu (processo morto) volta para a fila.
+- Falhas (exceções) são repetidas com backoff exponencial até
+  max_tentativas; depois disso a tarefa fica como 'falhou'.
+
+O trabalhador roda embutido no processo web (TAREFAS_TRABALHADOR_EMBUTIDO,
+iniciado pelo PesquisaPrecoMiddleware no primeiro request) ou separado:
+    python manage.py processar_tarefas --workers 4
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Menor executa primeiro
+PRIORIDADE_USUARIO = 0      # ação de um usuário esperando o resultado (novo presente)
+PRIORIDADE_NORMAL = 50
+PRIORIDADE_PREPARACAO = 90  # preparo da varredura (consulta de IA em lote), antes dos presentes
+PRIORIDADE_VARREDURA = 100  # pesquisa semanal, presente a presente
+
+# tipo -> função (caminho pontuado). A função recebe os parâmetros como kwargs.
+# 'ao_desistir' (opcional) é chamada com os mesmos kwargs quando a tarefa
+# esgota as tentativas.
+TAREFAS = {
+    'buscar_precos_presente': {
+        'funcao': 'presentes.pesquisa_precos.tarefa_buscar_precos_presente',
+    },
+    'pesquisa_precos': {
+        'funcao': 'presentes.pesquisa_precos.tarefa_pesquisa_precos',
+    },
+    'atualizar_preco_presente': {
+        'funcao': 'presentes.pesquisa_precos.tarefa_atualizar_preco_presente',
+    },
+    'consultar_ia_lote': {
+        'funcao': 'presentes.pesquisa_precos.tarefa_consultar_ia_lote',
+        'ao_desistir': 'presentes.pesquisa_precos.tarefa_consultar_ia_lote_desistir',
+    },
+    'verificar_atualizacoes': {
+        'funcao': 'presentes.pesquisa_precos.tarefa_verificar_atualizacoes',
+    },
+    'compactar_historico': {
+        'funcao': 'presentes.retencao_precos.tarefa_compactar_historico',
+    },
+    'pesquisar_presente': {
+        'funcao': 'presentes.pesquisa_precos.tarefa_pesquisar_presente',
+        'ao_desistir': 'presentes.pesquisa_precos.tarefa_pesquisar_presente_desistir',
+    },
+}
+
+_acordar = threading.Event()
+
+
+def _config(nome, padrao):
+    return getattr(settings, nome, padrao)
+
+
+def enfileirar(tipo, parametros=None, prioridade=PRIORIDADE_NORMAL, chave=None, atraso=None,
+               max_tentativas=None):
+    """
+    Grava uma tarefa na fila e retorna a instância. Se `chave` já tiver uma
+    tarefa pendente/executando, retorna essa em vez de duplicar.
+    """
+    from .models import Tarefa
+
+    if tipo not in TAREFAS:
+        raise ValueError(f"Tipo de tarefa desconhecido: {tipo}")
+
+    if chave:
+        existente = Tarefa.objects.filter(chave=chave, status__in=['pendente', 'executando']).first()
+        if existente:
+            return existente
+
+    try:
+        with transaction.atomic():
+            tarefa = Tarefa.objects.create(
+                tipo=tipo,
+                parametros=parametros or {},
+                prioridade=prioridade,
+                chave=chave,
+                disponivel_em=timezone.now() + (atraso or timedelta()),
+                max_tentativas=max_tentativas or _config('TAREFAS_MAX_TENTATIVAS', 5),
+            )
+    except IntegrityError:
+        # Mesma chave enfileirada por outro processo ao mesmo tempo
+        return Tarefa.objects.filter(chave=chave, status__in=['pendente', 'executando']).first()
+
+    _acordar.set()
+    return tarefa
+
+
+def enfileirar_varios(tipo, lista_parametros, prioridade=PRIORIDADE_NORMAL):
+    """Grava várias tarefas do mesmo tipo num único INSERT (sem chave de deduplicação)."""
+    from .models import Tarefa
+
+    if tipo not in TAREFAS:
+        raise ValueError(f"Tipo de tarefa desconhecido: {tipo}")
+    agora = timezone.now()
+    max_tentativas = _config('TAREFAS_MAX_TENTATIVAS', 5)
+    Tarefa.objects.bulk_create(
+        [
+            Tarefa(tipo=tipo, parametros=parametros, prioridade=prioridade,
+                   disponivel_em=agora, max_tentativas=max_tentativas)
+            for parametros in lista_parametros
+        ],
+        batch_size=500,
+    )
+    _acordar.set()
+
+
+def _backoff(tentativas):
+    """30s, 1min, 2min, ... (até TAREFAS_BACKOFF_MAXIMO) com até 25% de variação."""
+    base = _config('TAREFAS_BACKOFF_BASE', 30)
+    espera = min(base * (2 ** max(0, tentativas - 1)), _config('TAREFAS_BACKOFF_MAXIMO', 3600))
+    return timedelta(seconds=espera * random.uniform(1.0, 1.25))
+
+
+def reivindicar(trabalhador_id, limite, tipos=None):
+    """
+    Marca até `limite` tarefas como 'executando' para este trabalhador e as
+    retorna. Entram as pendentes já disponíveis e as executando com lease
+    vencido (só dos `tipos` indicados, se houver). SKIP LOCKED faz processos
+    concorrentes pegarem tarefas diferentes.
+    """
+    from .models import Tarefa
+
+    agora = timezone.now()
+    lease = timedelta(seconds=_config('TAREFAS_LEASE', 300))
+    # Sem FOR UPDATE (SQLite) a transação só atrapalharia: a leitura seguida de
+    # escrita dá 'database is locked'; o UPDATE condicional abaixo já garante a posse
+    bloqueio = transaction.atomic() if connection.features.has_select_for_update else nullcontext()
+    with bloqueio:
+        fila = Tarefa.objects.select_for_update(skip_locked=True).filter(
+            Q(status='pendente', disponivel_em__lte=agora)
+            | Q(status='executando', bloqueada_ate__lt=agora)
+        )
+        if tipos:
+            fila = fila.filter(tipo__in=tipos)
+        candidatas = list(fila.order_by('prioridade', 'disponivel_em', 'id')[:limite])
+        reivindicadas = []
+        for tarefa in candidatas:
+            if tarefa.status == 'executando':
+                logger.warning(
+                    f"[TAREFAS] Lease vencido da tarefa {tarefa.pk} ({tarefa.tipo}, "
+                    f"era de {tarefa.bloqueada_por}); reexecutando"
+                )
+            # Condição repetida no UPDATE: no SQLite não há FOR UPDATE
+            atualizadas = Tarefa.objects.filter(
+                Q(status='pendente') | Q(status='executando', bloqueada_ate__lt=agora),
+                pk=tarefa.pk,
+            ).update(
+                status='executando',
+                bloqueada_por=trabalhador_id,
+                bloqueada_ate=agora + lease,
+                iniciada_em=agora,
+                tentativas=tarefa.tentativas + 1,
+            )
+            if atualizadas:
+                tarefa.tentativas += 1
+                tarefa.bloqueada_por = trabalhador_id
+                reivindicadas.append(tarefa)
+    return reivindicadas
+
+
+def executar(tarefa):
+    """Executa uma tarefa já reivindicada e grava o resultado (concluída, nova tentativa ou falha)."""
+    from .models import Tarefa
+
+    definicao = TAREFAS.get(tarefa.tipo)
+    meus = Tarefa.objects.filter(pk=tarefa.pk, bloqueada_por=tarefa.bloqueada_por)
+    if definicao is None:
+        meus.update(status='falhou', ultimo_erro=f'Tipo desconhecido: {tarefa.tipo}',
+                    concluida_em=timezone.now(), bloqueada_ate=None)
+        return
+
+    try:
+        import_string(definicao['funcao'])(**tarefa.parametros)
+    except Exception as e:
+        erro = f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"
+        if tarefa.tentativas < tarefa.max_tentativas:
+            espera = _backoff(tarefa.tentativas)
+            logger.warning(
+                f"[TAREFAS] {tarefa.tipo} #{tarefa.pk} falhou (tentativa {tarefa.tentativas}/"
+                f"{tarefa.max_tentativas}), nova tentativa em {int(espera.total_seconds())}s: {str(e)}"
+            )
+            meus.update(status='pendente', disponivel_em=timezone.now() + espera,
+                        bloqueada_ate=None, bloqueada_por='', ultimo_erro=erro)
+        else:
+            logger.error(f"[TAREFAS] {tarefa.tipo} #{tarefa.pk} desistiu após {tarefa.tentativas} tentativas: {str(e)}")
+            meus.update(status='falhou', concluida_em=timezone.now(), bloqueada_ate=None, ultimo_erro=erro)
+            if definicao.get('ao_desistir'):
+                try:
+                    import_string(definicao['ao_desistir'])(**tarefa.parametros)
+                except Exception:
+                    logger.exception(f"[TAREFAS] Erro no ao_desistir de {tarefa.tipo} #{tarefa.pk}")
+        return
+
+    meus.update(status='concluida', concluida_em=timezone.now(), bloqueada_ate=None)
+
+
+def limpar_antigas():
+    """Remove tarefas concluídas/falhas há mais de TAREFAS_RETENCAO_DIAS."""
+    from .models import Tarefa
+    limite = timezone.now() - timedelta(days=_config('TAREFAS_RETENCAO_DIAS', 7))
+    removidas, _ = Tarefa.objects.filter(
+        status__in=['concluida', 'falhou'], concluida_em__lt=limite
+    ).delete()
+    return removidas
+
+
+class Trabalhador:
+    """
+    Consome a fila com até `workers` tarefas simultâneas.
+
+    executar_ate_esvaziar() processa o que já está disponível e retorna
+    (tarefas em backoff ficam para depois); executar_continuamente() roda
+    em loop (comando processar_tarefas); iniciar() roda o loop numa thread
+    daemon (trabalhador embutido). Com `tipos`, só consome tarefas desses
+    tipos (ex.: a pesquisa síncrona de pesquisa_precos.executar_pesquisa).
+    """
+
+    def __init__(self, workers=None, intervalo=None, tipos=None):
+        self.workers = max(1, workers or _config('TAREFAS_WORKERS', 2))
+        self.intervalo = intervalo or _config('TAREFAS_INTERVALO', 5)
+        self.tipos = tipos
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._ativas = set()
+        self._ativas_lock = threading.Lock()
+        self._parar = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='tarefa')
+
+    def _vagas(self):
+        with self._ativas_lock:
+            return self.workers - len(self._ativas)
+
+    def _executar(self, tarefa):
+        close_old_connections()
+        try:
+            executar(tarefa)
+        except Exception:
+            logger.exception(f"[TAREFAS] Erro ao finalizar tarefa {tarefa.pk}")
+        finally:
+            with self._ativas_lock:
+                self._ativas.discard(tarefa.pk)
+            close_old_connections()
+            _acordar.set()
+
+    def _renovar_leases(self):
+        """Estende o lease das tarefas em execução (heartbeat), a cada 1/3 do lease."""
+        from .models import Tarefa
+        lease = _config('TAREFAS_LEASE', 300)
+        while not self._parar.wait(lease / 3):
+            with self._ativas_lock:
+                ativas = list(self._ativas)
+            if not ativas:
+                continue
+            close_old_connections()
+            try:
+                Tarefa.objects.filter(pk__in=ativas, bloqueada_por=self.id, status='executando').update(
+                    bloqueada_ate=timezone.now() + timedelta(seconds=lease)
+                )
+            except Exception:
+                logger.exception("[TAREFAS] Erro ao renovar leases")
+            finally:
+                close_old_connections()
+
+    def _despachar(self):
+        """Reivindica tarefas para as vagas livres. Retorna quantas foram iniciadas."""
+        vagas = self._vagas()
+        if vagas <= 0:
+            return 0
+        tarefas = reivindicar(self.id, vagas, self.tipos)
+        for tarefa in tarefas:
+            with self._ativas_lock:
+                self._ativas.add(tarefa.pk)
+            self._executor.submit(self._executar, tarefa)
+        return len(tarefas)
+
+    def executar_ate_esvaziar(self):
+        """Processa até não haver tarefas disponíveis nem em execução."""
+        heartbeat = threading.Thread(target=self._renovar_leases, daemon=True, name='tarefas-lease')
+        heartbeat.start()
+        try:
+            while True:
+                iniciadas = self._despachar()
+                if not iniciadas and self._vagas() == self.workers:
+                    break
+                _acordar.wait(1)
+                _acordar.clear()
+        finally:
+            self._parar.set()
+            self._executor.shutdown(wait=True)
+
+    def executar_continuamente(self):
+        """Loop do trabalhador: busca tarefas a cada `intervalo` segundos (ou ao ser acordado)."""
+        threading.Thread(target=self._renovar_leases, daemon=True, name='tarefas-lease').start()
+        ultima_limpeza = 0.0
+        while not self._parar.is_set():
+            iniciadas = 0
+            close_old_connections()
+            try:
+                iniciadas = self._despachar()
+                if time.monotonic() - ultima_limpeza > 3600:
+                    ultima_limpeza = time.monotonic()
+                    limpar_antigas()
+            except RuntimeError:
+                # Executor encerrado (interpretador finalizando): a tarefa
+                # reivindicada volta para a fila quando o lease vencer
+                break
+            except Exception:
+                # Banco indisponível: tenta de novo no próximo ciclo
+                logger.exception("[TAREFAS] Erro ao buscar tarefas")
+            finally:
+                close_old_connections()
+            if not iniciadas:
+                _acordar.wait(self.intervalo)
+                _acordar.clear()
+
+    def iniciar(self):
+        threading.Thread(target=self.executar_continuamente, daemon=True, name='tarefas').start()
+        logger.info(f"[TAREFAS] Trabalhador {self.id} iniciado com {self.workers} workers")
+
+    def parar(self):
+        self._parar.set()
+        _acordar.set()
+
+
+_embutido = None
+_embutido_pid = None
+_embutido_lock = threading.Lock()
+
+
+def garantir_trabalhador_embutido():
+    """
+    Inicia (uma vez por processo) o trabalhador embutido, se habilitado em
+    TAREFAS_TRABALHADOR_EMBUTIDO. Com preload_app o gunicorn faz fork depois
+    do import, por isso o pid é conferido: threads não sobrevivem ao fork.
+    """
+    global _embutido, _embutido_pid
+    if not _config('TAREFAS_TRABALHADOR_EMBUTIDO', True):
+        return
+    if _embutido is not None and _embutido_pid == os.getpid():
+        return
+    with _embutido_lock:
+        if _embutido is not None and _embutido_pid == os.getpid():
+            return
+        _embutido = Trabalhador()
+        _embutido_pid = os.getpid()
+        _embutido.iniciar()
@@ -1,4 +1,5 @@
 from django import template
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
 register = template.Library()
@@ -24,12 +25,13 @@ def user_avatar_html(user, size='w-8 h-8', text_size='text-lg'):
     Renderiza avatar do usuario como HTML (foto ou emoji).
     Uso: {% user_avatar_html user "w-10 h-10" "text-xl" %}
     """
-    if hasattr(user, 'foto_base64') and user.foto_base64:
-        content_type = user.foto_tipo or 'image/jpeg'
-        return mark_safe(
-            f'<img src="data:{content_type};base64,{user.foto_base64}" '
-            f'alt="{user.get_full_name()}" '
-            f'class="{size} rounded-xl object-cover">'
+    if hasattr(user, 'tem_foto') and user.tem_foto():
+        # URL versionada da miniatura: o HTML não cresce com a foto e o navegador a guarda em cache
+        return format_html(
+            '<img src="{}" alt="{}" loading="lazy" decoding="async" class="{} rounded-xl object-cover">',
+            user.get_foto_url('avatar'),
+            user.get_full_name(),
+            size,
         )
     emoji = AVATAR_MAP.get(getattr(user, 'avatar', '') or 'avatar-1', '👩')
     return mark_safe(
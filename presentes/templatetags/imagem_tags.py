@@ -0,0 +1,18 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def imagem_url(objeto, tamanho=None):
+    """
+    URL da imagem redimensionada de um presente/grupo (ou foto de usuario).
+    Uso: {{ presente|imagem_url:'card' }} | tamanhos: avatar, card, modal
+    """
+    if objeto is None:
+        return ''
+    if hasattr(objeto, 'get_imagem_url'):
+        return objeto.get_imagem_url(tamanho) or ''
+    if hasattr(objeto, 'get_foto_url'):
+        return objeto.get_foto_url(tamanho) or ''
+    return ''
@@ -1,3 +1,745 @@
-from django.test import TestCase
+import time
 
-# Create your tests here.
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.db.models import Min, Prefetch
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import http_client, limites, pesquisa_precos, roteador_ia, tarefas
+from .cache import BackendBanco, CacheSemantico, _hash_chave, impressao_digital, similaridade
+from .limites import BaldeFichas, EsperaExcedida, aguardar_vez, espera_maxima, fechando_conexoes, limite_host, sem_espera
+from .middleware import LimitesInterativosMiddleware
+from .models import CacheEntrada, Grupo, GrupoMembro, PrecoEstatistica, PrecoHistorico, Presente, SugestaoCompra, Tarefa, Usuario
+from .paginacao import ORDENACOES, paginar_por_cursor
+from .pesquisa_precos import PesquisaPrecoMiddleware
+from .retencao_precos import compactar_presente, presentes_a_compactar
+from .services import IAService
+
+
+class FechandoConexoesTests(SimpleTestCase):
+    def test_fecha_conexoes_mesmo_com_erro(self):
+        def falhar():
+            raise ValueError('falhou')
+
+        with mock.patch('django.db.connections.close_all') as close_all:
+            with self.assertRaises(ValueError):
+                fechando_conexoes(falhar)()
+        close_all.assert_called_once_with()
+
+    def test_retorna_o_resultado(self):
+        with mock.patch('django.db.connections.close_all') as close_all:
+            self.assertEqual(fechando_conexoes(lambda a, b=0: a + b)(1, b=2), 3)
+        close_all.assert_called_once_with()
+
+
+class BackendBancoTests(TestCase):
+    def entrada(self, chave):
+        return CacheEntrada.objects.get(chave=_hash_chave('teste', chave))
+
+    def test_leitura_so_atualiza_acessado_em_antigo(self):
+        backend = BackendBanco(max_itens=10, poda=0, toque=300)
+        backend.definir('teste', 'caneca', {'preco': 40}, ttl=60)
+        with self.assertNumQueries(1):
+            self.assertEqual(backend.obter('teste', 'caneca'), {'preco': 40})
+
+        antigo = timezone.now() - timedelta(minutes=10)
+        CacheEntrada.objects.update(acessado_em=antigo)
+        with self.assertNumQueries(2):
+            self.assertEqual(backend.obter('teste', 'caneca'), {'preco': 40})
+        self.assertGreater(self.entrada('caneca').acessado_em, antigo)
+
+    def test_limpeza_so_numa_fracao_das_gravacoes(self):
+        backend = BackendBanco(max_itens=2, poda=0, toque=300)
+        backend.definir('teste', 'vencida', {'preco': 1}, ttl=60)
+        CacheEntrada.objects.update(expira_em=timezone.now() - timedelta(seconds=1))
+        for i, chave in enumerate(['caneca', 'livro', 'bone']):
+            backend.definir('teste', chave, {'preco': i}, ttl=60)
+        self.assertEqual(CacheEntrada.objects.count(), 4)
+
+        # A limpeza remove as expiradas e as acessadas há mais tempo acima de max_itens
+        CacheEntrada.objects.filter(chave=_hash_chave('teste', 'caneca')).update(
+            acessado_em=timezone.now() - timedelta(hours=1)
+        )
+        BackendBanco(max_itens=2, poda=1, toque=300).definir('teste', 'meia', {'preco': 9}, ttl=60)
+        self.assertEqual(
+            set(CacheEntrada.objects.values_list('chave', flat=True)),
+            {_hash_chave('teste', 'bone'), _hash_chave('teste', 'meia')},
+        )
+
+
+DESISTENCIAS = []
+
+
+def tarefa_de_teste(falhar=False, **parametros):
+    if falhar:
+        raise RuntimeError('falha de teste')
+
+
+def desistencia_de_teste(**parametros):
+    DESISTENCIAS.append(parametros)
+
+
+@override_settings(TAREFAS_LEASE=300, TAREFAS_BACKOFF_BASE=60, TAREFAS_BACKOFF_MAXIMO=3600)
+class TarefasTests(TestCase):
+    def setUp(self):
+        DESISTENCIAS.clear()
+        registro = mock.patch.dict(tarefas.TAREFAS, {'teste': {
+            'funcao': 'presentes.tests.tarefa_de_teste',
+            'ao_desistir': 'presentes.tests.desistencia_de_teste',
+        }})
+        registro.start()
+        self.addCleanup(registro.stop)
+
+    def liberar(self, tarefa):
+        """Adianta o backoff: a tarefa fica disponível agora."""
+        Tarefa.objects.filter(pk=tarefa.pk).update(disponivel_em=timezone.now())
+
+    def test_reivindica_pela_prioridade_e_respeita_o_atraso(self):
+        normal = tarefas.enfileirar('teste', prioridade=tarefas.PRIORIDADE_NORMAL)
+        urgente = tarefas.enfileirar('teste', prioridade=tarefas.PRIORIDADE_USUARIO)
+        tarefas.enfileirar('teste', prioridade=tarefas.PRIORIDADE_USUARIO, atraso=timedelta(minutes=5))
+
+        self.assertEqual([t.pk for t in tarefas.reivindicar('w1', 1)], [urgente.pk])
+        self.assertEqual([t.pk for t in tarefas.reivindicar('w2', 5)], [normal.pk])
+        self.assertEqual(tarefas.reivindicar('w3', 5), [])
+
+    def test_lease_vencido_volta_para_a_fila(self):
+        tarefas.enfileirar('teste')
+        [primeira] = tarefas.reivindicar('w1', 5)
+        self.assertEqual(tarefas.reivindicar('w2', 5), [])
+
+        # w1 morreu: o lease vence sem renovação
+        Tarefa.objects.filter(pk=primeira.pk).update(bloqueada_ate=timezone.now() - timedelta(seconds=1))
+        [segunda] = tarefas.reivindicar('w2', 5)
+        self.assertEqual(segunda.pk, primeira.pk)
+        self.assertEqual(segunda.tentativas, 2)
+        self.assertEqual(segunda.bloqueada_por, 'w2')
+
+        # w1 terminando atrasado não mexe na tarefa que agora é de w2
+        tarefas.executar(primeira)
+        tarefa = Tarefa.objects.get(pk=primeira.pk)
+        self.assertEqual((tarefa.status, tarefa.bloqueada_por), ('executando', 'w2'))
+
+        tarefas.executar(segunda)
+        self.assertEqual(Tarefa.objects.get(pk=primeira.pk).status, 'concluida')
+
+    def test_falha_reagenda_com_backoff_exponencial(self):
+        tarefa = tarefas.enfileirar('teste', {'falhar': True}, max_tentativas=3)
+        for tentativa, espera in [(1, 60), (2, 120)]:
+            [reivindicada] = tarefas.reivindicar('w1', 5)
+            self.assertEqual(reivindicada.tentativas, tentativa)
+            antes = timezone.now()
+            tarefas.executar(reivindicada)
+
+            tarefa.refresh_from_db()
+            self.assertEqual(tarefa.status, 'pendente')
+            self.assertEqual(tarefa.bloqueada_por, '')
+            self.assertTrue(tarefa.ultimo_erro.startswith('RuntimeError: falha de teste'))
+            atraso = (tarefa.disponivel_em - antes).total_seconds()
+            self.assertGreaterEqual(atraso, espera)
+            self.assertLessEqual(atraso, espera * 1.25 + 1)
+            # Em backoff: ainda não pode ser reivindicada
+            self.assertEqual(tarefas.reivindicar('w2', 5), [])
+            self.liberar(tarefa)
+        self.assertEqual(DESISTENCIAS, [])
+
+    def test_desiste_apos_max_tentativas_e_chama_ao_desistir(self):
+        tarefa = tarefas.enfileirar('teste', {'falhar': True, 'presente_id': 7}, max_tentativas=2)
+        tarefas.executar(tarefas.reivindicar('w1', 5)[0])
+        self.assertEqual(DESISTENCIAS, [])
+
+        self.liberar(tarefa)
+        tarefas.executar(tarefas.reivindicar('w1', 5)[0])
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, 'falhou')
+        self.assertIsNotNone(tarefa.concluida_em)
+        self.assertIsNone(tarefa.bloqueada_ate)
+        self.assertEqual(DESISTENCIAS, [{'falhar': True, 'presente_id': 7}])
+        self.assertEqual(tarefas.reivindicar('w1', 5), [])
+
+    def test_sucesso_conclui(self):
+        tarefa = tarefas.enfileirar('teste', {'presente_id': 7})
+        tarefas.executar(tarefas.reivindicar('w1', 5)[0])
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, 'concluida')
+        self.assertEqual(tarefa.ultimo_erro, '')
+        self.assertEqual(DESISTENCIAS, [])
+
+    def test_reivindica_so_os_tipos_pedidos(self):
+        with mock.patch.dict(tarefas.TAREFAS, {'outro': {'funcao': 'presentes.tests.tarefa_de_teste'}}):
+            outro = tarefas.enfileirar('outro', prioridade=tarefas.PRIORIDADE_USUARIO)
+        teste = tarefas.enfileirar('teste')
+
+        self.assertEqual([t.pk for t in tarefas.reivindicar('w1', 5, tipos=['teste'])], [teste.pk])
+        self.assertEqual([t.pk for t in tarefas.reivindicar('w2', 5)], [outro.pk])
+
+    def test_pesquisa_sincrona_so_processa_as_tarefas_da_pesquisa(self):
+        with mock.patch('presentes.tarefas.Trabalhador') as trabalhador:
+            pesquisa_precos.executar_pesquisa(origem='comando', workers=3)
+        trabalhador.assert_called_once_with(workers=3, tipos=pesquisa_precos.TIPOS_PESQUISA)
+        trabalhador.return_value.executar_ate_esvaziar.assert_called_once_with()
+
+
+@override_settings(TAREFAS_TRABALHADOR_EMBUTIDO=False, PRECOS_TICK=0)
+class PesquisaPrecoMiddlewareTests(TestCase):
+    def setUp(self):
+        PesquisaPrecoMiddleware._ultima_checagem = 0.0
+        self.middleware = PesquisaPrecoMiddleware(lambda request: HttpResponse('ok'))
+
+    def test_tick_e_enfileirado_e_nao_roda_no_request(self):
+        with mock.patch('presentes.pesquisa_precos.verificar_atualizacoes') as verificar:
+            resposta = self.middleware(RequestFactory().get('/'))
+
+        self.assertEqual(resposta.status_code, 200)
+        verificar.assert_not_called()
+        tarefa = Tarefa.objects.get(tipo='verificar_atualizacoes')
+        self.assertEqual(tarefa.status, 'pendente')
+        self.assertEqual(tarefa.max_tentativas, 1)
+
+    def test_tick_pendente_nao_e_duplicado(self):
+        self.middleware(RequestFactory().get('/'))
+        PesquisaPrecoMiddleware._ultima_checagem = 0.0
+        self.middleware(RequestFactory().get('/'))
+
+        self.assertEqual(Tarefa.objects.filter(tipo='verificar_atualizacoes').count(), 1)
+
+
+class BaldeFichasTests(SimpleTestCase):
+    def test_reserva_acima_da_espera_maxima_nao_consome_ficha(self):
+        balde = BaldeFichas(por_minuto=60, rajada=1)
+        self.assertEqual(balde.reservar(), 0.0)
+        self.assertIsNone(balde.reservar(max_espera=0.1))
+        # A recusa não reservou nada: a próxima espera continua sendo ~1s
+        self.assertAlmostEqual(balde.reservar(max_espera=2), 1.0, delta=0.1)
+
+    def test_sem_espera_maxima_reserva_na_fila(self):
+        balde = BaldeFichas(por_minuto=60, rajada=1)
+        balde.reservar()
+        self.assertAlmostEqual(balde.reservar(), 1.0, delta=0.1)
+        self.assertAlmostEqual(balde.reservar(), 2.0, delta=0.1)
+
+
+@override_settings(TAXAS_POR_HOST={'lento.exemplo.com': 1}, TAXA_RAJADA=1, LIMITES_COMPARTILHADOS='',
+                   LIMITES_POR_HOST={'ocupado.exemplo.com': 1}, LIMITES_ESPERA_INTERATIVA=0.05)
+class SemEsperaTests(SimpleTestCase):
+    def setUp(self):
+        limites._baldes.clear()
+        limites._semaforos.clear()
+        limites._disjuntores.clear()
+
+    def test_sem_ficha_levanta_em_vez_de_dormir(self):
+        aguardar_vez('lento.exemplo.com')
+        inicio = time.monotonic()
+        with sem_espera():
+            with self.assertRaises(EsperaExcedida):
+                aguardar_vez('lento.exemplo.com')
+        self.assertLess(time.monotonic() - inicio, 0.5)
+
+    def test_host_sem_vaga_levanta_depois_da_espera_maxima(self):
+        with limite_host('ocupado.exemplo.com'):
+            with sem_espera():
+                with self.assertRaises(EsperaExcedida):
+                    with limite_host('ocupado.exemplo.com'):
+                        pass
+        # A vaga foi devolvida
+        with sem_espera(), limite_host('ocupado.exemplo.com'):
+            pass
+
+    def test_requisicao_recusada_nao_conta_como_falha_do_host(self):
+        aguardar_vez('lento.exemplo.com')
+        with sem_espera(), mock.patch.object(http_client, 'obter_sessao') as obter_sessao:
+            with self.assertRaises(EsperaExcedida):
+                http_client.get('https://lento.exemplo.com/produto')
+        obter_sessao.assert_not_called()
+        self.assertEqual(limites.obter_disjuntor('lento.exemplo.com').falhas, 0)
+
+    def test_threads_do_pool_herdam_o_modo(self):
+        with sem_espera(1.5), ThreadPoolExecutor(max_workers=1) as executor:
+            futuro = executor.submit(fechando_conexoes(espera_maxima))
+        self.assertEqual(futuro.result(), 1.5)
+        self.assertIsNone(espera_maxima())
+
+    def test_middleware_marca_o_request(self):
+        vista = {}
+
+        def view(request):
+            vista['espera'] = espera_maxima()
+            return HttpResponse('ok')
+
+        LimitesInterativosMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(vista['espera'], 0.05)
+        self.assertIsNone(espera_maxima())
+
+    def test_streaming_gera_o_corpo_no_modo_sem_espera(self):
+        def corpo():
+            yield espera_maxima()
+            yield espera_maxima()
+
+        self.assertEqual(list(limites.iterar_sem_espera(corpo())), [0.05, 0.05])
+
+
+@override_settings(GEMINI_API_KEY='chave-gemini', OPENAI_API_KEY='chave-openai', ANTHROPIC_API_KEY='',
+                   IA_ROTEADOR_HEDGE=True, IA_ROTEADOR_PRAZO=5)
+class RoteadorHedgeTests(SimpleTestCase):
+    def setUp(self):
+        roteador_ia._estatisticas.clear()
+        self.presente = mock.Mock(descricao='Air Fryer Mondial 4L')
+
+    def test_motor_perdedor_nao_sobrescreve_o_cache(self):
+        def gemini_lento(presente):
+            time.sleep(0.3)
+            return [{'loja': 'Loja Gemini', 'preco': 100}]
+
+        with mock.patch.object(IAService, 'sugestoes_ia_em_cache', return_value=None), \
+                mock.patch.object(IAService, 'guardar_sugestoes_ia') as guardar, \
+                mock.patch.object(IAService, 'consultar_gemini', side_effect=gemini_lento), \
+                mock.patch.object(IAService, 'consultar_chatgpt', return_value=[{'loja': 'Loja GPT', 'preco': 90}]), \
+                mock.patch.object(roteador_ia, '_limiar_hedge', return_value=0.05):
+            nome, sugestoes = roteador_ia.consultar_motores(self.presente)
+            time.sleep(0.5)  # o Gemini termina depois do vencedor
+
+        self.assertEqual(nome, 'ChatGPT')
+        self.assertEqual(sugestoes[0]['loja'], 'Loja GPT')
+        guardar.assert_called_once_with('Air Fryer Mondial 4L', 'ChatGPT', sugestoes)
+        self.assertEqual(roteador_ia._obter_estatisticas('Gemini').total, 1)
+
+    def test_motor_sem_vez_no_host_nao_conta_como_falha(self):
+        with mock.patch.object(IAService, 'sugestoes_ia_em_cache', return_value=None), \
+                mock.patch.object(IAService, 'guardar_sugestoes_ia'), \
+                mock.patch.object(IAService, 'consultar_gemini', side_effect=EsperaExcedida('sem vez')), \
+                mock.patch.object(IAService, 'consultar_chatgpt', return_value=[{'loja': 'Loja GPT', 'preco': 90}]):
+            nome, sugestoes = roteador_ia.consultar_motores(self.presente)
+
+        self.assertEqual(nome, 'ChatGPT')
+        self.assertEqual(roteador_ia._obter_estatisticas('Gemini').total, 0)
+
+
+def criar_usuario(grupo, nome, sobrenome):
+    usuario = Usuario.objects.create_user(
+        username=nome.lower(), email=f'{nome.lower()}@exemplo.com', password='senha-teste',
+        first_name=nome, last_name=sobrenome,
+    )
+    GrupoMembro.objects.create(grupo=grupo, usuario=usuario)
+    usuario.grupo_ativo = grupo
+    usuario.save(update_fields=['grupo_ativo'])
+    return usuario
+
+
+@override_settings(GEMINI_API_KEY='chave-gemini', IA_LOTE_TAMANHO=2, IA_CACHE_TTL=3600)
+class PesquisaLoteIATests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        grupo = Grupo.objects.create(nome='Família')
+        usuario = criar_usuario(grupo, 'Maria', 'Silva')
+        cls.ids = [
+            Presente.objects.create(usuario=usuario, grupo=grupo, descricao=descricao).pk
+            for descricao in ('Caneca', 'Livro', 'Boné')
+        ]
+        Presente.objects.create(usuario=usuario, grupo=grupo, descricao='Meia', status='COMPRADO')
+
+    def parametros(self, tipo):
+        return [t.parametros for t in Tarefa.objects.filter(tipo=tipo).order_by('id')]
+
+    def test_presentes_entram_na_fila_depois_do_seu_lote(self):
+        log = pesquisa_precos.tarefa_pesquisa_precos(origem='comando')
+        lotes = self.parametros('consultar_ia_lote')
+        self.assertEqual(lotes, [
+            {'presentes_ids': self.ids[:2], 'log_id': log.pk},
+            {'presentes_ids': self.ids[2:], 'log_id': log.pk},
+        ])
+        self.assertEqual(self.parametros('pesquisar_presente'), [])
+        # Presentes de um lote ainda na fila não são tratados como perdidos na retomada
+        pesquisa_precos.retomar_pesquisas()
+        self.assertEqual(self.parametros('pesquisar_presente'), [])
+
+        resposta = {self.ids[0]: [{'loja': 'Loja', 'preco': 40}]}
+        with mock.patch.object(IAService, 'sugestoes_ia_em_cache', return_value=None), \
+                mock.patch.object(IAService, 'guardar_sugestoes_ia') as guardar, \
+                mock.patch.object(IAService, 'consultar_gemini_lote', return_value=resposta) as consultar:
+            pesquisa_precos.tarefa_consultar_ia_lote(**lotes[0])
+
+        self.assertEqual(consultar.call_count, 1)
+        guardar.assert_any_call('Caneca', 'Gemini (lote)', resposta[self.ids[0]])
+        self.assertEqual(self.parametros('pesquisar_presente'), [
+            {'presente_id': self.ids[0], 'log_id': log.pk},
+            {'presente_id': self.ids[1], 'log_id': log.pk},
+        ])
+
+    def test_lote_com_erro_ou_desistencia_ainda_enfileira_os_presentes(self):
+        with mock.patch.object(IAService, 'sugestoes_ia_em_cache', return_value=None), \
+                mock.patch.object(IAService, 'consultar_gemini_lote', side_effect=RuntimeError('cota')):
+            pesquisa_precos.tarefa_consultar_ia_lote(presentes_ids=self.ids[:2])
+        pesquisa_precos.tarefa_consultar_ia_lote_desistir(presentes_ids=self.ids[2:])
+
+        self.assertEqual(self.parametros('atualizar_preco_presente'), [{'presente_id': i} for i in self.ids])
+
+    @override_settings(IA_CACHE_TTL=0)
+    def test_sem_cache_de_ia_o_lote_fica_desativado_com_aviso(self):
+        with self.assertLogs('presentes.pesquisa_precos', 'INFO') as logs:
+            self.assertEqual(pesquisa_precos.agendar_vencidos(), 3)
+
+        self.assertEqual(self.parametros('consultar_ia_lote'), [])
+        self.assertEqual(self.parametros('atualizar_preco_presente'), [{'presente_id': i} for i in self.ids])
+        self.assertTrue(any('IA em lote desativada' in linha for linha in logs.output))
+
+
+class SimilaridadeTests(SimpleTestCase):
+    def nota(self, a, b):
+        return similaridade(impressao_digital(a), impressao_digital(b))
+
+    def test_qualificadores_de_modelo_precisam_ser_iguais(self):
+        pares = [
+            ('Samsung Galaxy S24 Ultra 256GB', 'Samsung Galaxy S24 256GB'),
+            ('iPhone 15 Pro Max 256GB', 'iPhone 15 Pro 256GB'),
+            ('Apple Watch Series 9 GPS Cellular', 'Apple Watch Series 9 GPS'),
+            ('Cafeteira Nespresso Essenza Mini Preta', 'Cafeteira Nespresso Essenza Preta'),
+        ]
+        for a, b in pares:
+            with self.subTest(a=a, b=b):
+                self.assertEqual(self.nota(a, b), 0.0)
+
+    def test_numeros_precisam_ser_iguais(self):
+        self.assertEqual(self.nota('Air Fryer Mondial 4L', 'Air Fryer Mondial 5L'), 0.0)
+
+    def test_plural_acentos_e_palavras_vazias_nao_contam(self):
+        self.assertEqual(self.nota('Kit 3 Canecas Porcelana Branca', 'Kit 3 Caneca de Porcelana Branca'), 1.0)
+        self.assertEqual(self.nota('Luminária de Mesa Articulada', 'luminaria mesa articulada'), 1.0)
+        self.assertEqual(self.nota('Air Fryer Mondial 4 Litros', 'air fryer Mondial 4L'), 1.0)
+
+    def test_palavra_a_mais_reduz_a_nota(self):
+        nota = self.nota('Fone Bluetooth JBL Tune 510BT Preto', 'Fone JBL Tune 510BT Preto')
+        self.assertAlmostEqual(nota, 5 / 6)
+
+
+class CacheSemanticoTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = CacheSemantico(f'teste:{self.id()}', ttl=60, limiar=0.8)
+
+    def test_modelos_diferentes_nao_compartilham_resposta(self):
+        self.cache.definir('Samsung Galaxy S24 Ultra 256GB', {'preco': 7000})
+        self.cache.definir('iPhone 15 Pro Max 256GB', {'preco': 9000})
+
+        self.assertIsNone(self.cache.obter('Samsung Galaxy S24 256GB'))
+        self.assertIsNone(self.cache.obter('iPhone 15 Pro 256GB'))
+
+    def test_limiar_e_estrito(self):
+        # 4 palavras em comum de 5: nota exatamente 0.8
+        self.cache.definir('Caneca Porcelana Branca Grande', {'preco': 40})
+        self.assertIsNone(self.cache.obter('Caneca Porcelana Branca Grande Alça'))
+
+    def test_descricao_parecida_encontra_a_resposta(self):
+        self.cache.definir('Fone Bluetooth JBL Tune 510BT Preto', {'preco': 250})
+        self.assertEqual(self.cache.obter('Fone JBL Tune 510BT Preto'), {'preco': 250})
+        self.assertEqual(self.cache.obter('Fones Bluetooth JBL Tune 510BT Preto'), {'preco': 250})
+
+
+class CacheSemanticoCompartilhadoTests(TestCase):
+    """Duas instâncias sobre o mesmo backend fazem o papel de dois processos."""
+
+    def setUp(self):
+        backend = mock.patch('presentes.cache._backend', BackendBanco(max_itens=100, poda=0))
+        backend.start()
+        self.addCleanup(backend.stop)
+
+    def test_outro_processo_encontra_descricao_parecida(self):
+        CacheSemantico('teste:ia', ttl=60, limiar=0.8).definir('Fone Bluetooth JBL Tune 510BT Preto', {'preco': 250})
+
+        web = CacheSemantico('teste:ia', ttl=60, limiar=0.8)
+        self.assertEqual(web.obter('Fone JBL Tune 510BT Preto'), {'preco': 250})
+        self.assertIsNone(web.obter('Fone JBL Tune 520BT Preto'))
+
+    def test_resposta_expirada_sai_do_indice(self):
+        trabalhador = CacheSemantico('teste:ia', ttl=60, limiar=0.8)
+        trabalhador.definir('Fone Bluetooth JBL Tune 510BT Preto', {'preco': 250})
+        trabalhador.definir('Caneca Porcelana Branca', {'preco': 40})
+        CacheEntrada.objects.filter(
+            chave=_hash_chave('teste:ia', impressao_digital('Fone Bluetooth JBL Tune 510BT Preto'))
+        ).delete()
+
+        web = CacheSemantico('teste:ia', ttl=60, limiar=0.8)
+        self.assertIsNone(web.obter('Fone JBL Tune 510BT Preto'))
+        self.assertEqual(web._indice(), [impressao_digital('Caneca Porcelana Branca')])
+
+
+class PrecoEstatisticaTests(TestCase):
+    def setUp(self):
+        grupo = Grupo.objects.create(nome='Família')
+        self.presente = Presente.objects.create(
+            usuario=criar_usuario(grupo, 'Maria', 'Silva'), grupo=grupo, descricao='Caneca'
+        )
+
+    def estatistica(self):
+        estatistica = PrecoEstatistica.objects.get(presente=self.presente)
+        return estatistica.total, estatistica.soma, estatistica.minimo, estatistica.maximo, estatistica.ultimo_preco
+
+    def test_registrar_preco_soma_cada_ponto_novo(self):
+        for preco in ['100.00', '120.00', '120.00', '80.00']:
+            self.presente.registrar_preco(Decimal(preco))
+
+        # O preço repetido não vira ponto nem entra na soma
+        self.assertEqual(self.estatistica(), (3, Decimal('300.00'), Decimal('80.00'), Decimal('120.00'), Decimal('80.00')))
+        esperado = self.estatistica()
+        PrecoEstatistica.recalcular(self.presente.pk)
+        self.assertEqual(self.estatistica(), esperado)
+
+    def test_temperatura_compara_o_ultimo_com_a_media_anterior(self):
+        self.assertEqual(self.presente.temperatura()['codigo'], 'sem_dados')
+        for preco in ['100.00', '110.00', '90.00']:
+            self.presente.registrar_preco(Decimal(preco))
+
+        presente = Presente.objects.select_related('estatistica_preco').get(pk=self.presente.pk)
+        with self.assertNumQueries(0):
+            temperatura = presente.temperatura()
+        self.assertEqual(temperatura['codigo'], 'quente')
+        self.assertAlmostEqual(temperatura['variacao'], (90 - 105) / 105 * 100, places=1)
+
+
+def criar_ponto(presente, preco, data, **campos):
+    """Ponto de histórico numa data fixa (data é auto_now_add)."""
+    ponto = PrecoHistorico.objects.create(presente=presente, preco=Decimal(preco), **campos)
+    PrecoHistorico.objects.filter(pk=ponto.pk).update(data=data)
+    return ponto
+
+
+def data_local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class PrecoHistoricoUltimosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        grupo = Grupo.objects.create(nome='Família')
+        usuario = criar_usuario(grupo, 'Maria', 'Silva')
+        cls.caneca = Presente.objects.create(usuario=usuario, grupo=grupo, descricao='Caneca')
+        cls.livro = Presente.objects.create(usuario=usuario, grupo=grupo, descricao='Livro')
+        cls.bone = Presente.objects.create(usuario=usuario, grupo=grupo, descricao='Boné')
+        # Gravados fora da ordem cronológica; dois pontos da caneca no mesmo instante
+        for dia, preco in [(5, '50'), (1, '10'), (3, '30'), (4, '40'), (2, '20')]:
+            criar_ponto(cls.caneca, preco, data_local(2026, 1, dia, 12))
+        cls.empate = criar_ponto(cls.caneca, '55', data_local(2026, 1, 5, 12))
+        for dia, preco in [(2, '200'), (1, '100')]:
+            criar_ponto(cls.livro, preco, data_local(2026, 1, dia, 12))
+
+    def test_ultimos_pontos_de_cada_presente_em_ordem_cronologica(self):
+        pontos = list(PrecoHistorico.objects.ultimos(3).values_list('presente_id', 'preco'))
+        self.assertEqual(pontos, [
+            (self.caneca.pk, Decimal('40')), (self.caneca.pk, Decimal('50')), (self.caneca.pk, Decimal('55')),
+            (self.livro.pk, Decimal('100')), (self.livro.pk, Decimal('200')),
+        ])
+
+    def test_prefetch_com_ultimos(self):
+        presentes = Presente.objects.filter(pk__in=[self.caneca.pk, self.livro.pk, self.bone.pk]).prefetch_related(
+            Prefetch('historico_precos', queryset=PrecoHistorico.objects.ultimos(2), to_attr='ultimos_precos')
+        ).order_by('pk')
+        with self.assertNumQueries(2):
+            precos = {p.pk: [h.preco for h in p.ultimos_precos] for p in presentes}
+        self.assertEqual(precos, {
+            self.caneca.pk: [Decimal('50'), Decimal('55')],
+            self.livro.pk: [Decimal('100'), Decimal('200')],
+            self.bone.pk: [],
+        })
+
+
+@override_settings(PRECOS_HISTORICO_COMPLETO_DIAS=30, PRECOS_HISTORICO_DIARIO_DIAS=180)
+class RetencaoPrecosTests(TestCase):
+    agora = data_local(2026, 6, 15, 12)
+
+    def setUp(self):
+        grupo = Grupo.objects.create(nome='Família')
+        usuario = criar_usuario(grupo, 'Maria', 'Silva')
+        self.presente = Presente.objects.create(usuario=usuario, grupo=grupo, descricao='Caneca')
+        # Últimos 30 dias: resolução completa
+        self.recentes = [criar_ponto(self.presente, preco, data_local(2026, 6, 10, hora))
+                         for hora, preco in [(9, '120'), (15, '130')]]
+        # 60 dias atrás (quinta-feira 16/04): três pontos no mesmo dia e um no dia seguinte
+        for hora, preco in [(10, '100'), (14, '110'), (18, '120')]:
+            criar_ponto(self.presente, preco, data_local(2026, 4, 16, hora), loja=f'Loja {hora}')
+        criar_ponto(self.presente, '150', data_local(2026, 4, 17, 9))
+        # Mais de 180 dias: semana de 03/11/2025 a 09/11/2025, um zerado e um sozinho na semana seguinte
+        for dia, preco in [(3, '200'), (5, '220'), (9, '240')]:
+            criar_ponto(self.presente, preco, data_local(2025, 11, dia, 12))
+        criar_ponto(self.presente, '0', data_local(2025, 11, 6, 12))
+        criar_ponto(self.presente, '300', data_local(2025, 11, 10, 12))
+
+    def linhas(self):
+        return list(PrecoHistorico.objects.filter(presente=self.presente).order_by('data', 'id').values_list(
+            'preco', 'preco_medio', 'preco_minimo', 'preco_maximo', 'pontos', 'granularidade'
+        ))
+
+    def test_compacta_por_dia_e_por_semana(self):
+        self.assertEqual(list(presentes_a_compactar(self.agora)), [self.presente.pk])
+        self.assertEqual(compactar_presente(self.presente.pk, self.agora), 5)
+
+        self.assertEqual(self.linhas(), [
+            (Decimal('240.00'), Decimal('220.00'), Decimal('200.00'), Decimal('240.00'), 3, 'semana'),
+            (Decimal('300.00'), None, None, None, 1, 'semana'),
+            (Decimal('120.00'), Decimal('110.00'), Decimal('100.00'), Decimal('120.00'), 3, 'dia'),
+            (Decimal('150.00'), None, None, None, 1, 'dia'),
+            (Decimal('120.00'), None, None, None, 1, ''),
+            (Decimal('130.00'), None, None, None, 1, ''),
+        ])
+        # O agregado fica na última linha do período (mantém data, loja e preço)
+        diario = PrecoHistorico.objects.get(presente=self.presente, granularidade='dia', pontos=3)
+        self.assertEqual((timezone.localtime(diario.data).hour, diario.loja), (18, 'Loja 18'))
+        self.assertEqual(
+            [p.pk for p in PrecoHistorico.objects.filter(presente=self.presente, granularidade='')],
+            [p.pk for p in self.recentes],
+        )
+
+    def test_segunda_passada_nao_altera_nada(self):
+        compactar_presente(self.presente.pk, self.agora)
+        linhas = self.linhas()
+        self.assertEqual(list(presentes_a_compactar(self.agora)), [])
+        self.assertEqual(compactar_presente(self.presente.pk, self.agora), 0)
+        self.assertEqual(self.linhas(), linhas)
+
+    def test_agregado_diario_entra_na_semana_com_media_ponderada(self):
+        compactar_presente(self.presente.pk, self.agora)
+        # 130 dias depois os pontos de abril passam de 180 dias (semana de 13/04 a 19/04)
+        # e os dois de junho viram um agregado diário
+        depois = self.agora + timedelta(days=130)
+        self.assertEqual(compactar_presente(self.presente.pk, depois), 2)
+        semanal = PrecoHistorico.objects.get(presente=self.presente, data__month=4)
+        # (110 * 3 + 150) / 4
+        self.assertEqual(
+            (semanal.preco, semanal.preco_medio, semanal.preco_minimo, semanal.preco_maximo, semanal.pontos),
+            (Decimal('150.00'), Decimal('120.00'), Decimal('100.00'), Decimal('150.00'), 4),
+        )
+
+    def test_preco_repetido_apos_compactar_nao_vira_novo_ponto(self):
+        presente = Presente.objects.create(usuario=self.presente.usuario, grupo=self.presente.grupo, descricao='Livro')
+        for hora, preco in [(9, '100'), (12, '90'), (15, '98')]:
+            ponto = presente.registrar_preco(Decimal(preco))
+            PrecoHistorico.objects.filter(pk=ponto.pk).update(data=data_local(2026, 5, 1, hora))
+        self.assertEqual(compactar_presente(presente.pk, self.agora), 2)
+
+        # O último ponto agora é um agregado diário, mas o preço comparado é o real (98, média 96)
+        self.assertIsNone(presente.registrar_preco(Decimal('98.00')))
+        estatistica = PrecoEstatistica.objects.get(presente=presente)
+        self.assertEqual((estatistica.total, estatistica.soma), (3, Decimal('288.00')))
+
+        # Recalcular a partir do histórico compactado chega às mesmas estatísticas
+        PrecoEstatistica.recalcular(presente.pk)
+        estatistica.refresh_from_db()
+        self.assertEqual(
+            (estatistica.total, estatistica.soma, estatistica.ultimo_preco),
+            (3, Decimal('288.00'), Decimal('98.00')),
+        )
+        self.assertIsNotNone(presente.registrar_preco(Decimal('97.00')))
+
+
+@override_settings(TAREFAS_TRABALHADOR_EMBUTIDO=False, PRECOS_TICK=10 ** 9)
+class ListaUsuariosProdutosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.grupo = Grupo.objects.create(nome='Família')
+        cls.visitante = criar_usuario(cls.grupo, 'Ana', 'Costa')
+        cls.maria = criar_usuario(cls.grupo, 'Maria', 'Silva')
+        cls.joao = criar_usuario(cls.grupo, 'João', 'Silva')
+        for usuario, descricao in [(cls.maria, 'Caneca'), (cls.maria, 'Livro'), (cls.joao, 'Boné')]:
+            Presente.objects.create(usuario=usuario, grupo=cls.grupo, descricao=descricao)
+
+    def setUp(self):
+        self.client.force_login(self.visitante)
+
+    def produtos(self, **parametros):
+        resposta = self.client.get(reverse('lista_usuarios'), {'parcial': 'produtos', **parametros})
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.json()['html'].count('produto-card ')
+
+    def test_busca_pelo_nome_completo_do_membro(self):
+        self.assertEqual(self.produtos(busca='maria silva'), 2)
+        self.assertEqual(self.produtos(busca='silva'), 3)
+        self.assertEqual(self.produtos(busca='caneca'), 1)
+
+    def test_listagem_nao_carrega_a_foto_dos_membros(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('lista_usuarios'), {'ordenar': 'usuario'})
+        for consulta in consultas:
+            self.assertNotIn('"foto_base64",', consulta['sql'])
+
+
+class PaginacaoCursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.grupo = Grupo.objects.create(nome='Família')
+        usuarios = [criar_usuario(cls.grupo, nome, 'Silva') for nome in ('Bruno', 'Ana', 'Carla')]
+        # Descrições, preços e melhores preços repetidos e nulos, nos dois status
+        presentes = [
+            ('Caneca', '50.00', 'ATIVO', ['45.00', '40.00']),
+            ('Livro', None, 'ATIVO', []),
+            ('Caneca', '50.00', 'COMPRADO', ['40.00']),
+            ('Bone', '10.00', 'ATIVO', [None]),
+            ('Livro', None, 'COMPRADO', []),
+            ('Meia', '99.90', 'ATIVO', ['40.00']),
+            ('Agenda', '10.00', 'ATIVO', []),
+            ('Bone', None, 'ATIVO', ['12.50']),
+            ('Relogio', '350.00', 'COMPRADO', ['299.00', None]),
+            ('Agenda', '75.00', 'ATIVO', ['70.00']),
+            ('Meia', '99.90', 'ATIVO', []),
+        ]
+        for i, (descricao, preco, status, sugestoes) in enumerate(presentes):
+            presente = Presente.objects.create(
+                usuario=usuarios[i % len(usuarios)], grupo=cls.grupo, descricao=descricao,
+                preco=Decimal(preco) if preco else None, status=status,
+            )
+            for preco_sugerido in sugestoes:
+                SugestaoCompra.objects.create(
+                    grupo=cls.grupo, presente=presente, local_compra='Loja',
+                    url_compra='https://loja.exemplo.com/p',
+                    preco_sugerido=Decimal(preco_sugerido) if preco_sugerido else None,
+                )
+
+    def presentes(self):
+        return Presente.objects.filter(grupo=self.grupo).annotate(melhor_preco=Min('sugestoes__preco_sugerido'))
+
+    def esperado(self, ordenar_por):
+        """Ordem da listagem calculada em Python: disponíveis antes, nulos por último nos dois sentidos."""
+        campo, descendente = ORDENACOES[ordenar_por]
+        linhas = list(self.presentes().values_list('id', 'status', campo))
+        com_valor = sorted((l for l in linhas if l[2] is not None), key=lambda l: (l[2], l[0]), reverse=descendente)
+        sem_valor = sorted((l for l in linhas if l[2] is None), key=lambda l: l[0], reverse=descendente)
+        return [l[0] for l in sorted(com_valor + sem_valor, key=lambda l: l[1])]
+
+    def percorrer(self, ordenar_por, cursor=None, por_pagina=3):
+        ids = []
+        for _ in range(50):
+            itens, cursor = paginar_por_cursor(self.presentes(), ordenar_por, cursor, por_pagina)
+            self.assertLessEqual(len(itens), por_pagina)
+            ids += [p.id for p in itens]
+            if cursor is None:
+                return ids
+        self.fail('A paginação não terminou')
+
+    def test_percorre_todas_as_ordenacoes_sem_repetir_nem_pular(self):
+        total = self.presentes().count()
+        for ordenar_por in ORDENACOES:
+            for por_pagina in (1, 3, total, total + 1):
+                with self.subTest(ordenar_por=ordenar_por, por_pagina=por_pagina):
+                    ids = self.percorrer(ordenar_por, por_pagina=por_pagina)
+                    self.assertEqual(len(ids), len(set(ids)))
+                    self.assertEqual(ids, self.esperado(ordenar_por))
+
+    def test_presente_cadastrado_durante_a_navegacao_nao_repete_itens(self):
+        esperado = self.esperado('produto')
+        itens, cursor = paginar_por_cursor(self.presentes(), 'produto', None, 3)
+        Presente.objects.create(usuario=Usuario.objects.first(), grupo=self.grupo, descricao='Abajur')
+        ids = [p.id for p in itens] + self.percorrer('produto', cursor)
+        self.assertEqual(ids, esperado)
+
+    def test_cursor_invalido_ou_de_outra_ordenacao_recomeca(self):
+        primeira, cursor = paginar_por_cursor(self.presentes(), 'preco', None, 3)
+        primeiros_ids = [p.id for p in primeira]
+        for ordenar_por, cursor_usado in [('preco', cursor + 'x'), ('preco', 'lixo'), ('-preco', cursor)]:
+            with self.subTest(ordenar_por=ordenar_por, cursor=cursor_usado):
+                itens, _ = paginar_por_cursor(self.presentes(), ordenar_por, cursor_usado, 3)
+                self.assertEqual([p.id for p in itens], self.esperado(ordenar_por)[:3])
+        self.assertEqual(primeiros_ids, self.esperado('preco')[:3])
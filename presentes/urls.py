@@ -22,6 +22,7 @@ urlpatterns = [
     path('deletar-presente/<int:pk>/', views.deletar_presente_view, name='deletar_presente'),
     path('presente/<int:pk>/imagem/', views.servir_imagem_view, name='servir_imagem'),
     path('buscar-sugestoes/<int:pk>/', views.buscar_sugestoes_ia_view, name='buscar_sugestoes'),
+    path('buscar-sugestoes/<int:pk>/stream/', views.buscar_sugestoes_stream_view, name='buscar_sugestoes_stream'),
     path('ver-sugestoes/<int:pk>/', views.ver_sugestoes_view, name='ver_sugestoes'),
     path('aplicar-preco/<int:pk>/<int:sugestao_id>/', views.aplicar_preco_view, name='aplicar_preco'),
     path('atualizar-todos-precos/', views.atualizar_todos_precos_view, name='atualizar_todos_precos'),
@@ -29,6 +30,7 @@ urlpatterns = [
     # Presentes de outros usuários
     path('usuarios/', views.lista_usuarios_view, name='lista_usuarios'),
     path('presentes-usuario/<int:user_id>/', views.presentes_usuario_view, name='presentes_usuario'),
+    path('presente/<int:pk>/modal/', views.modal_presente_view, name='modal_presente'),
     path('marcar-comprado/<int:pk>/', views.marcar_comprado_view, name='marcar_comprado'),
     
     # Notificações
@@ -36,6 +38,7 @@ urlpatterns = [
     path('api/notificacoes/', views.notificacoes_nao_lidas_json, name='notificacoes_json'),
     path('api/compras/', views.compras_grupo_json, name='compras_json'),
     path('api/cron/pesquisar-precos/', views.cron_pesquisar_precos, name='cron_pesquisar_precos'),
+    path('api/ia/status/', views.ia_status_json, name='ia_status_json'),
 
     # Dados de teste (apenas superusuários)
     path('gerar-dados-teste/', views.gerar_dados_teste_view, name='gerar_dados_teste'),
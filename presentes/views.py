@@ -1,11 +1,14 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
-from django.db.models import Count, Prefetch, Q
+from django.db.models import Count, Prefetch, Q, prefetch_related_objects
 from django.db import transaction
-from django.http import JsonResponse, HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.core.mail import send_mail
 from django.conf import settings
@@ -15,7 +18,11 @@ from .models import Usuario, Presente, Compra, Notificacao, SugestaoCompra, Grup
 from .forms import UsuarioRegistroForm, PresenteForm, LoginForm, GrupoForm, EditarPerfilForm
 from .services import IAService
 from .github_helper import criar_issue_falha_imagem
-import base64
+from .imagens import responder_imagem
+from .limites import iterar_sem_espera
+from .sparkline import sparkline_do_presente
+from . import http_client
+import json
 import logging
 import secrets
 import hashlib
@@ -27,11 +34,25 @@ logger = logging.getLogger(__name__)
 # Dicionário para armazenar tokens de recuperação de senha (em produção, usar banco de dados)
 password_reset_tokens = {}
 
+# Cards por página na visualização por produto de lista_usuarios (paginação por cursor)
+PRODUTOS_POR_PAGINA = 30
+
 def requer_grupo_ativo(view_func):
     """
     Decorator que verifica se o usuario tem um grupo ativo.
     Se nao tiver, redireciona para a pagina de selecao de grupo.
+    Aceita também views async.
     """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        @login_required
+        async def wrapper_async(request, *args, **kwargs):
+            if not await sync_to_async(lambda: request.user.grupo_ativo_id)():
+                messages.warning(request, 'Selecione ou crie um grupo para continuar.')
+                return redirect('grupos_lista')
+            return await view_func(request, *args, **kwargs)
+        return wrapper_async
+
     @wraps(view_func)
     @login_required
     def wrapper(request, *args, **kwargs):
@@ -41,28 +62,25 @@ def requer_grupo_ativo(view_func):
         return view_func(request, *args, **kwargs)
     return wrapper
 
-def converter_imagem_para_base64(imagem_file):
-    """Converte um arquivo de imagem para base64"""
+def ler_imagem_enviada(imagem_file):
+    """Lê um arquivo de imagem enviado: retorna (bytes, nome, content_type)"""
     try:
         # Ler o conteúdo do arquivo
         imagem_data = imagem_file.read()
 
-        # Converter para base64
-        imagem_base64 = base64.b64encode(imagem_data).decode('utf-8')
-
         # Obter o tipo MIME
         content_type = imagem_file.content_type
 
         # Obter o nome do arquivo
         nome_arquivo = imagem_file.name
 
-        return imagem_base64, nome_arquivo, content_type
+        return imagem_data, nome_arquivo, content_type
     except Exception as e:
-        logger.error(f"Erro ao converter imagem para base64: {str(e)}")
+        logger.error(f"Erro ao ler imagem enviada: {str(e)}")
         return None, None, None
 
 def baixar_imagem_da_url(url):
-    """Baixa uma imagem de uma URL e converte para base64"""
+    """Baixa uma imagem de uma URL: retorna (bytes, nome, content_type)"""
     import requests
     from urllib.parse import urlparse
 
@@ -75,7 +93,7 @@ def baixar_imagem_da_url(url):
             'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
         }
 
-        response = requests.get(url, headers=headers, timeout=15, stream=True)
+        response = http_client.get(url, headers=headers, timeout=15, stream=True)
         response.raise_for_status()
 
         # Verificar se é uma imagem
@@ -92,9 +110,6 @@ def baixar_imagem_da_url(url):
             logger.warning("Imagem muito grande (> 5MB)")
             return None, None, None
 
-        # Converter para base64
-        imagem_base64 = base64.b64encode(imagem_data).decode('utf-8')
-
         # Extrair nome do arquivo da URL
         parsed_url = urlparse(url)
         nome_arquivo = parsed_url.path.split('/')[-1] or 'imagem.jpg'
@@ -108,7 +123,7 @@ def baixar_imagem_da_url(url):
             nome_arquivo = f'imagem.{extensao}'
 
         logger.info(f"Imagem baixada da URL: {nome_arquivo} ({content_type})")
-        return imagem_base64, nome_arquivo, content_type
+        return imagem_data, nome_arquivo, content_type
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Erro ao baixar imagem da URL {url}: {str(e)}")
@@ -130,11 +145,8 @@ def registro_view(request):
             if 'foto' in request.FILES:
                 foto_file = request.FILES['foto']
                 if foto_file.content_type.startswith('image/'):
-                    import base64
-                    foto_data = base64.b64encode(foto_file.read()).decode('utf-8')
-                    usuario.foto_base64 = foto_data
-                    usuario.foto_tipo = foto_file.content_type
-                    usuario.save(update_fields=['foto_base64', 'foto_tipo'])
+                    usuario.definir_foto(foto_file.read(), foto_file.content_type)
+                    usuario.save(update_fields=['foto_blob', 'foto_base64', 'foto_tipo'])
             login(request, usuario)
             messages.success(request, 'Cadastro realizado com sucesso!')
             return redirect('dashboard')
@@ -151,17 +163,14 @@ def editar_perfil_view(request):
             usuario = form.save()
             # Remover foto (volta a usar avatar emoji)
             if form.cleaned_data.get('remover_foto'):
-                usuario.foto_base64 = None
-                usuario.foto_tipo = None
-                usuario.save(update_fields=['foto_base64', 'foto_tipo'])
+                usuario.remover_foto()
+                usuario.save(update_fields=['foto_blob', 'foto_base64', 'foto_tipo'])
             # Nova foto enviada
             elif 'foto' in request.FILES:
                 foto_file = request.FILES['foto']
                 if foto_file.content_type.startswith('image/'):
-                    foto_data = base64.b64encode(foto_file.read()).decode('utf-8')
-                    usuario.foto_base64 = foto_data
-                    usuario.foto_tipo = foto_file.content_type
-                    usuario.save(update_fields=['foto_base64', 'foto_tipo'])
+                    usuario.definir_foto(foto_file.read(), foto_file.content_type)
+                    usuario.save(update_fields=['foto_blob', 'foto_base64', 'foto_tipo'])
             messages.success(request, 'Perfil atualizado com sucesso!')
             return redirect('editar_perfil')
     else:
@@ -364,11 +373,12 @@ def dashboard_view(request):
 def meus_presentes_view(request):
     grupo_ativo = request.user.grupo_ativo
 
-    # Otimizar query com select_related para evitar N+1 - FILTRADO POR GRUPO
+    # Otimizar query com prefetch_related para evitar N+1 - FILTRADO POR GRUPO
+    # (prefetch em vez de join: o manager de Usuario não traz foto_base64)
     presentes_list = Presente.objects.filter(
         grupo=grupo_ativo,
         usuario=request.user
-    ).select_related('usuario').prefetch_related('sugestoes', 'historico_precos')
+    ).select_related('estatistica_preco').defer('estatistica_preco__sparklines').prefetch_related('usuario', 'sugestoes')
 
     # Estatísticas
     total_presentes = presentes_list.count()
@@ -404,32 +414,25 @@ def adicionar_presente_view(request):
             presente.usuario = request.user
             presente.grupo = request.user.grupo_ativo  # Definir grupo automaticamente
 
-            # Converter imagem para base64 se foi enviada via upload
+            # Gravar a imagem no armazenamento de imagens se foi enviada via upload
             if 'imagem' in request.FILES:
                 imagem_file = request.FILES['imagem']
-                imagem_base64, nome_arquivo, content_type = converter_imagem_para_base64(imagem_file)
+                imagem_data, nome_arquivo, content_type = ler_imagem_enviada(imagem_file)
 
-                if imagem_base64:
-                    presente.imagem_base64 = imagem_base64
-                    presente.imagem_nome = nome_arquivo
-                    presente.imagem_tipo = content_type
-                    # Limpar o campo antigo para economizar espaço
-                    presente.imagem = None
-                    logger.info(f"Imagem convertida para base64: {nome_arquivo}")
+                if imagem_data:
+                    presente.definir_imagem(imagem_data, nome_arquivo, content_type)
+                    logger.info(f"Imagem gravada: {nome_arquivo}")
 
             # Se não houver imagem via upload, tentar baixar da URL (campo url_imagem do formulário)
-            elif not presente.imagem_base64:
+            elif not presente.tem_imagem():
                 url_imagem = request.POST.get('url_imagem', '').strip()
                 if url_imagem:
                     logger.info(f"Tentando baixar imagem da URL: {url_imagem}")
-                    imagem_base64, nome_arquivo, content_type = baixar_imagem_da_url(url_imagem)
-
-                    if imagem_base64:
-                        presente.imagem_base64 = imagem_base64
-                        presente.imagem_nome = nome_arquivo
-                        presente.imagem_tipo = content_type
-                        presente.imagem = None
-                        logger.info(f"Imagem baixada e convertida para base64: {nome_arquivo}")
+                    imagem_data, nome_arquivo, content_type = baixar_imagem_da_url(url_imagem)
+
+                    if imagem_data:
+                        presente.definir_imagem(imagem_data, nome_arquivo, content_type)
+                        logger.info(f"Imagem baixada e gravada: {nome_arquivo}")
                     else:
                         # Falha ao baixar imagem - marcar para criar issue no GitHub depois
                         logger.warning(f"Não foi possível baixar imagem da URL: {url_imagem}")
@@ -473,18 +476,15 @@ def adicionar_presente_view(request):
                 except Exception as e:
                     logger.error(f"Erro ao criar issue no GitHub: {str(e)}")
 
-            # Buscar precos em background (nao bloqueia o request)
-            import threading
-            def _buscar_precos_background(presente_id):
-                try:
-                    from presentes.models import Presente as PresenteModel
-                    p = PresenteModel.objects.get(pk=presente_id)
-                    IAService.buscar_sugestoes_reais(p)
-                except Exception as e:
-                    logger.error(f"Erro ao buscar precos em background: {e}")
-
-            thread = threading.Thread(target=_buscar_precos_background, args=(presente.id,), daemon=True)
-            thread.start()
+            # Buscar precos em background (nao bloqueia o request): fila persistente,
+            # na frente da pesquisa semanal
+            from .tarefas import PRIORIDADE_USUARIO, enfileirar
+            enfileirar(
+                'buscar_precos_presente',
+                {'presente_id': presente.id},
+                prioridade=PRIORIDADE_USUARIO,
+                chave=f'precos-presente:{presente.id}',
+            )
 
             messages.success(request, 'Presente adicionado com sucesso! Sugestoes de preco serao buscadas em background.')
 
@@ -502,32 +502,25 @@ def editar_presente_view(request, pk):
         if form.is_valid():
             presente = form.save(commit=False)
 
-            # Converter imagem para base64 se foi enviada uma nova via upload
+            # Gravar a nova imagem se foi enviada via upload
             if 'imagem' in request.FILES:
                 imagem_file = request.FILES['imagem']
-                imagem_base64, nome_arquivo, content_type = converter_imagem_para_base64(imagem_file)
+                imagem_data, nome_arquivo, content_type = ler_imagem_enviada(imagem_file)
 
-                if imagem_base64:
-                    presente.imagem_base64 = imagem_base64
-                    presente.imagem_nome = nome_arquivo
-                    presente.imagem_tipo = content_type
-                    # Limpar o campo antigo para economizar espaço
-                    presente.imagem = None
-                    logger.info(f"Imagem atualizada e convertida para base64: {nome_arquivo}")
+                if imagem_data:
+                    presente.definir_imagem(imagem_data, nome_arquivo, content_type)
+                    logger.info(f"Imagem atualizada: {nome_arquivo}")
 
             # Se não houver imagem via upload, tentar baixar da URL
             else:
                 url_imagem = request.POST.get('url_imagem', '').strip()
                 if url_imagem:
                     logger.info(f"Tentando baixar imagem da URL para edição: {url_imagem}")
-                    imagem_base64, nome_arquivo, content_type = baixar_imagem_da_url(url_imagem)
+                    imagem_data, nome_arquivo, content_type = baixar_imagem_da_url(url_imagem)
 
-                    if imagem_base64:
-                        presente.imagem_base64 = imagem_base64
-                        presente.imagem_nome = nome_arquivo
-                        presente.imagem_tipo = content_type
-                        presente.imagem = None
-                        logger.info(f"Imagem baixada e convertida para base64: {nome_arquivo}")
+                    if imagem_data:
+                        presente.definir_imagem(imagem_data, nome_arquivo, content_type)
+                        logger.info(f"Imagem baixada e gravada: {nome_arquivo}")
 
             presente.save()
 
@@ -552,35 +545,29 @@ def deletar_presente_view(request, pk):
     return render(request, 'presentes/deletar_presente.html', {'presente': presente})
 
 def servir_imagem_view(request, pk):
-    """Serve imagem armazenada em base64 no banco de dados"""
+    """Serve a imagem do presente armazenada no banco de dados (com ETag/304)"""
     presente = get_object_or_404(Presente, pk=pk)
 
-    if not presente.imagem_base64:
-        # Se não há imagem base64, retornar 404
-        return HttpResponse('Imagem não encontrada', status=404)
-
     try:
-        # Decodificar base64
-        imagem_data = base64.b64decode(presente.imagem_base64)
-
-        # Determinar content type (padrão image/jpeg se não especificado)
-        content_type = presente.imagem_tipo or 'image/jpeg'
-
-        # Retornar a imagem
-        return HttpResponse(imagem_data, content_type=content_type)
+        resposta = responder_imagem(request, presente.imagem_blob_id, presente.obter_imagem)
+        if resposta is None:
+            # Se não há imagem no banco, retornar 404
+            return HttpResponse('Imagem não encontrada', status=404)
+        return resposta
     except Exception as e:
         logger.error(f"Erro ao servir imagem do presente {pk}: {str(e)}")
         return HttpResponse('Erro ao carregar imagem', status=500)
 
 @requer_grupo_ativo
-def buscar_sugestoes_ia_view(request, pk):
-    grupo_ativo = request.user.grupo_ativo
-    presente = get_object_or_404(Presente, pk=pk, grupo=grupo_ativo, usuario=request.user)
+async def buscar_sugestoes_ia_view(request, pk):
+    # Async: enquanto os motores de IA respondem, o worker atende outras requisições
+    usuario = await request.auser()
+    presente = await aget_object_or_404(Presente, pk=pk, grupo_id=usuario.grupo_ativo_id, usuario=usuario)
 
-    # Um único botão: os motores de IA são tentados em sequência
-    # (Gemini -> Claude -> ChatGPT), com fallback automático.
+    # Um único botão: o roteador escolhe entre os motores de IA
+    # (Gemini -> ChatGPT -> Claude), pulando os que estão falhando.
     try:
-        sucesso, mensagem = IAService.buscar_sugestoes_com_fallback(presente)
+        sucesso, mensagem = await IAService.abuscar_sugestoes_com_fallback(presente)
         if sucesso:
             messages.success(request, mensagem)
         else:
@@ -591,6 +578,44 @@ def buscar_sugestoes_ia_view(request, pk):
 
     return redirect('ver_sugestoes', pk=pk)
 
+
+def _evento_sse(evento):
+    return f"event: {evento['tipo']}\ndata: {json.dumps(evento, default=str)}\n\n"
+
+
+async def _iterar_em_thread(gerador):
+    """Gerador síncrono consumido fora do event loop (streaming no ASGI)."""
+    fim = object()
+    while True:
+        item = await http_client.em_thread(next, gerador, fim)
+        if item is fim:
+            return
+        yield item
+
+
+@requer_grupo_ativo
+def buscar_sugestoes_stream_view(request, pk):
+    """
+    Busca de sugestões (IA + Zoom + Buscapé) em Server-Sent Events: cada
+    fonte é enviada assim que responde, com o ranking parcial, e o evento
+    'resultado' traz o ranking final já gravado. Usado pelo botão "Buscar
+    com IA" da página de sugestões (que volta ao buscar_sugestoes sem JS).
+    """
+    presente = get_object_or_404(Presente, pk=pk, grupo=request.user.grupo_ativo, usuario=request.user)
+
+    # O corpo é gerado depois do LimitesInterativosMiddleware: sem_espera aqui também
+    eventos = iterar_sem_espera(_evento_sse(evento) for evento in IAService.buscar_sugestoes_em_etapas(presente))
+    # ASGI só transmite iteradores async (um síncrono seria lido inteiro antes de enviar)
+    if isinstance(request, ASGIRequest):
+        eventos = _iterar_em_thread(eventos)
+
+    response = StreamingHttpResponse(eventos, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Proxies (nginx/Render) não devem segurar os eventos em buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @requer_grupo_ativo
 def ver_sugestoes_view(request, pk):
     grupo_ativo = request.user.grupo_ativo
@@ -617,9 +642,8 @@ def ver_sugestoes_view(request, pk):
         url = sug.url_compra or '(vazio)'
         logger.info(f"  - Loja: '{loja}', Preço: {preco}, URL: '{url}'")
 
-    # Temperatura de preços + histórico para o sparkline (estilo LPII)
-    historico = list(presente.historico_precos.all())
-    sparkline = _montar_sparkline(historico)
+    # Temperatura de preços + sparkline (estilo LPII), ambos de PrecoEstatistica
+    sparkline = sparkline_do_presente(presente, 'pagina')
 
     # Economia: melhor sugestão vs preço cadastrado
     melhor_sugestao = sugestoes.filter(preco_sugerido__isnull=False).order_by('preco_sugerido').first()
@@ -631,81 +655,12 @@ def ver_sugestoes_view(request, pk):
         'presente': presente,
         'sugestoes': sugestoes,
         'temperatura': presente.temperatura(),
-        'historico': historico,
         'sparkline': sparkline,
         'melhor_sugestao': melhor_sugestao,
         'economia': economia,
     })
 
 
-def _montar_sparkline(historico, largura=600, altura=220):
-    """
-    Calcula as coordenadas SVG do gráfico de histórico de preços,
-    no estilo do PriceComparisonModal do LPII: grade horizontal com
-    valores, área em gradiente rose, linha 2.5px e pontos brancos.
-    """
-    pontos_validos = [h for h in historico if h.preco][-12:]
-    if len(pontos_validos) < 2:
-        return None
-
-    pad_esq, pad_dir, pad_top, pad_inf = 64, 20, 16, 34
-    plot_largura = largura - pad_esq - pad_dir
-    plot_altura = altura - pad_top - pad_inf
-    y_base = altura - pad_inf
-
-    precos = [float(h.preco) for h in pontos_validos]
-    p_min = min(precos) * 0.95
-    p_max = max(precos) * 1.05
-    faixa = (p_max - p_min) or 1.0
-
-    def get_y(valor):
-        return y_base - ((valor - p_min) * plot_altura) / faixa
-
-    n = len(pontos_validos)
-    # Rotular no máximo ~4 datas (primeira, intermediárias e última)
-    passo_rotulo = max(1, (n - 1) // 3 or 1)
-    indices_rotulo = set(range(0, n, passo_rotulo)) | {n - 1}
-
-    # IMPORTANTE: coordenadas formatadas como string em Python (ponto decimal).
-    # Com LANGUAGE_CODE=pt-br o Django renderiza floats com vírgula no template
-    # ("217,5"), o que é inválido como atributo SVG e quebra o gráfico.
-    pontos = []
-    for i, h in enumerate(pontos_validos):
-        x = pad_esq + i * plot_largura / (n - 1)
-        pontos.append({
-            'x': f'{x:.1f}',
-            'y': f'{get_y(float(h.preco)):.1f}',
-            'preco': h.preco, 'loja': h.loja, 'data': h.data,
-            'data_fmt': h.data.strftime('%d/%m'),
-            'rotulo': i in indices_rotulo,
-        })
-
-    # Grade horizontal com 4 níveis de preço (valores já formatados)
-    grades = []
-    for i in range(4):
-        valor = p_min + faixa * i / 3
-        grades.append({
-            'y': f'{get_y(valor):.1f}',
-            'y_texto': f'{get_y(valor) + 4:.1f}',
-            'valor_fmt': f'R$ {valor:,.0f}'.replace(',', '.'),
-        })
-
-    polyline = ' '.join(f"{p['x']},{p['y']}" for p in pontos)
-    area = f"M {pontos[0]['x']},{y_base} L " + ' L '.join(
-        f"{p['x']},{p['y']}" for p in pontos
-    ) + f" L {pontos[-1]['x']},{y_base} Z"
-
-    return {
-        'pontos': pontos, 'grades': grades,
-        'polyline': polyline, 'area': area,
-        'largura': largura, 'altura': altura,
-        'pad_esq': pad_esq, 'grade_x2': largura - pad_dir,
-        'pad_esq_texto': pad_esq - 8,
-        'y_base': y_base, 'y_rotulo': y_base + 22,
-        'min': min(precos), 'max': max(precos),
-    }
-
-
 @requer_grupo_ativo
 def aplicar_preco_view(request, pk, sugestao_id):
     """Aplica o preço de uma sugestão ao presente e registra no histórico (LPII 'Aplicar')."""
@@ -727,38 +682,6 @@ def aplicar_preco_view(request, pk, sugestao_id):
     messages.success(request, f'Preço atualizado para R$ {sugestao.preco_sugerido} ({sugestao.local_compra}).')
     return redirect('ver_sugestoes', pk=pk)
 
-def _atualizar_precos_background():
-    """Função para atualizar preços em background"""
-    try:
-        # Buscar TODOS os presentes ativos de TODOS os usuários
-        presentes = Presente.objects.filter(status='ATIVO').select_related('usuario')
-
-        total_presentes = presentes.count()
-        sucesso_count = 0
-        erro_count = 0
-
-        logger.info(f"[BACKGROUND] Iniciando atualização de preços para {total_presentes} presentes ativos do sistema")
-
-        for presente in presentes:
-            try:
-                sucesso, mensagem = IAService.buscar_sugestoes_reais(presente)
-                if sucesso:
-                    sucesso_count += 1
-                    logger.info(f"[BACKGROUND] Presente {presente.id} ({presente.usuario.first_name}): {mensagem}")
-                else:
-                    erro_count += 1
-                    logger.warning(f"[BACKGROUND] Presente {presente.id}: {mensagem}")
-            except Exception as e:
-                erro_count += 1
-                logger.error(f"[BACKGROUND] Erro ao atualizar presente {presente.id}: {str(e)}")
-
-        logger.info(f"[BACKGROUND] Atualização concluída: {sucesso_count} sucessos, {erro_count} erros de {total_presentes} presentes")
-
-    except Exception as e:
-        logger.error(f"[BACKGROUND] Erro fatal na atualização de preços: {str(e)}")
-        import traceback
-        logger.error(f"[BACKGROUND] Traceback: {traceback.format_exc()}")
-
 @login_required
 def atualizar_todos_precos_view(request):
     """Inicia atualização de preços de TODOS os presentes ativos em background"""
@@ -777,10 +700,9 @@ def atualizar_todos_precos_view(request):
 
         logger.info(f"Usuário {request.user.email} iniciou atualização em background de {total_presentes} presentes")
 
-        # Iniciar thread em background
-        import threading
-        thread = threading.Thread(target=_atualizar_precos_background, daemon=True)
-        thread.start()
+        # Enfileirar a pesquisa completa (um presente por tarefa, em background)
+        from .pesquisa_precos import agendar_pesquisa
+        agendar_pesquisa('manual')
 
         # Mensagem de feedback imediato
         messages.success(
@@ -801,50 +723,32 @@ def atualizar_todos_precos_view(request):
 
 @requer_grupo_ativo
 def lista_usuarios_view(request):
-    from django.db.models import Min, Q
+    from django.db.models import Min, Q, Value
+    from django.db.models.functions import Concat
+    from .paginacao import normalizar_ordenacao, paginar_por_cursor
 
     grupo_ativo = request.user.grupo_ativo
 
     # Pegar parâmetros de filtro e ordenação
-    ordenar_por = request.GET.get('ordenar', '-data_cadastro')
+    ordenar_por = normalizar_ordenacao(request.GET.get('ordenar', ''))
     preco_min = request.GET.get('preco_min', '')
     preco_max = request.GET.get('preco_max', '')
+    busca = request.GET.get('busca', '').strip()
+    status = request.GET.get('status', '')
 
-    # Otimizar query - PEGAR APENAS MEMBROS DO GRUPO ATIVO
-    membros_grupo = GrupoMembro.objects.filter(grupo=grupo_ativo).select_related('usuario')
-    usuarios_ids = membros_grupo.values_list('usuario_id', flat=True)
-
-    presentes_grupo_qs = Presente.objects.filter(grupo=grupo_ativo).select_related('usuario').prefetch_related('sugestoes', 'historico_precos')
-
-    usuarios_list = Usuario.objects.filter(
-        id__in=usuarios_ids,
-        ativo=True
-    ).exclude(id=request.user.id).prefetch_related(
-        Prefetch('presentes', queryset=presentes_grupo_qs, to_attr='presentes_do_grupo')
-    )
-
-    usuarios_com_stats = []
-    for usuario in usuarios_list:
-        presentes = usuario.presentes_do_grupo
-        usuario.total_presentes = len(presentes)
-        usuario.presentes_ativos = sum(1 for p in presentes if p.status == 'ATIVO')
-        usuario.presentes_comprados = sum(1 for p in presentes if p.status == 'COMPRADO')
-        # Mostrar todos os presentes (ativos e comprados); ativos primeiro
-        ordenados = sorted(presentes, key=lambda p: (p.status != 'ATIVO', -p.id))
-        usuario.presentes_list = ordenados[:60]
-        usuarios_com_stats.append(usuario)
-
-    # Buscar todos os presentes do grupo (ativos e comprados) para a visualização por produto
+    # Buscar os presentes do grupo (ativos e comprados) para a visualização por produto.
+    # Filtros e ordenação ficam no SQL e só uma página (cursor) é carregada por vez.
     todos_presentes = Presente.objects.filter(
         grupo=grupo_ativo,
         usuario__ativo=True
     ).exclude(
         usuario=request.user
-    ).select_related('usuario').prefetch_related('sugestoes', 'historico_precos')
+    ).select_related('estatistica_preco').defer('estatistica_preco__sparklines').prefetch_related('usuario')
 
-    # Adicionar melhor preço (menor preço das sugestões) para cada presente
+    # Adicionar melhor preço (menor preço das sugestões) e quantas são, para cada presente
     todos_presentes = todos_presentes.annotate(
-        melhor_preco=Min('sugestoes__preco_sugerido')
+        melhor_preco=Min('sugestoes__preco_sugerido'),
+        total_sugestoes=Count('sugestoes'),
     )
 
     # Aplicar filtros de preço
@@ -866,37 +770,46 @@ def lista_usuarios_view(request):
         except ValueError:
             pass
 
-    # Aplicar ordenação
-    mapeamento_ordenacao = {
-        'produto': 'descricao',
-        '-produto': '-descricao',
-        'usuario': 'usuario__first_name',
-        '-usuario': '-usuario__first_name',
-        'preco': 'preco',
-        '-preco': '-preco',
-        'melhor_preco': 'melhor_preco',
-        '-melhor_preco': '-melhor_preco',
-        'data': 'data_cadastro',
-        '-data': '-data_cadastro',
-    }
+    # Busca e status da visualização por produto (não dá para filtrar só a página carregada)
+    if busca:
+        # Como a busca local: descrição ou nome completo do membro ("Maria Silva")
+        todos_presentes = todos_presentes.annotate(
+            nome_completo=Concat('usuario__first_name', Value(' '), 'usuario__last_name')
+        ).filter(
+            Q(descricao__icontains=busca) | Q(nome_completo__icontains=busca)
+        )
+    if status in ('ATIVO', 'COMPRADO'):
+        todos_presentes = todos_presentes.filter(status=status)
 
     # Disponíveis sempre antes dos comprados, depois a ordenação escolhida
-    ordem_final = mapeamento_ordenacao.get(ordenar_por, '-data_cadastro')
-    from django.db.models import Case, When, IntegerField
-    todos_presentes = list(
-        todos_presentes.annotate(
-            ordem_status=Case(
-                When(status='ATIVO', then=0), default=1, output_field=IntegerField()
-            )
-        ).order_by('ordem_status', ordem_final)
+    todos_presentes, proximo_cursor = paginar_por_cursor(
+        todos_presentes, ordenar_por, request.GET.get('cursor'), por_pagina=PRODUTOS_POR_PAGINA
     )
+    proxima_pagina = ''
+    if proximo_cursor:
+        parametros = request.GET.copy()
+        parametros['cursor'] = proximo_cursor
+        parametros['parcial'] = 'produtos'
+        proxima_pagina = f"{request.path}?{parametros.urlencode()}"
+
+    if request.GET.get('parcial') == 'produtos':
+        # "Carregar mais" e busca/status da visualização por produto
+        return JsonResponse({
+            'html': render_to_string('presentes/produtos_pagina.html', {
+                'todos_presentes': todos_presentes,
+            }, request=request),
+            'proxima_pagina': proxima_pagina,
+        })
 
-    # Gráfico de evolução de preço (LPII) para o modal de cada produto
-    for p in todos_presentes:
-        p.sparkline = _montar_sparkline(list(p.historico_precos.all()), largura=500, altura=190)
+    # Paginação dos membros (40 por página) antes de carregar os presentes de cada um
+    membros_grupo = GrupoMembro.objects.filter(grupo=grupo_ativo)
+    usuarios_ids = membros_grupo.values_list('usuario_id', flat=True)
+    usuarios_qs = Usuario.objects.filter(
+        id__in=usuarios_ids,
+        ativo=True
+    ).exclude(id=request.user.id).order_by('id')
 
-    # Paginação (40 usuários por página)
-    paginator = Paginator(usuarios_com_stats, 40)
+    paginator = Paginator(usuarios_qs, 40)
     page = request.GET.get('page', 1)
 
     try:
@@ -906,14 +819,60 @@ def lista_usuarios_view(request):
     except EmptyPage:
         usuarios = paginator.page(paginator.num_pages)
 
+    # Só o resumo dos cards: temperatura via PrecoEstatistica (join 1:1) e contagem
+    # de sugestões; gráfico e lojas vêm de modal_presente_view ao abrir o modal
+    presentes_grupo_qs = Presente.objects.filter(grupo=grupo_ativo).select_related(
+        'estatistica_preco'
+    ).defer('estatistica_preco__sparklines').annotate(
+        total_sugestoes=Count('sugestoes')
+    )
+    prefetch_related_objects(
+        usuarios.object_list,
+        Prefetch('presentes', queryset=presentes_grupo_qs, to_attr='presentes_do_grupo'),
+    )
+
+    for usuario in usuarios:
+        presentes = usuario.presentes_do_grupo
+        usuario.total_presentes = len(presentes)
+        usuario.presentes_ativos = sum(1 for p in presentes if p.status == 'ATIVO')
+        usuario.presentes_comprados = sum(1 for p in presentes if p.status == 'COMPRADO')
+        # Mostrar todos os presentes (ativos e comprados); ativos primeiro
+        ordenados = sorted(presentes, key=lambda p: (p.status != 'ATIVO', -p.id))
+        for presente in ordenados:
+            presente.usuario = usuario
+        usuario.presentes_list = ordenados[:60]
+
     return render(request, 'presentes/lista_usuarios.html', {
         'usuarios': usuarios,
         'todos_presentes': todos_presentes,
+        'proxima_pagina': proxima_pagina,
         'ordenar_por': ordenar_por,
         'preco_min': preco_min,
         'preco_max': preco_max,
     })
 
+@requer_grupo_ativo
+def modal_presente_view(request, pk):
+    """
+    Conteúdo do modal de sugestões de um presente (lista_usuarios), buscado
+    quando o modal é aberto: a listagem renderiza só os cards.
+    """
+    presente = get_object_or_404(
+        Presente.objects.select_related('estatistica_preco').prefetch_related('sugestoes'),
+        pk=pk,
+        grupo=request.user.grupo_ativo,
+    )
+
+    if presente.usuario_id != request.user.pk and presente.status == 'ATIVO':
+        # Presentes vistos por outros membros têm o preço atualizado com mais frequência
+        from .pesquisa_precos import registrar_visualizacao
+        registrar_visualizacao([presente.pk])
+
+    return render(request, 'presentes/modal_presente.html', {
+        'presente': presente,
+        'sparkline': sparkline_do_presente(presente, 'modal'),
+    })
+
 @requer_grupo_ativo
 def presentes_usuario_view(request, user_id):
     grupo_ativo = request.user.grupo_ativo
@@ -924,11 +883,11 @@ def presentes_usuario_view(request, user_id):
         messages.error(request, 'Usuario nao e membro do grupo ativo.')
         return redirect('lista_usuarios')
 
-    # Otimizar query com select_related e prefetch_related - FILTRADO POR GRUPO
+    # Otimizar query com prefetch_related - FILTRADO POR GRUPO
     presentes_list = Presente.objects.filter(
         grupo=grupo_ativo,
         usuario=usuario
-    ).select_related('usuario').prefetch_related('sugestoes', 'compra', 'historico_precos')
+    ).select_related('estatistica_preco').defer('estatistica_preco__sparklines').prefetch_related('usuario', 'sugestoes', 'compra')
 
     # Estatísticas
     total_presentes = presentes_list.count()
@@ -946,6 +905,11 @@ def presentes_usuario_view(request, user_id):
     except EmptyPage:
         presentes = paginator.page(paginator.num_pages)
 
+    if usuario.pk != request.user.pk:
+        # Presentes vistos por outros membros têm o preço atualizado com mais frequência
+        from .pesquisa_precos import registrar_visualizacao
+        registrar_visualizacao(p.pk for p in presentes if p.status == 'ATIVO')
+
     return render(request, 'presentes/presentes_usuario.html', {
         'usuario_presente': usuario,
         'presentes': presentes,
@@ -1109,6 +1073,15 @@ def compras_grupo_json(request):
     return JsonResponse({'tipo': tipo, 'total': len(dados), 'compras': dados})
 
 
+@login_required
+def ia_status_json(request):
+    """Latência, taxa de erro e pausas de cada motor de IA (apenas administradores)."""
+    if not request.user.is_superuser:
+        return JsonResponse({'erro': 'Acesso negado'}, status=403)
+    from .roteador_ia import estatisticas
+    return JsonResponse({'motores': estatisticas()})
+
+
 @csrf_exempt
 def cron_pesquisar_precos(request):
     """
@@ -1116,11 +1089,12 @@ def cron_pesquisar_precos(request):
     (header 'X-Cron-Token' ou ?token=). Chamado por um agendador externo
     (GitHub Actions) — mais confiável e observável que depender só do tráfego.
 
-    Respeita o intervalo de 7 dias (use ?forcar=1 para ignorar). Dispara em
-    background e responde imediatamente.
+    Com PRECOS_AGENDAMENTO enfileira os presentes com atualização vencida;
+    senão respeita o intervalo de 7 dias da pesquisa completa. ?forcar=1
+    enfileira a pesquisa completa (presentes/tarefas.py) imediatamente.
     """
     from django.conf import settings
-    from .pesquisa_precos import pesquisa_em_atraso, executar_pesquisa
+    from .pesquisa_precos import pesquisa_em_atraso, agendar_pesquisa, agendar_vencidos
 
     token_esperado = getattr(settings, 'CRON_TOKEN', '') or ''
     token_recebido = request.headers.get('X-Cron-Token') or request.GET.get('token', '')
@@ -1131,27 +1105,43 @@ def cron_pesquisar_precos(request):
         return JsonResponse({'erro': 'Token inválido'}, status=403)
 
     forcar = request.GET.get('forcar') in ('1', 'true', 'sim')
+    if not forcar and getattr(settings, 'PRECOS_AGENDAMENTO', True):
+        # Agendamento por presente: só os vencidos, em lote
+        total = agendar_vencidos()
+        return JsonResponse({'status': 'agendado', 'presentes': total})
     if not forcar and not pesquisa_em_atraso():
         return JsonResponse({'status': 'ignorado', 'motivo': 'Última pesquisa tem menos de 7 dias'})
 
-    import threading
-    threading.Thread(
-        target=executar_pesquisa,
-        kwargs={'origem': 'comando'},
-        daemon=True
-    ).start()
+    tarefa = agendar_pesquisa('comando')
 
-    return JsonResponse({'status': 'iniciado', 'mensagem': 'Pesquisa de preços disparada em background'})
+    return JsonResponse({
+        'status': 'iniciado',
+        'mensagem': 'Pesquisa de preços enfileirada',
+        'tarefa': tarefa.pk if tarefa else None,
+    })
+
+
+def _criar_issue_scraping(request, url, dados_extraidos):
+    from .github_helper import criar_issue_falha_scraping
+    return criar_issue_falha_scraping(
+        url_produto=url,
+        dados_extraidos=dados_extraidos,
+        usuario=request.user,
+        grupo=request.user.grupo_ativo if hasattr(request.user, 'grupo_ativo') else None
+    )
 
 
 @login_required
-def extrair_info_produto_view(request):
+async def extrair_info_produto_view(request):
     """
     Extrai informações de um produto a partir de uma URL.
     Retorna JSON com título, imagem e preço do produto.
 
     Em caso de falha de scraping (site acessível mas dados não extraídos),
     cria automaticamente uma issue no GitHub.
+
+    Async: o scraping roda fora do event loop (http_client.em_thread); no
+    modo ASGI o worker continua atendendo outras requisições enquanto isso.
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Método não permitido'}, status=405)
@@ -1167,12 +1157,11 @@ def extrair_info_produto_view(request):
 
     try:
         from .scrapers import ScraperFactory
-        from .github_helper import criar_issue_falha_scraping
 
         logger.info(f"Extraindo informações de: {url}")
 
         # Usar o factory para obter o scraper apropriado (retorna dict agora)
-        result = ScraperFactory.extract_product_info(url)
+        result = await http_client.em_thread(ScraperFactory.extract_product_info, url)
 
         if result.get('success'):
             # Extração bem-sucedida
@@ -1214,12 +1203,7 @@ def extrair_info_produto_view(request):
                     'imagem_url': partial_data.get('imagem_url')
                 }
 
-                resultado_issue = criar_issue_falha_scraping(
-                    url_produto=url,
-                    dados_extraidos=dados_extraidos,
-                    usuario=request.user,
-                    grupo=request.user.grupo_ativo if hasattr(request.user, 'grupo_ativo') else None
-                )
+                resultado_issue = await sync_to_async(_criar_issue_scraping)(request, url, dados_extraidos)
 
                 # Preparar mensagem de resposta
                 mensagem_erro = 'Não foi possível extrair as informações desta página. '
@@ -1481,7 +1465,7 @@ def grupos_lista_view(request):
     membros = GrupoMembro.objects.filter(
         usuario=request.user,
         grupo__ativo=True
-    ).select_related('grupo').order_by('-grupo__data_criacao')
+    ).prefetch_related('grupo').order_by('-grupo__data_criacao')
 
     grupo_ativo = request.user.grupo_ativo
 
@@ -1511,11 +1495,9 @@ def criar_grupo_view(request):
                     # Processar imagem se URL fornecida
                     url_imagem = request.POST.get('url_imagem', '').strip()
                     if url_imagem:
-                        imagem_base64, imagem_nome, imagem_tipo = baixar_imagem_da_url(url_imagem)
-                        if imagem_base64:
-                            grupo.imagem_base64 = imagem_base64
-                            grupo.imagem_nome = imagem_nome
-                            grupo.imagem_tipo = imagem_tipo
+                        imagem_data, imagem_nome, imagem_tipo = baixar_imagem_da_url(url_imagem)
+                        if imagem_data:
+                            grupo.definir_imagem(imagem_data, imagem_nome, imagem_tipo)
                             grupo.save()
 
                     # Adicionar usuario como mantenedor
@@ -1560,11 +1542,9 @@ def editar_grupo_view(request, pk):
             # Processar imagem se URL fornecida
             url_imagem = request.POST.get('url_imagem', '').strip()
             if url_imagem:
-                imagem_base64, imagem_nome, imagem_tipo = baixar_imagem_da_url(url_imagem)
-                if imagem_base64:
-                    grupo.imagem_base64 = imagem_base64
-                    grupo.imagem_nome = imagem_nome
-                    grupo.imagem_tipo = imagem_tipo
+                imagem_data, imagem_nome, imagem_tipo = baixar_imagem_da_url(url_imagem)
+                if imagem_data:
+                    grupo.definir_imagem(imagem_data, imagem_nome, imagem_tipo)
                     grupo.save()
 
             messages.success(request, f'Grupo "{grupo.nome}" atualizado com sucesso!')
@@ -1854,33 +1834,32 @@ def convite_grupo_view(request, codigo):
 
 
 def servir_imagem_grupo_view(request, pk):
-    """Serve a imagem do grupo em base64"""
+    """Serve a imagem do grupo armazenada no banco (com ETag/304)"""
     grupo = get_object_or_404(Grupo, pk=pk)
 
-    if not grupo.imagem_base64:
+    if not grupo.tem_imagem():
         return HttpResponse('Sem imagem', status=404)
 
     try:
-        # Decodificar base64
-        imagem_data = base64.b64decode(grupo.imagem_base64)
-
-        # Retornar imagem com content-type correto
-        content_type = grupo.imagem_tipo or 'image/jpeg'
-        return HttpResponse(imagem_data, content_type=content_type)
+        resposta = responder_imagem(request, grupo.imagem_blob_id, grupo.obter_imagem)
+        if resposta is None:
+            return HttpResponse('Sem imagem', status=404)
+        return resposta
     except Exception as e:
         logger.error(f"Erro ao servir imagem do grupo {pk}: {str(e)}")
         return HttpResponse('Erro ao carregar imagem', status=500)
 
 
 def servir_foto_usuario_view(request, pk):
-    """Serve a foto do usuario a partir do base64 no banco"""
+    """Serve a foto do usuario armazenada no banco (com ETag/304)"""
     try:
         usuario = get_object_or_404(Usuario, pk=pk)
-        if not usuario.foto_base64:
+        if not usuario.tem_foto():
+            return HttpResponse(status=404)
+        resposta = responder_imagem(request, usuario.foto_blob_id, usuario.obter_foto)
+        if resposta is None:
             return HttpResponse(status=404)
-        imagem_data = base64.b64decode(usuario.foto_base64)
-        content_type = usuario.foto_tipo or 'image/jpeg'
-        return HttpResponse(imagem_data, content_type=content_type)
+        return resposta
     except Exception as e:
         logger.error(f"Erro ao servir foto do usuario {pk}: {str(e)}")
         return HttpResponse('Erro ao carregar foto', status=500)
@@ -1,6 +1,6 @@
 // Service Worker para Lista de Presentes
 // Versão do cache - incrementar ao fazer mudanças
-const CACHE_VERSION = 'v1.2.0';
+const CACHE_VERSION = 'v1.3.0';
 const CACHE_NAME = `lista-presentes-${CACHE_VERSION}`;
 
 // Arquivos essenciais para cache offline
@@ -64,6 +64,23 @@ self.addEventListener('fetch', (event) => {
     return;
   }
 
+  // Imagens versionadas (?v=<hash do conteúdo>) nunca mudam: cache primeiro
+  const url = new URL(request.url);
+  if (request.method === 'GET' && url.searchParams.has('v') && /\/(imagem|foto)\/$/.test(url.pathname)) {
+    event.respondWith(
+      caches.match(request).then((cachedResponse) => {
+        return cachedResponse || fetch(request).then((response) => {
+          if (response.status === 200) {
+            const responseToCache = response.clone();
+            caches.open(CACHE_NAME).then((cache) => cache.put(request, responseToCache));
+          }
+          return response;
+        });
+      })
+    );
+    return;
+  }
+
   // Estratégia: tentar rede primeiro, fallback para cache
   event.respondWith(
     fetch(request)